@@ -0,0 +1,102 @@
+# Bytes saved and CPU cost of gzip levels and zstd on typical proxy response bodies.
+# Usage: python benchmarks/bench_compression.py [--repeat 50]
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ollama_swapper.compression import SUPPORTED_ENCODINGS, compress, compress_stream  # noqa: E402
+
+
+def _tags() -> bytes:
+    models = [
+        {
+            "name": f"model-{i}:latest",
+            "model": f"model-{i}:latest",
+            "modified_at": "2026-01-01T00:00:00Z",
+            "size": 4_000_000_000 + i,
+            "digest": f"{i:064x}",
+            "details": {"family": "llama", "parameter_size": "8B", "quantization_level": "Q4_K_M"},
+        }
+        for i in range(60)
+    ]
+    return json.dumps({"models": models}).encode()
+
+
+def _embedding() -> bytes:
+    rng = random.Random(0)
+    vectors = [[rng.uniform(-1, 1) for _ in range(1024)] for _ in range(8)]
+    return json.dumps({"model": "nomic-embed-text", "embeddings": vectors}).encode()
+
+
+def _stream_lines() -> list[bytes]:
+    words = "the quick brown fox jumps over the lazy dog while tokens stream".split()
+    return [
+        json.dumps(
+            {
+                "model": "llama3.1:8b",
+                "created_at": "2026-01-01T00:00:00.000000Z",
+                "message": {"role": "assistant", "content": f" {words[i % len(words)]}"},
+                "done": False,
+            }
+        ).encode()
+        + b"\n"
+        for i in range(500)
+    ]
+
+
+async def _stream_size(lines: list[bytes], encoding: str, level: int) -> int:
+    async def source() -> AsyncIterator[bytes]:
+        for line in lines:
+            yield line
+
+    return sum([len(chunk) async for chunk in compress_stream(source(), encoding, level)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    settings = [("gzip", level) for level in (1, 6, 9)]
+    if "zstd" in SUPPORTED_ENCODINGS:
+        settings += [("zstd", level) for level in (1, 3, 9)]
+    else:
+        print("zstandard not installed; pip install ollama-swapper[zstd] to include zstd")
+
+    lines = _stream_lines()
+    cases = [("tags", _tags()), ("embedding", _embedding())]
+    for label, body in cases:
+        print(f"{label}: {len(body)} bytes")
+        for encoding, level in settings:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                encoded = compress(body, encoding, level)
+            elapsed_us = (time.perf_counter() - start) / args.repeat * 1e6
+            print(
+                f"  {encoding}-{level}: {len(encoded):8d} bytes "
+                f"({len(encoded) / len(body):5.1%})  {elapsed_us:8.0f} us"
+            )
+
+    raw = sum(map(len, lines))
+    print(f"ndjson stream: {len(lines)} lines, {raw} bytes, flushed per line")
+    for encoding, level in settings:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            size = asyncio.run(_stream_size(lines, encoding, level))
+        elapsed_us = (time.perf_counter() - start) / args.repeat / len(lines) * 1e6
+        print(
+            f"  {encoding}-{level}: {size:8d} bytes ({size / raw:5.1%})  {elapsed_us:6.1f} us/line"
+        )
+
+
+if __name__ == "__main__":
+    main()
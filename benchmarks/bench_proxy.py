@@ -0,0 +1,118 @@
+# Per-request overhead of the FastAPI and lean ASGI proxy paths on cheap endpoints.
+# Usage: python benchmarks/bench_proxy.py [--requests 20000]
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ollama_swapper.config import AppConfig, PolicyConfig, PolicyDefaults, ServerConfig  # noqa: E402
+from ollama_swapper.proxy import build_proxy_app  # noqa: E402
+
+TAGS = json.dumps({"models": [{"name": f"model-{i}:latest", "size": 1 << 32} for i in range(20)]})
+
+
+def _config() -> AppConfig:
+    return AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(defaults=PolicyDefaults(num_ctx=8192, keep_alive=0)),
+    )
+
+
+def _upstream() -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, content=TAGS, headers={"content-type": "application/json"})
+        return httpx.Response(200, content=b'{"response":"ok","done":true}\n')
+
+    return httpx.MockTransport(handler)
+
+
+def _scope(method: str, path: str, body: bytes) -> dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"127.0.0.1:11434"),
+            (b"user-agent", b"bench"),
+            (b"accept", b"*/*"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 11434),
+    }
+
+
+async def _call(app: Any, method: str, path: str, body: bytes) -> int:
+    sent_body = False
+    done = asyncio.Event()
+    status = 0
+
+    async def receive() -> dict[str, Any]:
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            done.set()
+
+    await app(_scope(method, path, body), receive, send)
+    return status
+
+
+async def _bench(lean: bool, method: str, path: str, body: bytes, requests: int) -> float:
+    app = build_proxy_app(_config(), transport=_upstream(), lean=lean)
+    for _ in range(200):
+        await _call(app, method, path, body)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await _call(app, method, path, body)
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    # Keep per-request httpx INFO logging out of the measurement.
+    logging.basicConfig(level=logging.WARNING)
+
+    generate = json.dumps({"model": "m", "prompt": "hi", "stream": False}).encode()
+    cases = [("GET /api/tags", "GET", "/api/tags", b""), ("POST /api/generate", "POST", "/api/generate", generate)]
+    for label, method, path, body in cases:
+        rates = {
+            mode: asyncio.run(_bench(mode == "lean", method, path, body, args.requests))
+            for mode in ("fastapi", "lean")
+        }
+        print(
+            f"{label:20s} fastapi={rates['fastapi']:8.0f} req/s ({1e6 / rates['fastapi']:6.1f} us)"
+            f"  lean={rates['lean']:8.0f} req/s ({1e6 / rates['lean']:6.1f} us)"
+            f"  speedup={rates['lean'] / rates['fastapi']:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Tool-call assembly cost and time to first tool call for multi-hundred-KB streamed arguments.
+# Usage: python benchmarks/bench_toolcalls.py [--sizes 100,250,500] [--fragment 32]
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ollama_swapper.proxy import _stream_openai_chat  # noqa: E402
+from ollama_swapper.toolcalls import ToolCallAssembler  # noqa: E402
+
+
+def _arguments(size_kb: int) -> str:
+    # A coding agent writing a file: one large string field full of escapes and braces.
+    line = 'def f(x):\n    return {"key": x["value"]}  # "quoted" \\ path\n'
+    content = (line * (size_kb * 1024 // len(line) + 1))[: size_kb * 1024]
+    return json.dumps({"path": "src/app.py", "content": content})
+
+
+def _deltas(arguments: str, fragment: int, calls: int) -> list[dict[str, Any]]:
+    deltas: list[dict[str, Any]] = []
+    for index in range(calls):
+        deltas.append({"index": index, "id": f"call-{index}", "function": {"name": "write"}})
+        for start in range(0, len(arguments), fragment):
+            piece = arguments[start : start + fragment]
+            deltas.append({"index": index, "function": {"arguments": piece}})
+    return deltas
+
+
+def _legacy(deltas: list[dict[str, Any]]) -> dict[int, dict[str, Any]]:
+    """The previous accumulation: string concatenation through the buffer dict."""
+    buffers: dict[int, dict[str, Any]] = {}
+    for delta in deltas:
+        index = delta.get("index", 0)
+        if index not in buffers:
+            function = {"name": "", "arguments": ""}
+            buffers[index] = {"id": "", "type": "function", "function": function}
+        buf = buffers[index]
+        fn_delta = delta.get("function") or {}
+        if fn_delta.get("name"):
+            buf["function"]["name"] = fn_delta["name"]
+        if fn_delta.get("arguments"):
+            buf["function"]["arguments"] += fn_delta["arguments"]
+    return buffers
+
+
+def _assembled(deltas: list[dict[str, Any]], early: bool) -> list[dict[str, Any]]:
+    assembler = ToolCallAssembler(emit_early=early)
+    ready = assembler.feed(deltas)
+    return ready + assembler.finish()
+
+
+class _SSEResponse:
+    def __init__(self, lines: list[str]) -> None:
+        self._lines = lines
+
+    async def aiter_lines(self) -> AsyncIterator[str]:
+        for line in self._lines:
+            yield line
+
+
+async def _first_tool_call_ms(lines: list[str], early: bool) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    async for chunk in _stream_openai_chat(_SSEResponse(lines), "m", early_tool_calls=early):
+        if first is None and b'"tool_calls"' in chunk:
+            first = time.perf_counter()
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,250,500", help="Argument sizes in KB")
+    parser.add_argument("--fragment", type=int, default=32, help="Characters per fragment")
+    parser.add_argument("--calls", type=int, default=2, help="Tool calls per response")
+    args = parser.parse_args()
+
+    for size_kb in (int(size) for size in args.sizes.split(",")):
+        arguments = _arguments(size_kb)
+        deltas = _deltas(arguments, args.fragment, args.calls)
+        start = time.perf_counter()
+        _legacy(deltas)
+        legacy_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        _assembled(deltas, early=False)
+        assembled_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        calls = _assembled(deltas, early=True)
+        scanned_ms = (time.perf_counter() - start) * 1000
+        assert all(json.loads(call["function"]["arguments"]) for call in calls)
+
+        lines = [
+            "data: " + json.dumps({"choices": [{"delta": {"tool_calls": [delta]}}]})
+            for delta in deltas
+        ] + ["data: [DONE]"]
+        first_end, total_end = asyncio.run(_first_tool_call_ms(lines, early=False))
+        first_early, total_early = asyncio.run(_first_tool_call_ms(lines, early=True))
+        print(
+            f"{size_kb:4d} KB x {args.calls} calls, {len(deltas)} fragments: "
+            f"accumulate legacy={legacy_ms:7.1f} ms lists={assembled_ms:5.1f} ms "
+            f"lists+scan={scanned_ms:5.1f} ms  "
+            f"first tool call at-done={first_end:6.0f} ms early={first_early:6.0f} ms "
+            f"(stream {total_end:.0f}/{total_early:.0f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# TCP loopback vs Unix domain socket for the proxy -> upstream hop.
+# Usage: python benchmarks/bench_transport.py [--requests 2000] [--chunks 20000]
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+CHUNK = b'{"model":"m","message":{"role":"assistant","content":"token "},"done":false}\n'
+
+
+async def upstream_app(scope: dict[str, Any], receive: Any, send: Any) -> None:
+    """Fake Ollama: tiny /api/version and an NDJSON /api/chat stream of ``?n=`` chunks."""
+    if scope["type"] != "http":
+        return
+    headers = [(b"content-type", b"application/x-ndjson")]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    if scope["path"] != "/api/chat":
+        await send({"type": "http.response.body", "body": b'{"version":"0.9.0"}'})
+        return
+    count = int(scope["query_string"].decode().partition("=")[2] or 1000)
+    batch = CHUNK * 16
+    for _ in range(count // 16):
+        await send({"type": "http.response.body", "body": batch, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _wait_for(check: Any, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            check()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("upstream did not start")
+
+
+async def _measure(
+    transport: httpx.AsyncHTTPTransport, base: str, requests: int, chunks: int
+) -> tuple[float, float]:
+    async with httpx.AsyncClient(transport=transport, base_url=base) as client:
+        for _ in range(100):
+            await client.get("/api/version")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/api/version")
+        latency_us = (time.perf_counter() - start) / requests * 1e6
+
+        received = 0
+        start = time.perf_counter()
+        async with client.stream("GET", "/api/chat", params={"n": chunks}) as response:
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+        throughput = received / (time.perf_counter() - start) / 1e6
+    return latency_us, throughput
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=200000)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT / "benchmarks")}
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    uds = os.path.join(tempfile.mkdtemp(prefix="ollama-swapper-bench-"), "upstream.sock")
+    base_cmd = [sys.executable, "-m", "uvicorn", "bench_transport:upstream_app", "--log-level", "warning"]
+    servers = [
+        subprocess.Popen([*base_cmd, "--port", str(port)], env=env),
+        subprocess.Popen([*base_cmd, "--uds", uds], env=env),
+    ]
+    try:
+        _wait_for(lambda: socket.create_connection(("127.0.0.1", port), timeout=0.2).close())
+        _wait_for(lambda: os.stat(uds))
+        cases = {
+            "tcp loopback": (httpx.AsyncHTTPTransport(), f"http://127.0.0.1:{port}"),
+            "unix socket": (httpx.AsyncHTTPTransport(uds=uds), "http://localhost"),
+        }
+        print(f"{'transport':14s} {'small req':>12s} {'stream':>12s}")
+        for label, (transport, base) in cases.items():
+            latency, throughput = asyncio.run(_measure(transport, base, args.requests, args.chunks))
+            print(f"{label:14s} {latency:>9.1f} us {throughput:>8.1f} MB/s")
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Requests/sec scaling of `ollama-swapper proxy --workers N` against a local fake upstream.
+# Usage: python benchmarks/bench_workers.py [--workers 1,2,4] [--seconds 5] [--loop uvloop --http httptools]
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+TAGS = json.dumps({"models": [{"name": f"model-{i}:latest"} for i in range(20)]}).encode()
+
+
+async def upstream_app(scope: dict[str, Any], receive: Any, send: Any) -> None:
+    """Minimal Ollama stand-in: /api/tags JSON and a one-line /api/generate reply."""
+    if scope["type"] != "http":
+        return
+    body = TAGS if scope["path"] == "/api/tags" else b'{"response":"ok","done":true}\n'
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"port {port} did not open")
+
+
+async def _load(url: str, seconds: float, concurrency: int) -> int:
+    done = 0
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal done
+            while time.monotonic() < deadline:
+                response = await client.get(url)
+                response.raise_for_status()
+                done += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+def _load_process(args: tuple[str, float, int]) -> int:
+    return asyncio.run(_load(*args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=max((os.cpu_count() or 1) // 2, 1))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--loop", default="auto")
+    parser.add_argument("--http", default="auto")
+    args = parser.parse_args()
+
+    upstream_port = _free_port()
+    env = {**os.environ, "PYTHONPATH": str(ROOT / "src") + os.pathsep + str(ROOT / "benchmarks")}
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_workers:upstream_app", "--port", str(upstream_port),
+         "--log-level", "warning", "--workers", str(args.clients)],
+        env=env,
+    )
+    try:
+        _wait_for(upstream_port)
+        print(f"{'workers':>7} {'req/s':>9} {'scaling':>8}")
+        baseline: float | None = None
+        for workers in (int(n) for n in args.workers.split(",")):
+            port = _free_port()
+            with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as handle:
+                handle.write(
+                    f'server:\n  listen: "127.0.0.1:{port}"\n'
+                    f'  upstream: "http://127.0.0.1:{upstream_port}"\npolicy: {{}}\n'
+                )
+            proxy = subprocess.Popen(
+                [sys.executable, "-m", "ollama_swapper.cli", "proxy", "--config", handle.name,
+                 "--lean", "--workers", str(workers), "--loop", args.loop, "--http", args.http],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_for(port)
+                time.sleep(1.0)
+                url = f"http://127.0.0.1:{port}/api/tags"
+                with multiprocessing.Pool(args.clients) as pool:
+                    counts = pool.map(
+                        _load_process, [(url, args.seconds, args.concurrency)] * args.clients
+                    )
+                rate = sum(counts) / args.seconds
+                baseline = baseline or rate
+                print(f"{workers:>7} {rate:>9.0f} {rate / baseline:>7.2f}x")
+            finally:
+                proxy.terminate()
+                proxy.wait()
+                os.unlink(handle.name)
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Deadline admission: completion-time estimates from observed Ollama timings and queue depth.
+# Usage: estimator.observe(upstream, model, final_stats(tail)); estimator.estimate(upstream, ...)
+from __future__ import annotations
+
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+DEADLINE_HEADER = "x-swapper-deadline-ms"
+# Body field consumed by the proxy, like include_thinking.
+DEADLINE_FIELD = "deadline_ms"
+
+_EWMA_ALPHA = 0.2
+# Ollama reports a few milliseconds of load_duration even for a resident model.
+COLD_LOAD_SECONDS = 0.5
+_NANOS = 1e9
+
+
+def parse_deadline_ms(value: Any) -> float | None:
+    """Parse a relative deadline in milliseconds; None when absent."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"invalid deadline: {value!r}")
+    try:
+        deadline = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid deadline: {value!r}") from None
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise ValueError(f"invalid deadline: {value!r}")
+    return deadline
+
+
+def final_stats(tail: bytes) -> dict[str, Any] | None:
+    """Return Ollama's closing ``done: true`` object from the end of a response body."""
+    for line in reversed(tail.splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            parsed = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if isinstance(parsed, dict) and parsed.get("done") and "total_duration" in parsed:
+            return parsed
+        return None
+    return None
+
+
+def _ewma(previous: float | None, sample: float) -> float:
+    if previous is None:
+        return sample
+    return previous + _EWMA_ALPHA * (sample - previous)
+
+
+@dataclass
+class _Rates:
+    service_s: float | None = None
+    load_s: float | None = None
+    prompt_tokens_per_s: float | None = None
+    eval_tokens_per_s: float | None = None
+    eval_count: float | None = None
+    last_served: float | None = None
+
+
+@dataclass(frozen=True)
+class Estimate:
+    queue_s: float
+    load_s: float
+    prompt_s: float
+    eval_s: float
+    loaded: bool
+    observed: bool
+
+    @property
+    def total_s(self) -> float:
+        return self.queue_s + self.load_s + self.prompt_s + self.eval_s
+
+    def describe(self) -> str:
+        return (
+            f"estimate_ms={self.total_s * 1000:.0f} queue_ms={self.queue_s * 1000:.0f} "
+            f"load_ms={self.load_s * 1000:.0f} prompt_ms={self.prompt_s * 1000:.0f} "
+            f"eval_ms={self.eval_s * 1000:.0f} loaded={self.loaded} observed={self.observed}"
+        )
+
+
+class CompletionEstimator:
+    """EWMAs of load time, prompt-eval and eval rates per (upstream, model).
+
+    Components with no observations yet count as zero, so the estimate errs
+    towards admitting a request rather than rejecting it on a guess.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._rates: dict[tuple[str, str], _Rates] = {}
+
+    def observe(self, upstream: str, model: str, stats: dict[str, Any]) -> None:
+        rates = self._rates.setdefault((upstream, model), _Rates())
+        rates.last_served = self._clock()
+        total = stats.get("total_duration")
+        if total:
+            rates.service_s = _ewma(rates.service_s, total / _NANOS)
+        load = (stats.get("load_duration") or 0) / _NANOS
+        if load >= COLD_LOAD_SECONDS:
+            rates.load_s = _ewma(rates.load_s, load)
+        prompt_count = stats.get("prompt_eval_count")
+        prompt_duration = stats.get("prompt_eval_duration")
+        if prompt_count and prompt_duration:
+            prompt_rate = prompt_count / (prompt_duration / _NANOS)
+            rates.prompt_tokens_per_s = _ewma(rates.prompt_tokens_per_s, prompt_rate)
+        eval_count = stats.get("eval_count")
+        eval_duration = stats.get("eval_duration")
+        if eval_count and eval_duration:
+            eval_rate = eval_count / (eval_duration / _NANOS)
+            rates.eval_tokens_per_s = _ewma(rates.eval_tokens_per_s, eval_rate)
+            rates.eval_count = _ewma(rates.eval_count, eval_count)
+
+    def prompt_tokens_per_s(self, upstream: str, model: str) -> float | None:
+        rates = self._rates.get((upstream, model))
+        return rates.prompt_tokens_per_s if rates else None
+
+    def eval_tokens_per_s(self, upstream: str, model: str) -> float | None:
+        rates = self._rates.get((upstream, model))
+        return rates.eval_tokens_per_s if rates else None
+
+    def served_within(self, upstream: str, model: str, seconds: float) -> bool:
+        rates = self._rates.get((upstream, model))
+        if rates is None or rates.last_served is None:
+            return False
+        return self._clock() - rates.last_served < seconds
+
+    def estimate(
+        self,
+        upstream: str,
+        model: str,
+        prompt_tokens: int,
+        num_predict: int | None,
+        loaded: bool,
+        ahead: int = 0,
+        slots: int = 1,
+    ) -> Estimate:
+        rates = self._rates.get((upstream, model)) or _Rates()
+        queue_s = ahead * (rates.service_s or 0.0) / max(slots, 1)
+        load_s = 0.0 if loaded else rates.load_s or 0.0
+        prompt_s = prompt_tokens / rates.prompt_tokens_per_s if rates.prompt_tokens_per_s else 0.0
+        output_tokens = num_predict if num_predict and num_predict > 0 else rates.eval_count or 0.0
+        eval_s = output_tokens / rates.eval_tokens_per_s if rates.eval_tokens_per_s else 0.0
+        return Estimate(
+            queue_s=queue_s,
+            load_s=load_s,
+            prompt_s=prompt_s,
+            eval_s=eval_s,
+            loaded=loaded,
+            observed=rates.service_s is not None,
+        )
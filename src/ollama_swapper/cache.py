@@ -0,0 +1,117 @@
+# Short-TTL cache with ETags and request coalescing for Ollama metadata endpoints.
+# Usage: entry = await cache.get(key, fetch, ttl); cache.invalidate() after pull/delete/create/copy
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+# (method, path) pairs served from the cache; everything else is forwarded as-is.
+CACHEABLE = {
+    ("GET", "api/tags"),
+    ("GET", "api/ps"),
+    ("GET", "api/version"),
+    ("POST", "api/show"),
+}
+# Forwarding any of these changes what the metadata endpoints return.
+INVALIDATING_PATHS = {"api/pull", "api/delete", "api/create", "api/copy"}
+
+# Upstream headers that describe the wire encoding rather than the cached body.
+_DROPPED_HEADERS = {
+    "content-length",
+    "content-encoding",
+    "transfer-encoding",
+    "connection",
+    "keep-alive",
+    "date",
+}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    etag: str
+
+
+def make_entry(status_code: int, headers: dict[str, str], body: bytes) -> CachedResponse:
+    kept = {key: value for key, value in headers.items() if key.lower() not in _DROPPED_HEADERS}
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    return CachedResponse(status_code, kept, body, etag)
+
+
+def cache_key(method: str, path: str, query: str, body: bytes) -> tuple[str, str, str, bytes]:
+    """Key a request; /api/show bodies are normalised so key order and spacing don't matter."""
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+    return method, path, query, body
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class MetadataCache:
+    """TTL cache in which concurrent misses for one key share a single upstream fetch.
+
+    Only 200 responses are stored; errors are handed to every coalesced waiter
+    but the next request fetches again.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._entries: dict[tuple[str, str, str, bytes], tuple[float, CachedResponse]] = {}
+        self._inflight: dict[tuple[str, str, str, bytes], asyncio.Future[CachedResponse]] = {}
+        self._generation = 0
+
+    async def get(
+        self,
+        key: tuple[str, str, str, bytes],
+        fetch: Callable[[], Awaitable[CachedResponse]],
+        ttl: float,
+    ) -> tuple[CachedResponse, str]:
+        """Return ``(entry, outcome)`` where outcome is ``hit``, ``coalesced`` or ``miss``."""
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] > self._clock():
+            return cached[1], "hit"
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), "coalesced"
+
+        # The fetch runs as its own task so a disconnecting client can't cancel it for
+        # everyone else waiting on the same key.
+        task = asyncio.ensure_future(self._fetch(key, fetch, ttl, self._generation))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task), "miss"
+
+    async def _fetch(
+        self,
+        key: tuple[str, str, str, bytes],
+        fetch: Callable[[], Awaitable[CachedResponse]],
+        ttl: float,
+        generation: int,
+    ) -> CachedResponse:
+        try:
+            entry = await fetch()
+        finally:
+            self._inflight.pop(key, None)
+        # A fetch that raced an invalidation may hold stale data; serve it once, don't store it.
+        if entry.status_code == 200 and generation == self._generation:
+            self._entries[key] = (self._clock() + ttl, entry)
+        return entry
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._generation += 1
@@ -0,0 +1,306 @@
+# Compute the largest num_ctx per model that fits a VRAM budget from /api/show metadata.
+# Usage: calibrate_models(load_fixtures(path), vram_bytes=parse_size("24GiB"))
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+from urllib.parse import urljoin
+
+import httpx
+import yaml
+
+from .config import _load_raw_config, parse_upstream
+
+KiB = 1024
+MiB = 1024 * KiB
+GiB = 1024 * MiB
+
+DEFAULT_OVERHEAD_BYTES = 768 * MiB
+
+# Bytes per cached K/V element for Ollama's OLLAMA_KV_CACHE_TYPE values.
+KV_CACHE_BYTES = {
+    "f16": 2.0,
+    "q8_0": 1.0625,
+    "q4_0": 0.5625,
+}
+
+# Approximate bits per weight for common GGUF quantisation levels, used only
+# when the recorded metadata does not carry the on-disk model size.
+QUANT_BITS_PER_WEIGHT = {
+    "F32": 32.0,
+    "F16": 16.0,
+    "BF16": 16.0,
+    "Q8_0": 8.5,
+    "Q6_K": 6.5625,
+    "Q5_K_M": 5.69,
+    "Q5_K_S": 5.54,
+    "Q5_1": 6.0,
+    "Q5_0": 5.5,
+    "Q4_K_M": 4.85,
+    "Q4_K_S": 4.58,
+    "Q4_1": 5.0,
+    "Q4_0": 4.5,
+    "MXFP4": 4.25,
+    "Q3_K_L": 4.27,
+    "Q3_K_M": 3.91,
+    "Q3_K_S": 3.5,
+    "Q2_K": 2.63,
+}
+
+_SIZE_RE = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*([KMGT]?)(i?)B?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 0, "K": 1, "M": 2, "G": 3, "T": 4}
+
+
+@dataclass(frozen=True)
+class ModelArchitecture:
+    architecture: str
+    block_count: int
+    kv_heads: tuple[int, ...]
+    key_length: int
+    value_length: int
+    context_length: int | None
+    weight_bytes: int
+
+
+@dataclass
+class Calibration:
+    model: str
+    num_ctx: int | None
+    kv_bytes_per_token: int
+    weight_bytes: int
+    context_length: int | None
+    tiers: dict[float, int | None] = field(default_factory=dict)
+    error: str | None = None
+
+
+def parse_size(value: str | int | float) -> int:
+    """Parse sizes such as ``24GiB``, ``24G`` or a plain byte count.
+
+    Unit suffixes are always binary: GPU vendors quote "24GB" cards that hold 24GiB.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_RE.match(value)
+    if not match:
+        raise ValueError(f"invalid size: {value!r}")
+    number, unit, _ = match.groups()
+    return int(float(number) * 1024 ** _SIZE_UNITS[unit.upper()])
+
+
+def _info_value(info: Mapping[str, Any], arch: str, key: str) -> Any:
+    return info.get(f"{arch}.{key}")
+
+
+def parse_architecture(show: Mapping[str, Any]) -> ModelArchitecture:
+    """Extract the KV-cache relevant fields from an /api/show response."""
+    if show.get("error"):
+        raise ValueError(str(show["error"]))
+    info = show.get("model_info") or {}
+    arch = info.get("general.architecture")
+    if not arch:
+        raise ValueError("model_info is missing general.architecture")
+
+    block_count = _info_value(info, arch, "block_count")
+    head_count = _info_value(info, arch, "attention.head_count")
+    if not block_count or not head_count:
+        raise ValueError(f"model_info is missing block_count/head_count for {arch}")
+    if isinstance(head_count, list):
+        head_count = max(head_count)
+
+    kv_raw = _info_value(info, arch, "attention.head_count_kv") or head_count
+    if isinstance(kv_raw, list):
+        kv_heads = tuple(int(value) for value in kv_raw)
+    else:
+        kv_heads = (int(kv_raw),) * int(block_count)
+
+    embedding = _info_value(info, arch, "embedding_length")
+    default_head_dim = int(embedding) // int(head_count) if embedding else 0
+    key_length = int(_info_value(info, arch, "attention.key_length") or default_head_dim)
+    value_length = int(_info_value(info, arch, "attention.value_length") or key_length)
+    if not key_length:
+        raise ValueError(f"cannot determine attention head size for {arch}")
+
+    context_length = _info_value(info, arch, "context_length")
+    return ModelArchitecture(
+        architecture=arch,
+        block_count=int(block_count),
+        kv_heads=kv_heads,
+        key_length=key_length,
+        value_length=value_length,
+        context_length=int(context_length) if context_length else None,
+        weight_bytes=_weight_bytes(show, info),
+    )
+
+
+def _weight_bytes(show: Mapping[str, Any], info: Mapping[str, Any]) -> int:
+    if show.get("size"):
+        return int(show["size"])
+    params = info.get("general.parameter_count")
+    quant = str((show.get("details") or {}).get("quantization_level", "")).upper()
+    if not params or quant not in QUANT_BITS_PER_WEIGHT:
+        raise ValueError("model size unknown: record /api/tags size or parameter_count")
+    return int(params * QUANT_BITS_PER_WEIGHT[quant] / 8)
+
+
+def kv_bytes_per_token(arch: ModelArchitecture, kv_cache_type: str = "f16") -> int:
+    if kv_cache_type not in KV_CACHE_BYTES:
+        raise ValueError(f"unknown kv cache type: {kv_cache_type}")
+    elements = sum(arch.kv_heads) * (arch.key_length + arch.value_length)
+    return int(elements * KV_CACHE_BYTES[kv_cache_type] + 0.5)
+
+
+def max_num_ctx(
+    arch: ModelArchitecture,
+    vram_bytes: int,
+    kv_cache_type: str = "f16",
+    overhead_bytes: int = DEFAULT_OVERHEAD_BYTES,
+    parallel: int = 1,
+    step: int = 1024,
+) -> int | None:
+    """Largest num_ctx (a multiple of ``step``) whose KV cache fits next to the weights.
+
+    Returns None when the weights alone exceed the budget. Sliding-window layers
+    are costed as full attention, so results err on the conservative side.
+    """
+    free = vram_bytes - arch.weight_bytes - overhead_bytes
+    per_token = kv_bytes_per_token(arch, kv_cache_type) * max(parallel, 1)
+    if free <= 0 or per_token <= 0:
+        return None
+    num_ctx = free // per_token
+    if arch.context_length:
+        num_ctx = min(num_ctx, arch.context_length)
+    if step > 1:
+        num_ctx -= num_ctx % step
+    return int(num_ctx) if num_ctx > 0 else None
+
+
+def calibrate_models(
+    shows: Mapping[str, Mapping[str, Any]],
+    vram_bytes: int,
+    kv_cache_type: str = "f16",
+    overhead_bytes: int = DEFAULT_OVERHEAD_BYTES,
+    parallel: int = 1,
+    step: int = 1024,
+    tiers: Iterable[float] = (),
+) -> list[Calibration]:
+    tier_list = list(tiers)
+    results: list[Calibration] = []
+    for model, show in shows.items():
+        try:
+            arch = parse_architecture(show)
+        except ValueError as exc:
+            results.append(
+                Calibration(
+                    model=model,
+                    num_ctx=None,
+                    kv_bytes_per_token=0,
+                    weight_bytes=0,
+                    context_length=None,
+                    error=str(exc),
+                )
+            )
+            continue
+
+        fits = {
+            fraction: max_num_ctx(
+                arch, int(vram_bytes * fraction), kv_cache_type, overhead_bytes, parallel, step
+            )
+            for fraction in [1.0, *tier_list]
+        }
+        num_ctx = fits[1.0]
+        results.append(
+            Calibration(
+                model=model,
+                num_ctx=num_ctx,
+                kv_bytes_per_token=kv_bytes_per_token(arch, kv_cache_type),
+                weight_bytes=arch.weight_bytes,
+                context_length=arch.context_length,
+                tiers={fraction: fits[fraction] for fraction in tier_list},
+                error=None if num_ctx else "weights do not fit in the VRAM budget",
+            )
+        )
+    return results
+
+
+def load_fixtures(path: str | Path) -> dict[str, dict[str, Any]]:
+    """Load recorded /api/show responses keyed by model name."""
+    with Path(path).open("r", encoding="utf-8") as handle:
+        raw = json.load(handle)
+    if not isinstance(raw, dict):
+        raise ValueError("fixtures must be a JSON object keyed by model name")
+    return raw
+
+
+async def fetch_shows(
+    upstream: str,
+    models: Iterable[str] | None = None,
+    concurrency: int = 8,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Fetch /api/show for each model (all of /api/tags by default).
+
+    The on-disk ``size`` from /api/tags is merged into each response so the
+    result can be saved with ``--record`` and replayed offline. A model whose
+    /api/show fails gets an ``{"error": ...}`` entry instead of aborting the run.
+    """
+    target = parse_upstream(upstream)
+    base = target.base_url.rstrip("/") + "/"
+    if transport is None and target.uds:
+        transport = httpx.AsyncHTTPTransport(uds=target.uds)
+    async with httpx.AsyncClient(timeout=60.0, transport=transport) as client:
+        tags = await client.get(urljoin(base, "api/tags"))
+        tags.raise_for_status()
+        sizes = {
+            entry.get("name"): entry.get("size")
+            for entry in tags.json().get("models", [])
+        }
+        names = list(models) if models else list(sizes)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def show(name: str) -> tuple[str, dict[str, Any]]:
+            try:
+                async with semaphore:
+                    response = await client.post(
+                        urljoin(base, "api/show"), json={"model": name}
+                    )
+                response.raise_for_status()
+            except httpx.HTTPStatusError as exc:
+                return name, {"error": f"/api/show returned {exc.response.status_code}"}
+            except httpx.HTTPError as exc:
+                return name, {"error": f"/api/show failed: {exc}"}
+            payload = response.json()
+            if sizes.get(name):
+                payload["size"] = sizes[name]
+            return name, payload
+
+        pairs = await asyncio.gather(*(show(name) for name in names))
+    return dict(pairs)
+
+
+def write_policy(
+    results: Iterable[Calibration],
+    output: str | Path,
+    base_config: str | Path | None = None,
+) -> None:
+    """Write calibrated num_ctx values as a policy file, merging into ``base_config``."""
+    raw: dict[str, Any] = {}
+    if base_config is not None:
+        raw = dict(_load_raw_config(Path(base_config)))
+    models = raw.setdefault("policy", {}).setdefault("models", {})
+    for result in results:
+        if result.num_ctx is None:
+            continue
+        entry = models.get(result.model) or {}
+        entry["num_ctx"] = result.num_ctx
+        models[result.model] = entry
+
+    output_path = Path(output)
+    with output_path.open("w", encoding="utf-8") as handle:
+        if output_path.suffix.lower() in {".yaml", ".yml"}:
+            yaml.safe_dump(raw, handle, sort_keys=False, allow_unicode=True)
+        else:
+            json.dump(raw, handle, indent=2, ensure_ascii=False)
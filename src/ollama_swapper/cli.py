@@ -2,6 +2,13 @@
 # Usage examples:
 #   ollama-swapper proxy --config /path/to/config.yaml
 #   ollama-swapper ps | ollama-swapper sweep | ollama-swapper stop llama3:latest
+#   ollama-swapper top --config /path/to/config.yaml
+#   ollama-swapper calibrate --vram 24GiB --config config.yaml --output config.yaml
+#   ollama-swapper simulate --config config.yaml --profiles profiles.yaml --trace trace.jsonl --vram 24GiB
+#
+# Commands import their dependencies inside the function body: `ps`, `sweep` and
+# `stop` run from cron and health checks and must not pay for uvicorn/FastAPI/httpx.
+# tests/test_cli.py enforces this.
 from __future__ import annotations
 
 import json
@@ -9,11 +16,6 @@ import sys
 from pathlib import Path
 
 import typer
-import uvicorn
-
-from .config import load_config
-from .proxy import build_proxy_app, parse_listen
-from .sweep import parse_ps_output, run_ps, stop_models
 
 app = typer.Typer(help="Ollama swapper CLI")
 
@@ -22,29 +24,117 @@ app = typer.Typer(help="Ollama swapper CLI")
 def proxy_start(
     config: Path = typer.Option(..., "--config", "-c", exists=True),
     verbose: bool = typer.Option(False, "--verbose", "-v"),
+    lean: bool = typer.Option(False, "--lean", help="Serve proxied traffic from a raw ASGI path"),
+    workers: int = typer.Option(1, "--workers", "-w", min=1),
+    loop: str = typer.Option("auto", "--loop", help="auto | asyncio | uvloop"),
+    http: str = typer.Option("auto", "--http", help="auto | h11 | httptools"),
 ) -> None:
     """Start the proxy server."""
+    import os
+
+    import uvicorn
+
+    from .config import load_config
+    from .proxy import CONFIG_PATH_ENV, LEAN_ENV, VERBOSE_ENV, build_proxy_app, parse_listen
+    from .state import STATE_ADDRESS_ENV, StateServer
+
     loaded_config = load_config(config)
+    if loaded_config.scheduler is not None and workers > 1:
+        # Queues and token buckets live in each worker, so N workers would each admit
+        # max_concurrency requests and their own rate limits.
+        typer.echo("The scheduler section requires --workers 1.", err=True)
+        raise typer.Exit(code=1)
     listen = parse_listen(loaded_config.server.listen)
-    proxy_app = build_proxy_app(loaded_config, verbose=verbose)
-    uvicorn.run(
-        proxy_app,
-        host=listen.host,
-        port=listen.port,
-        log_level="debug" if verbose else "info",
-    )
+    log_level = "debug" if verbose else "info"
+    if workers == 1:
+        proxy_app = build_proxy_app(loaded_config, verbose=verbose, lean=lean)
+        uvicorn.run(
+            proxy_app,
+            host=listen.host,
+            port=listen.port,
+            log_level=log_level,
+            loop=loop,
+            http=http,
+        )
+        return
+
+    # Workers share one listening socket via uvicorn's multiprocess supervisor and
+    # per-model state through a StateServer owned by this process.
+    state_server = StateServer().start()
+    os.environ[STATE_ADDRESS_ENV] = state_server.address
+    os.environ[CONFIG_PATH_ENV] = str(config.resolve())
+    os.environ[VERBOSE_ENV] = "1" if verbose else "0"
+    os.environ[LEAN_ENV] = "1" if lean else "0"
+    try:
+        uvicorn.run(
+            "ollama_swapper.proxy:create_app",
+            factory=True,
+            host=listen.host,
+            port=listen.port,
+            log_level=log_level,
+            workers=workers,
+            loop=loop,
+            http=http,
+        )
+    finally:
+        state_server.close()
 
 
 @app.command("ps")
-def ps_command() -> None:
+def ps_command(
+    as_json: bool = typer.Option(False, "--json", help="Print loaded models as JSON"),
+) -> None:
     """Show models loaded in Ollama."""
+    from .sweep import parse_ps_rows, run_ps
+
     output = run_ps()
+    if as_json:
+        typer.echo(json.dumps(parse_ps_rows(output), indent=2))
+        return
     typer.echo(output)
 
 
+@app.command("top")
+def top_command(
+    url: str | None = typer.Option(None, "--url", help="Proxy base URL"),
+    config: Path | None = typer.Option(None, "--config", "-c", exists=True),
+    interval: float = typer.Option(0.5, "--interval", "-n", min=0.1, help="Seconds"),
+    once: bool = typer.Option(False, "--once", help="Print one snapshot and exit"),
+) -> None:
+    """Live view of a running proxy's models, queues and throughput."""
+    import httpx
+
+    from .top import Frame, apply_delta, iter_messages, proxy_url, render
+
+    if url is None and config is not None:
+        from .config import load_config
+
+        url = proxy_url(load_config(config).server.listen)
+    base = url or "http://127.0.0.1:11434"
+    interactive = sys.stdout.isatty() and not once
+    frame: Frame | None = None
+    try:
+        for message in iter_messages(base, interval, count=1 if once else None):
+            if message["type"] == "snapshot":
+                frame = message
+            elif frame is None:
+                continue  # a delta needs the snapshot it applies to
+            else:
+                frame = apply_delta(frame, message)
+            # Home the cursor and clear, so each frame redraws in place.
+            typer.echo(("\x1b[H\x1b[2J" if interactive else "") + render(frame, base))
+    except KeyboardInterrupt:
+        return
+    except httpx.HTTPError as exc:
+        typer.echo(f"Cannot read {base}/_swapper/top: {exc}", err=True)
+        raise typer.Exit(code=1) from None
+
+
 @app.command("sweep")
 def sweep_command() -> None:
     """Stop all models currently loaded in Ollama."""
+    from .sweep import parse_ps_output, run_ps, stop_models
+
     output = run_ps()
     models = parse_ps_output(output)
     if not models:
@@ -60,6 +150,8 @@ def sweep_command() -> None:
 @app.command("stop")
 def stop_command(model: str) -> None:
     """Stop a single model."""
+    from .sweep import stop_models
+
     result = stop_models([model])
     if result.failed:
         typer.echo(f"Failed to stop: {model}")
@@ -67,6 +159,98 @@ def stop_command(model: str) -> None:
     typer.echo(f"Stopped: {model}")
 
 
+@app.command("calibrate")
+def calibrate_command(
+    vram: str = typer.Option(..., "--vram", help="VRAM budget, e.g. 24GiB"),
+    config: Path | None = typer.Option(None, "--config", "-c", exists=True),
+    fixtures: Path | None = typer.Option(
+        None, "--fixtures", exists=True, help="Recorded /api/show responses (JSON)"
+    ),
+    record: Path | None = typer.Option(None, "--record", help="Save fetched /api/show responses"),
+    upstream: str | None = typer.Option(None, "--upstream", help="Ollama base URL"),
+    models: list[str] = typer.Option([], "--model", "-m"),
+    kv_cache_type: str = typer.Option("f16", "--kv-cache-type"),
+    overhead: str = typer.Option("768MiB", "--overhead"),
+    parallel: int = typer.Option(1, "--parallel"),
+    step: int = typer.Option(1024, "--step"),
+    tiers: list[float] = typer.Option([], "--tier", help="Also fit a fraction of the budget"),
+    output: Path | None = typer.Option(None, "--output", "-o"),
+) -> None:
+    """Compute the largest num_ctx per model that fits the VRAM budget."""
+    import asyncio
+
+    from .calibrate import calibrate_models, fetch_shows, load_fixtures, parse_size, write_policy
+    from .config import load_config
+
+    loaded_config = load_config(config) if config else None
+    if fixtures:
+        shows = load_fixtures(fixtures)
+        if models:
+            shows = {name: shows[name] for name in models if name in shows}
+    else:
+        base = upstream or (
+            loaded_config.server.upstream if loaded_config else "http://127.0.0.1:11434"
+        )
+        names = models or None
+        if not names and loaded_config:
+            # Models routed to their own upstream aren't served by this Ollama.
+            names = [
+                name
+                for name, policy in loaded_config.policy.models.items()
+                if policy.upstream is None
+            ]
+        shows = asyncio.run(fetch_shows(base, names))
+        if record:
+            record.write_text(json.dumps(shows, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    results = calibrate_models(
+        shows,
+        vram_bytes=parse_size(vram),
+        kv_cache_type=kv_cache_type,
+        overhead_bytes=parse_size(overhead),
+        parallel=parallel,
+        step=step,
+        tiers=tiers,
+    )
+    for result in results:
+        tier_text = " ".join(f"{fraction:g}x={ctx}" for fraction, ctx in result.tiers.items())
+        typer.echo(
+            f"{result.model}\tnum_ctx={result.num_ctx}\t"
+            f"kv/token={result.kv_bytes_per_token}B\tweights={result.weight_bytes}B"
+            + (f"\t{tier_text}" if tier_text else "")
+            + (f"\t({result.error})" if result.error else "")
+        )
+    if output:
+        write_policy(results, output, base_config=config)
+        typer.echo(f"Wrote {output}")
+
+
+@app.command("simulate")
+def simulate_command(
+    config: Path = typer.Option(..., "--config", "-c", exists=True),
+    profiles: Path = typer.Option(..., "--profiles", exists=True),
+    trace: Path = typer.Option(..., "--trace", exists=True),
+    vram: str = typer.Option(..., "--vram", help="VRAM budget, e.g. 24GiB"),
+    max_loaded: int | None = typer.Option(None, "--max-loaded"),
+    scheduling: str = typer.Option("fifo", "--scheduling", help="fifo | first-fit"),
+) -> None:
+    """Replay a request trace against the configured policy and report latency."""
+    from .calibrate import parse_size
+    from .config import load_config
+    from .simulate import load_profiles, load_trace, simulate
+
+    loaded_config = load_config(config)
+    result = simulate(
+        load_trace(trace),
+        load_profiles(profiles),
+        loaded_config.policy,
+        vram_bytes=parse_size(vram),
+        max_loaded=max_loaded,
+        scheduling=scheduling,
+    )
+    typer.echo(json.dumps(result.summary(), indent=2))
+
+
 def main() -> None:
     app()
 
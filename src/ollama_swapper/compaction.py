@@ -0,0 +1,164 @@
+# Approximate token counting and history compaction so chat prompts fit the policy num_ctx.
+# Usage: result = compact_messages(messages, budget=int(num_ctx * 0.75), counter=TokenCounter())
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+# Chat-template tokens around each message (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+# Flat charge for an attached image; real cost depends on the vision encoder.
+IMAGE_TOKENS = 768
+_TRIM_MARKER = "…"
+
+# ASCII words, short digit runs, single non-ASCII characters (CJK is ~1 token each)
+# and single punctuation marks.
+_TOKEN_RE = re.compile(r"[A-Za-z]+|[0-9]{1,3}|[^\x00-\x7f]|[^\sA-Za-z0-9]")
+
+
+def approx_tokens(text: str) -> int:
+    """Fast BPE-like estimate: long ASCII words cost one token per ~4 letters."""
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        length = match.end() - match.start()
+        count += math.ceil(length / 4) if length > 4 and text[match.start()].isalpha() else 1
+    return count
+
+
+def _digest(*parts: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = part.encode("utf-8", "surrogatepass")
+        # Length prefixes keep ("ab", "c") and ("a", "bc") apart.
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class TokenCounter:
+    """Per-message token counts, cached so a growing chat history is only counted once.
+
+    Entries are keyed by a digest of the message, so the cache holds counts rather
+    than copies of every recent message body.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self._max_entries = max_entries
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+
+    def count_message(self, message: dict[str, Any]) -> int:
+        content = message.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False) if content is not None else ""
+        tool_calls = message.get("tool_calls")
+        extra = json.dumps(tool_calls, ensure_ascii=False, sort_keys=True) if tool_calls else ""
+        key = _digest(str(message.get("role", "")), content, extra)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = MESSAGE_OVERHEAD_TOKENS + approx_tokens(content) + approx_tokens(extra)
+            self._cache[key] = cached
+            if len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return cached + IMAGE_TOKENS * len(message.get("images") or [])
+
+    def count(self, messages: list[dict[str, Any]]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+
+@dataclass(frozen=True)
+class CompactionResult:
+    messages: list[dict[str, Any]]
+    tokens_before: int
+    tokens_after: int
+    dropped: int = 0
+    trimmed: int = 0
+
+    @property
+    def tokens_removed(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _units(messages: list[dict[str, Any]]) -> list[list[int]]:
+    """Group message indexes so an assistant tool call stays with its tool results."""
+    units: list[list[int]] = []
+    for index, message in enumerate(messages):
+        if message.get("role") == "tool" and units and messages[units[-1][0]].get("tool_calls"):
+            units[-1].append(index)
+        else:
+            units.append([index])
+    return units
+
+
+def _trim_head(
+    message: dict[str, Any], keep_tokens: int, counter: TokenCounter
+) -> dict[str, Any]:
+    """Keep roughly the last ``keep_tokens`` of a text message."""
+    content = message["content"]
+    content_tokens = max(counter.count_message(message) - MESSAGE_OVERHEAD_TOKENS, 1)
+    keep_content_tokens = max(keep_tokens - MESSAGE_OVERHEAD_TOKENS, 0)
+    keep_chars = int(len(content) * keep_content_tokens / content_tokens)
+    return {**message, "content": _TRIM_MARKER + content[len(content) - keep_chars :]}
+
+
+def compact_messages(
+    messages: list[dict[str, Any]], budget: int, counter: TokenCounter
+) -> CompactionResult:
+    """Drop the oldest turns (trimming the last one dropped if that is enough) to fit ``budget``.
+
+    System messages and the final turn are always kept, and an assistant message
+    with tool calls is kept or dropped together with its tool results.
+    """
+    counts = [counter.count_message(message) for message in messages]
+    total = sum(counts)
+    if total <= budget:
+        return CompactionResult(messages, total, total)
+
+    units = _units(messages)
+    removable = [
+        unit
+        for unit in units[:-1]
+        if not any(messages[index].get("role") == "system" for index in unit)
+    ]
+    dropped: set[int] = set()
+    replaced: dict[int, dict[str, Any]] = {}
+    excess = total - budget
+    for unit in removable:
+        if excess <= 0:
+            break
+        unit_tokens = sum(counts[index] for index in unit)
+        message = messages[unit[0]]
+        can_trim = (
+            len(unit) == 1
+            and isinstance(message.get("content"), str)
+            and not message.get("images")
+            and unit_tokens - excess > MESSAGE_OVERHEAD_TOKENS * 4
+        )
+        if can_trim:
+            # One message of slack for the approximate character-to-token mapping.
+            keep_tokens = unit_tokens - excess - MESSAGE_OVERHEAD_TOKENS
+            trimmed = _trim_head(message, keep_tokens, counter)
+            replaced[unit[0]] = trimmed
+            excess -= unit_tokens - counter.count_message(trimmed)
+            break
+        dropped.update(unit)
+        excess -= unit_tokens
+
+    kept = [
+        replaced.get(index, message)
+        for index, message in enumerate(messages)
+        if index not in dropped
+    ]
+    return CompactionResult(
+        kept,
+        tokens_before=total,
+        tokens_after=counter.count(kept),
+        dropped=len(dropped),
+        trimmed=len(replaced),
+    )
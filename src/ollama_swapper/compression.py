@@ -0,0 +1,125 @@
+# Accept-Encoding negotiation and gzip/zstd encoders for proxy responses.
+# Usage: encoding = negotiate(headers.get("accept-encoding")); body = compress(body, encoding)
+from __future__ import annotations
+
+import zlib
+from typing import AsyncIterator, Callable, Protocol
+
+try:  # optional: pip install ollama-swapper[zstd]
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - exercised when the extra is missing
+    zstandard = None  # type: ignore[assignment]
+
+# Server preference when the client rates several encodings equally.
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class _Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far so the client can decode it now."""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        assert zstandard is not None
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# zstd level 3 is its default; gzip level 6 is zlib's.
+_ENCODERS: dict[str, tuple[Callable[[int], _Encoder], int]] = {"gzip": (_GzipEncoder, 6)}
+if zstandard is not None:
+    _ENCODERS["zstd"] = (_ZstdEncoder, 3)
+
+
+def _encoder(encoding: str, level: int | None) -> _Encoder:
+    factory, default_level = _ENCODERS[encoding]
+    return factory(default_level if level is None else level)
+
+
+def negotiate(
+    accept_encoding: str | None, supported: tuple[str, ...] = SUPPORTED_ENCODINGS
+) -> str | None:
+    """Pick the client's highest-rated supported encoding, or None for identity."""
+    if not accept_encoding:
+        return None
+    ratings: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ratings[name.strip().lower()] = quality
+    wildcard = ratings.get("*", 0.0)
+    best: str | None = None
+    best_quality = 0.0
+    for encoding in supported:
+        quality = ratings.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, level: int | None = None) -> bytes:
+    encoder = _encoder(encoding, level)
+    return encoder.compress(body) + encoder.finish()
+
+
+async def compress_stream(
+    chunks: AsyncIterator[bytes],
+    encoding: str,
+    level: int | None = None,
+    on_finish: Callable[[int, int], None] | None = None,
+) -> AsyncIterator[bytes]:
+    """Compress a stream, flushing after every chunk so NDJSON lines arrive without delay.
+
+    ``on_finish(bytes_in, bytes_out)`` is called once the stream has been fully sent.
+    """
+    encoder = _encoder(encoding, level)
+    bytes_in = bytes_out = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        bytes_in += len(chunk)
+        out = encoder.compress(chunk) + encoder.flush()
+        bytes_out += len(out)
+        yield out
+    tail = encoder.finish()
+    bytes_out += len(tail)
+    yield tail
+    if on_finish is not None:
+        on_finish(bytes_in, bytes_out)
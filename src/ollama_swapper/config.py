@@ -10,10 +10,53 @@ from typing import Any, Mapping
 import yaml
 
 
+UNIX_SCHEME = "unix://"
+
+
+@dataclass(frozen=True)
+class UpstreamTarget:
+    """HTTP base URL for an upstream plus the Unix socket it is reached through, if any."""
+
+    base_url: str
+    uds: str | None = None
+
+
+def parse_upstream(upstream: str) -> UpstreamTarget:
+    """Split ``unix:///path/to.sock`` upstreams into a socket path and a placeholder base URL."""
+    if upstream.startswith(UNIX_SCHEME):
+        path = upstream[len(UNIX_SCHEME) :]
+        if not path:
+            raise ValueError("unix upstream must include a socket path")
+        return UpstreamTarget(base_url="http://localhost", uds=path)
+    return UpstreamTarget(base_url=upstream)
+
+
+@dataclass
+class CacheConfig:
+    """Short-TTL cache for /api/tags, /api/show, /api/version and /api/ps."""
+
+    enabled: bool = True
+    ttl: float = 5.0
+    ps_ttl: float = 0.5
+
+
+@dataclass
+class CompressionConfig:
+    """gzip/zstd for clients that send Accept-Encoding; bodies under ``min_size`` stay plain."""
+
+    enabled: bool = True
+    min_size: int = 1024
+    streams: bool = True
+    gzip_level: int = 6
+    zstd_level: int = 3
+
+
 @dataclass
 class ServerConfig:
     listen: str
     upstream: str
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    compression: CompressionConfig = field(default_factory=CompressionConfig)
 
 
 @dataclass
@@ -22,11 +65,40 @@ class PolicyDefaults:
     keep_alive: int | str | None = None
 
 
+@dataclass
+class HedgePolicy:
+    upstream: str
+    after_ms: int = 2000
+    api: str = "ollama"
+    budget_percent: float = 10.0
+
+
+@dataclass
+class MirrorPolicy:
+    upstream: str
+    api: str = "ollama"
+    sample_rate: float = 0.1
+    max_concurrency: int = 2
+
+
+@dataclass
+class CompactionPolicy:
+    """Trim chat history to ``target_fraction`` of the request's num_ctx."""
+
+    target_fraction: float = 0.75
+
+
 @dataclass
 class ModelPolicy:
     num_ctx: int | None = None
     keep_alive: int | str | None = None
     upstream: str | None = None
+    http2: bool = False
+    hedge: HedgePolicy | None = None
+    mirror: MirrorPolicy | None = None
+    compaction: CompactionPolicy | None = None
+    # OpenAI-compat upstreams: send each tool call as soon as its arguments are complete.
+    early_tool_calls: bool = False
 
 
 @dataclass
@@ -35,10 +107,31 @@ class PolicyConfig:
     models: dict[str, ModelPolicy] = field(default_factory=dict)
 
 
+@dataclass
+class PriorityClass:
+    weight: float = 1.0
+    # Per-client limits inside this class; None means unlimited.
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+
+
+@dataclass
+class SchedulerConfig:
+    """Priority classification, weighted fair queuing and per-client rate limits."""
+
+    max_concurrency: int = 1
+    default_class: str = "default"
+    header: str = "x-swapper-priority"
+    api_keys: dict[str, str] = field(default_factory=dict)
+    clients: dict[str, str] = field(default_factory=dict)
+    classes: dict[str, PriorityClass] = field(default_factory=dict)
+
+
 @dataclass
 class AppConfig:
     server: ServerConfig
     policy: PolicyConfig
+    scheduler: SchedulerConfig | None = None
 
 
 def _load_raw_config(path: Path) -> Mapping[str, Any]:
@@ -56,11 +149,132 @@ def _parse_policy_defaults(raw: Mapping[str, Any]) -> PolicyDefaults:
     )
 
 
+def _parse_cache_config(raw: Mapping[str, Any] | bool | None) -> CacheConfig:
+    if raw is None:
+        return CacheConfig()
+    if isinstance(raw, bool):
+        return CacheConfig(enabled=raw)
+    return CacheConfig(
+        enabled=bool(raw.get("enabled", True)),
+        ttl=float(raw.get("ttl", 5.0)),
+        ps_ttl=float(raw.get("ps_ttl", 0.5)),
+    )
+
+
+def _parse_compression_config(raw: Mapping[str, Any] | bool | None) -> CompressionConfig:
+    if raw is None:
+        return CompressionConfig()
+    if isinstance(raw, bool):
+        return CompressionConfig(enabled=raw)
+    return CompressionConfig(
+        enabled=bool(raw.get("enabled", True)),
+        min_size=int(raw.get("min_size", 1024)),
+        streams=bool(raw.get("streams", True)),
+        gzip_level=int(raw.get("gzip_level", 6)),
+        zstd_level=int(raw.get("zstd_level", 3)),
+    )
+
+
+def _parse_hedge_policy(raw: Mapping[str, Any] | None) -> HedgePolicy | None:
+    if not raw:
+        return None
+    if "upstream" not in raw:
+        raise ValueError("hedge policy must include upstream")
+    api = raw.get("api", "ollama")
+    if api not in {"ollama", "openai"}:
+        raise ValueError("hedge api must be 'ollama' or 'openai'")
+    return HedgePolicy(
+        upstream=raw["upstream"],
+        after_ms=int(raw.get("after_ms", 2000)),
+        api=api,
+        budget_percent=float(raw.get("budget_percent", 10.0)),
+    )
+
+
+def _parse_mirror_policy(raw: Mapping[str, Any] | None) -> MirrorPolicy | None:
+    if not raw:
+        return None
+    if "upstream" not in raw:
+        raise ValueError("mirror policy must include upstream")
+    api = raw.get("api", "ollama")
+    if api not in {"ollama", "openai"}:
+        raise ValueError("mirror api must be 'ollama' or 'openai'")
+    sample_rate = float(raw.get("sample_rate", 0.1))
+    if not 0.0 <= sample_rate <= 1.0:
+        raise ValueError("mirror sample_rate must be between 0 and 1")
+    max_concurrency = int(raw.get("max_concurrency", 2))
+    if max_concurrency < 1:
+        raise ValueError("mirror max_concurrency must be at least 1")
+    return MirrorPolicy(
+        upstream=raw["upstream"],
+        api=api,
+        sample_rate=sample_rate,
+        max_concurrency=max_concurrency,
+    )
+
+
+def _parse_compaction_policy(raw: Mapping[str, Any] | bool | None) -> CompactionPolicy | None:
+    if not raw:
+        return None
+    if raw is True:
+        return CompactionPolicy()
+    target_fraction = float(raw.get("target_fraction", 0.75))
+    if not 0.0 < target_fraction <= 1.0:
+        raise ValueError("compaction target_fraction must be in (0, 1]")
+    return CompactionPolicy(target_fraction=target_fraction)
+
+
 def _parse_model_policy(raw: Mapping[str, Any]) -> ModelPolicy:
     return ModelPolicy(
         num_ctx=raw.get("num_ctx"),
         keep_alive=raw.get("keep_alive"),
         upstream=raw.get("upstream"),
+        http2=bool(raw.get("http2", False)),
+        hedge=_parse_hedge_policy(raw.get("hedge")),
+        mirror=_parse_mirror_policy(raw.get("mirror")),
+        compaction=_parse_compaction_policy(raw.get("compaction")),
+        early_tool_calls=bool(raw.get("early_tool_calls", False)),
+    )
+
+
+def _parse_priority_class(raw: Mapping[str, Any] | None) -> PriorityClass:
+    raw = raw or {}
+    weight = float(raw.get("weight", 1.0))
+    if weight <= 0:
+        raise ValueError("priority class weight must be positive")
+    requests_per_minute = raw.get("requests_per_minute")
+    tokens_per_minute = raw.get("tokens_per_minute")
+    return PriorityClass(
+        weight=weight,
+        requests_per_minute=float(requests_per_minute) if requests_per_minute is not None else None,
+        tokens_per_minute=float(tokens_per_minute) if tokens_per_minute is not None else None,
+    )
+
+
+def _parse_scheduler_config(raw: Mapping[str, Any] | None) -> SchedulerConfig | None:
+    if not raw:
+        return None
+    classes = {
+        name: _parse_priority_class(class_raw)
+        for name, class_raw in (raw.get("classes") or {}).items()
+    }
+    default_class = raw.get("default_class", "default")
+    classes.setdefault(default_class, PriorityClass())
+    api_keys = dict(raw.get("api_keys") or {})
+    clients = dict(raw.get("clients") or {})
+    for name in [*api_keys.values(), *clients.values()]:
+        if name not in classes:
+            raise ValueError(f"scheduler maps to unknown priority class: {name}")
+    max_concurrency = int(raw.get("max_concurrency", 1))
+    if max_concurrency < 1:
+        raise ValueError("scheduler max_concurrency must be at least 1")
+    return SchedulerConfig(
+        max_concurrency=max_concurrency,
+        default_class=default_class,
+        header=str(raw.get("header", "x-swapper-priority")).lower(),
+        api_keys=api_keys,
+        clients=clients,
+        classes=classes,
     )
 
 
@@ -78,6 +292,8 @@ def load_config(path: str | Path) -> AppConfig:
     server = ServerConfig(
         listen=server_raw["listen"],
         upstream=server_raw["upstream"],
+        cache=_parse_cache_config(server_raw.get("cache")),
+        compression=_parse_compression_config(server_raw.get("compression")),
     )
     policy = PolicyConfig(
         defaults=_parse_policy_defaults(defaults_raw),
@@ -86,4 +302,8 @@ def load_config(path: str | Path) -> AppConfig:
             for name, model_raw in models_raw.items()
         },
     )
-    return AppConfig(server=server, policy=policy)
+    return AppConfig(
+        server=server,
+        policy=policy,
+        scheduler=_parse_scheduler_config(raw.get("scheduler")),
+    )
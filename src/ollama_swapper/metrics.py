@@ -0,0 +1,81 @@
+# In-process counters and latency summaries exposed by the proxy admin routes.
+# Usage: metrics.incr("hedge_fired", model="qwen3:8b"); metrics.observe("ttft_ms", 120.0)
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+_SAMPLE_WINDOW = 1024
+
+
+def _key(name: str, labels: dict[str, Any]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f"{label}={labels[label]}" for label in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(int(fraction * len(ordered)), len(ordered) - 1)
+    return ordered[index]
+
+
+@dataclass
+class _Summary:
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    samples: deque[float] = field(default_factory=lambda: deque(maxlen=_SAMPLE_WINDOW))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        self.samples.append(value)
+
+    def snapshot(self) -> dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": round(_percentile(ordered, 0.50), 3),
+            "p95": round(_percentile(ordered, 0.95), 3),
+            "max": round(self.maximum, 3),
+        }
+
+
+class Metrics:
+    """Counters plus count/mean/p50/p95/max summaries over a sliding sample window."""
+
+    def __init__(self) -> None:
+        self._counters: dict[str, float] = {}
+        self._summaries: dict[str, _Summary] = {}
+
+    def incr(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _key(name, labels)
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = self._summaries[key] = _Summary()
+        summary.add(value)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def summary(self, name: str, **labels: Any) -> dict[str, float] | None:
+        summary = self._summaries.get(_key(name, labels))
+        return summary.snapshot() if summary is not None else None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "counters": dict(sorted(self._counters.items())),
+            "summaries": {
+                key: summary.snapshot() for key, summary in sorted(self._summaries.items())
+            },
+        }
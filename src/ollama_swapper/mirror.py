@@ -0,0 +1,149 @@
+# Shadow-traffic sampling and the primary-vs-shadow latency/throughput report.
+# Usage: if mirrors.try_acquire(model, policy): ...; mirrors.record(model, "shadow", timer.finish())
+from __future__ import annotations
+
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .config import MirrorPolicy
+from .metrics import Metrics
+
+SIDES = ("primary", "shadow")
+# Enough of the stream's end to hold Ollama's final stats line or an OpenAI usage object.
+_TAIL_BYTES = 4096
+
+
+@dataclass(frozen=True)
+class Timing:
+    ttft_ms: float
+    total_ms: float
+    tokens: int | None = None
+
+    @property
+    def tokens_per_s(self) -> float | None:
+        generation_s = (self.total_ms - self.ttft_ms) / 1000
+        if not self.tokens or generation_s <= 0:
+            return None
+        return self.tokens / generation_s
+
+
+def completion_tokens(tail: bytes) -> int | None:
+    """Read the generated-token count from the last JSON line/SSE event of a response."""
+    for line in reversed(tail.splitlines()):
+        line = line.strip()
+        if line.startswith(b"data:"):
+            line = line[5:].strip()
+        if not line or line == b"[DONE]":
+            continue
+        try:
+            parsed = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if not isinstance(parsed, dict):
+            return None
+        if "eval_count" in parsed:
+            return int(parsed["eval_count"])
+        usage = parsed.get("usage")
+        if isinstance(usage, dict) and "completion_tokens" in usage:
+            return int(usage["completion_tokens"])
+        return None
+    return None
+
+
+class StreamTimer:
+    """Time to first chunk, total time and token count of one response body."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._started = clock()
+        self._first: float | None = None
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self._first is None:
+            self._first = self._clock()
+        self._tail = (self._tail + chunk)[-_TAIL_BYTES:]
+
+    def finish(self) -> Timing:
+        end = self._clock()
+        first = self._first if self._first is not None else end
+        return Timing(
+            ttft_ms=(first - self._started) * 1000,
+            total_ms=(end - self._started) * 1000,
+            tokens=completion_tokens(self._tail),
+        )
+
+
+class MirrorController:
+    """Decides which requests are mirrored and keeps the comparison numbers.
+
+    A request is mirrored when it wins the ``sample_rate`` draw and fewer than
+    ``max_concurrency`` shadows are running for its model; otherwise it is skipped,
+    never queued, so the shadow upstream can't back up into the primary path.
+    """
+
+    def __init__(self, metrics: Metrics, rng: Callable[[], float] = random.random) -> None:
+        self.metrics = metrics
+        self._rng = rng
+        self._running: dict[str, int] = {}
+        self._upstreams: dict[str, str] = {}
+
+    def try_acquire(self, model: str, policy: MirrorPolicy) -> bool:
+        if self._rng() >= policy.sample_rate:
+            return False
+        running = self._running.get(model, 0)
+        if running >= policy.max_concurrency:
+            self.metrics.incr("mirror_skipped", model=model)
+            return False
+        self._running[model] = running + 1
+        self._upstreams[model] = policy.upstream
+        self.metrics.incr("mirror_started", model=model)
+        return True
+
+    def release(self, model: str) -> None:
+        self._running[model] = max(self._running.get(model, 0) - 1, 0)
+
+    def record(self, model: str, side: str, timing: Timing) -> None:
+        self.metrics.observe("mirror_ttft_ms", timing.ttft_ms, model=model, side=side)
+        self.metrics.observe("mirror_total_ms", timing.total_ms, model=model, side=side)
+        tokens_per_s = timing.tokens_per_s
+        if tokens_per_s is not None:
+            self.metrics.observe("mirror_tokens_per_s", tokens_per_s, model=model, side=side)
+
+    def record_error(self, model: str) -> None:
+        self.metrics.incr("mirror_errors", model=model)
+
+    def report(self) -> dict[str, Any]:
+        """Side-by-side summaries per model, plus shadow/primary ratios of the medians."""
+        report: dict[str, Any] = {}
+        for model, upstream in sorted(self._upstreams.items()):
+            sides = {
+                side: {
+                    name: self.metrics.summary(f"mirror_{name}", model=model, side=side)
+                    for name in ("ttft_ms", "total_ms", "tokens_per_s")
+                }
+                for side in SIDES
+            }
+            ratios: dict[str, float | None] = {}
+            for name in ("ttft_ms", "total_ms", "tokens_per_s"):
+                primary, shadow = sides["primary"][name], sides["shadow"][name]
+                ratios[name] = (
+                    round(shadow["p50"] / primary["p50"], 3)
+                    if primary and shadow and primary["p50"]
+                    else None
+                )
+            report[model] = {
+                "shadow_upstream": upstream,
+                "started": self.metrics.counter("mirror_started", model=model),
+                "skipped": self.metrics.counter("mirror_skipped", model=model),
+                "errors": self.metrics.counter("mirror_errors", model=model),
+                "running": self._running.get(model, 0),
+                **sides,
+                "shadow_over_primary_p50": ratios,
+            }
+        return report
@@ -2,10 +2,26 @@
 # Usage: apply_policy(payload_dict, policy_config)
 from __future__ import annotations
 
+import math
+import re
 from typing import Any, Mapping
 
 from .config import AppConfig, PolicyConfig
 
+# Ollama's own default when neither the client nor the policy sets keep_alive.
+DEFAULT_KEEP_ALIVE_SECONDS = 300.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)")
+_DURATION_SECONDS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ms": 1e-3,
+    "s": 1.0,
+    "m": 60.0,
+    "h": 3600.0,
+}
+
 
 def _resolve_policy(model: str | None, policy: PolicyConfig) -> Mapping[str, Any]:
     resolved = {
@@ -45,3 +61,24 @@ def apply_policy(payload: dict[str, Any], policy: PolicyConfig) -> dict[str, Any
         payload["keep_alive"] = resolved["keep_alive"]
 
     return payload
+
+
+def parse_keep_alive(value: int | float | str | None) -> float:
+    """Convert an Ollama keep_alive value to seconds (``math.inf`` keeps the model loaded)."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    if isinstance(value, (int, float)):
+        return math.inf if value < 0 else float(value)
+    text = value.strip()
+    try:
+        return parse_keep_alive(float(text))
+    except ValueError:
+        pass
+    negative = text.startswith("-")
+    body = text.lstrip("+-")
+    parts = _DURATION_RE.findall(body)
+    if not parts or "".join(number + unit for number, unit in parts) != body:
+        raise ValueError(f"invalid keep_alive duration: {value!r}")
+    if negative:
+        return math.inf
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
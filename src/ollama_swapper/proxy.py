@@ -2,19 +2,73 @@
 # Usage: build_proxy_app(config) then run via uvicorn (see cli.py).
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, Awaitable, Callable
 from urllib.parse import urljoin
 
 import httpx
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTask
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from .config import AppConfig
-from .policy import apply_policy, resolve_upstream
+from .admission import (
+    DEADLINE_FIELD,
+    DEADLINE_HEADER,
+    CompletionEstimator,
+    Estimate,
+    final_stats,
+    parse_deadline_ms,
+)
+from .cache import (
+    CACHEABLE,
+    INVALIDATING_PATHS,
+    CachedResponse,
+    MetadataCache,
+    cache_key,
+    etag_matches,
+    make_entry,
+)
+from .compaction import TokenCounter, compact_messages
+from .compression import compress, compress_stream, negotiate
+from .config import AppConfig, HedgePolicy, MirrorPolicy, load_config, parse_upstream
+from .metrics import Metrics
+from .mirror import MirrorController, StreamTimer
+from .policy import DEFAULT_KEEP_ALIVE_SECONDS, apply_policy, parse_keep_alive, resolve_upstream
+from .scheduler import Scheduler, estimate_tokens, num_predict, prompt_tokens
+from .state import LocalState, ProxyState, state_from_env
+from .toolcalls import ToolCallAssembler
+from .top import (
+    DEFAULT_INTERVAL,
+    MIN_INTERVAL,
+    PS_REFRESH_SECONDS,
+    ActivityTracker,
+    build_frame,
+    top_events,
+)
+
+
+ADMIN_PREFIX = "/_swapper/"
+
+# Environment handed from the CLI supervisor to create_app() in each worker.
+CONFIG_PATH_ENV = "OLLAMA_SWAPPER_CONFIG"
+VERBOSE_ENV = "OLLAMA_SWAPPER_VERBOSE"
+LEAN_ENV = "OLLAMA_SWAPPER_LEAN"
+
+# Upstream headers that describe the body's wire form rather than its content.
+_WIRE_HEADERS = ("content-length", "content-encoding", "transfer-encoding")
+# Content types never worth compressing again.
+_PRECOMPRESSED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+# Stripped before a cacheable request goes upstream; the proxy answers them itself.
+_CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since"}
 
 
 @dataclass(frozen=True)
@@ -31,7 +85,12 @@ def parse_listen(listen: str) -> ListenAddress:
 
 
 async def _stream_response(response: httpx.Response) -> AsyncIterator[bytes]:
-    async for chunk in response.aiter_bytes():
+    if response.is_stream_consumed:
+        # Already buffered by the transport (in-memory responses); nothing raw is left to read.
+        yield response.content
+        return
+    # Raw bytes: an upstream Content-Encoding is passed through instead of decoded and redone.
+    async for chunk in response.aiter_raw():
         yield chunk
 
 
@@ -104,6 +163,18 @@ def _ollama_generate_to_openai(payload: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+def _usage_counts(usage: Any) -> dict[str, int]:
+    """Ollama's token counts from an OpenAI ``usage`` object, when the server sent one."""
+    if not isinstance(usage, dict):
+        return {}
+    counts: dict[str, int] = {}
+    if isinstance(usage.get("prompt_tokens"), int):
+        counts["prompt_eval_count"] = usage["prompt_tokens"]
+    if isinstance(usage.get("completion_tokens"), int):
+        counts["eval_count"] = usage["completion_tokens"]
+    return counts
+
+
 def _openai_chat_to_ollama(
     payload: dict[str, Any], model: str | None, include_thinking: bool = False
 ) -> dict[str, Any]:
@@ -124,7 +195,7 @@ def _openai_chat_to_ollama(
         msg["thinking"] = thinking
     if tool_calls is not None:
         msg["tool_calls"] = tool_calls
-    return {"model": model, "message": msg, "done": True}
+    return {"model": model, "message": msg, "done": True, **_usage_counts(payload.get("usage"))}
 
 
 def _openai_generate_to_ollama(payload: dict[str, Any], model: str | None) -> dict[str, Any]:
@@ -137,14 +208,20 @@ def _openai_generate_to_ollama(payload: dict[str, Any], model: str | None) -> di
         "model": model,
         "response": content,
         "done": True,
+        **_usage_counts(payload.get("usage")),
     }
 
 
 async def _stream_openai_chat(
-    response: httpx.Response, model: str | None, include_thinking: bool = False
+    response: httpx.Response,
+    model: str | None,
+    include_thinking: bool = False,
+    early_tool_calls: bool = False,
 ) -> AsyncIterator[bytes]:
-    # tool_calls fragments are accumulated by index and emitted in the done chunk.
-    tool_calls_buf: dict[int, dict[str, Any]] = {}
+    # tool_calls fragments are accumulated by index and emitted in the done chunk, or each
+    # in its own chunk as soon as its arguments close when early_tool_calls is set.
+    tool_calls = ToolCallAssembler(emit_early=early_tool_calls)
+    counts: dict[str, int] = {}
 
     async for line in response.aiter_lines():
         if not line or not line.startswith("data:"):
@@ -154,16 +231,17 @@ async def _stream_openai_chat(
             continue
         if data == "[DONE]":
             done_msg: dict[str, Any] = {"role": "assistant", "content": ""}
-            if tool_calls_buf:
-                done_msg["tool_calls"] = _convert_tool_calls(
-                    [tool_calls_buf[i] for i in sorted(tool_calls_buf)]
-                )
-            yield _json_bytes({"model": model, "message": done_msg, "done": True}) + b"\n"
+            remaining = tool_calls.finish()
+            if remaining:
+                done_msg["tool_calls"] = _convert_tool_calls(remaining)
+            yield _json_bytes({"model": model, "message": done_msg, "done": True, **counts}) + b"\n"
             break
         try:
             payload = json.loads(data)
         except json.JSONDecodeError:
             continue
+        # Sent before [DONE] when stream_options.include_usage was requested.
+        counts = _usage_counts(payload.get("usage")) or counts
         for choice in payload.get("choices", []):
             delta = choice.get("delta") or {}
 
@@ -190,23 +268,25 @@ async def _stream_openai_chat(
                 ) + b"\n"
 
             # tool_calls fragments — accumulate by index
-            for tc_delta in delta.get("tool_calls") or []:
-                idx = tc_delta.get("index", 0)
-                if idx not in tool_calls_buf:
-                    tool_calls_buf[idx] = {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
-                buf = tool_calls_buf[idx]
-                if tc_delta.get("id"):
-                    buf["id"] = tc_delta["id"]
-                fn_delta = tc_delta.get("function") or {}
-                if fn_delta.get("name"):
-                    buf["function"]["name"] = fn_delta["name"]
-                if fn_delta.get("arguments"):
-                    buf["function"]["arguments"] += fn_delta["arguments"]
+            ready = tool_calls.feed(delta.get("tool_calls") or [])
+            if ready:
+                yield _json_bytes(
+                    {
+                        "model": model,
+                        "message": {
+                            "role": "assistant",
+                            "content": "",
+                            "tool_calls": _convert_tool_calls(ready),
+                        },
+                        "done": False,
+                    }
+                ) + b"\n"
 
 
 async def _stream_openai_generate(
     response: httpx.Response, model: str | None
 ) -> AsyncIterator[bytes]:
+    counts: dict[str, int] = {}
     async for line in response.aiter_lines():
         if not line or not line.startswith("data:"):
             continue
@@ -214,12 +294,13 @@ async def _stream_openai_generate(
         if not data:
             continue
         if data == "[DONE]":
-            yield _json_bytes({"model": model, "done": True}) + b"\n"
+            yield _json_bytes({"model": model, "done": True, **counts}) + b"\n"
             break
         try:
             payload = json.loads(data)
         except json.JSONDecodeError:
             continue
+        counts = _usage_counts(payload.get("usage")) or counts
         for choice in payload.get("choices", []):
             text = choice.get("text")
             if text is None:
@@ -233,20 +314,452 @@ async def _stream_openai_generate(
             ) + b"\n"
 
 
-def build_proxy_app(config: AppConfig, verbose: bool = False) -> FastAPI:
-    app = FastAPI()
-    logger = logging.getLogger("ollama_swapper.proxy")
-    if not logger.handlers:
-        logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
+@dataclass
+class _PreparedRequest:
+    upstream_base: str
+    url: str
+    body: bytes
+    headers: dict[str, str]
+    use_openai: bool
+    stream: bool = False
+    stream_adapter: Callable[[httpx.Response, str | None], AsyncIterator[bytes]] | None = None
+    response_adapter: Callable[[dict[str, Any], str | None], dict[str, Any]] | None = None
 
-    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
-    async def proxy(path: str, request: Request) -> Response:
-        body = await request.body()
-        headers = dict(request.headers)
-        method = request.method
+
+def _upstream_url(upstream_base: str, path: str) -> str:
+    base_url = parse_upstream(upstream_base).base_url
+    return urljoin(base_url.rstrip("/") + "/", path)
+
+
+def _prepare_request(
+    path: str,
+    payload: dict[str, Any] | None,
+    body: bytes,
+    headers: dict[str, str],
+    upstream_base: str,
+    use_openai: bool,
+    include_thinking: bool,
+    early_tool_calls: bool = False,
+) -> _PreparedRequest:
+    """Build the upstream URL/body, bridging api/chat and api/generate to OpenAI when asked."""
+    headers = dict(headers)
+    if not (use_openai and path in {"api/chat", "api/generate"} and isinstance(payload, dict)):
+        return _PreparedRequest(
+            upstream_base, _upstream_url(upstream_base, path), body, headers, False
+        )
+
+    if path == "api/chat":
+        upstream_path = "v1/chat/completions"
+        openai_payload = _ollama_chat_to_openai(payload)
+        stream_adapter = lambda r, m: _stream_openai_chat(
+            r, m, include_thinking, early_tool_calls
+        )
+        response_adapter = lambda p, m: _openai_chat_to_ollama(p, m, include_thinking)
+    else:
+        upstream_path = "v1/completions"
+        openai_payload = _ollama_generate_to_openai(payload)
+        stream_adapter = _stream_openai_generate
+        response_adapter = _openai_generate_to_ollama
+
+    body = _json_bytes(openai_payload)
+    headers["content-type"] = "application/json"
+    headers["content-length"] = str(len(body))
+    return _PreparedRequest(
+        upstream_base,
+        _upstream_url(upstream_base, upstream_path),
+        body,
+        headers,
+        True,
+        stream=bool(openai_payload.get("stream")),
+        stream_adapter=stream_adapter,
+        response_adapter=response_adapter,
+    )
+
+
+def _relay_chunks(
+    path: str,
+    prepared: _PreparedRequest,
+    response: httpx.Response,
+    model: str | None,
+    include_thinking: bool,
+) -> AsyncIterator[bytes]:
+    """The streamed body a client receives: bridged, thinking-filtered or raw upstream bytes."""
+    if response.status_code < 400:
+        if prepared.use_openai and prepared.stream:
+            assert prepared.stream_adapter is not None
+            return prepared.stream_adapter(response, model)
+        if path == "api/chat" and not prepared.use_openai:
+            return _stream_filter_thinking(response, include_thinking)
+    return _stream_response(response)
+
+
+class _PrefetchedStream(httpx.AsyncByteStream):
+    """Byte stream that replays an already-read first chunk before the rest."""
+
+    def __init__(
+        self, first: bytes, rest: AsyncIterator[bytes], original: httpx.AsyncByteStream
+    ) -> None:
+        self._first = first
+        self._rest = rest
+        self._original = original
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self._first:
+            yield self._first
+        async for chunk in self._rest:
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._original.aclose()
+
+
+async def _send_until_first_byte(
+    client: httpx.AsyncClient, request: httpx.Request
+) -> httpx.Response:
+    """Send ``request`` and wait for its first body bytes, keeping them for the reader."""
+    response = await client.send(request, stream=True)
+    try:
+        original = response.stream
+        assert isinstance(original, httpx.AsyncByteStream)
+        rest = original.__aiter__()
+        first = await anext(rest, b"")
+    except BaseException:
+        await response.aclose()
+        raise
+    response.stream = _PrefetchedStream(first, rest, original)
+    return response
+
+
+class _HedgeBudget:
+    """Caps hedged requests to ``budget_percent`` of eligible requests per model."""
+
+    def __init__(self) -> None:
+        self._eligible: dict[str, int] = {}
+        self._hedged: dict[str, int] = {}
+
+    def record_eligible(self, model: str) -> None:
+        self._eligible[model] = self._eligible.get(model, 0) + 1
+
+    def try_acquire(self, model: str, budget_percent: float) -> bool:
+        hedged = self._hedged.get(model, 0)
+        if (hedged + 1) * 100 > budget_percent * self._eligible.get(model, 0):
+            return False
+        self._hedged[model] = hedged + 1
+        return True
+
+
+async def _close_task_response(task: asyncio.Task[httpx.Response]) -> None:
+    if not task.done():
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+        return
+    if not task.cancelled() and task.exception() is None:
+        await task.result().aclose()
+
+
+class _ClientPool:
+    """One long-lived AsyncClient per upstream so connections are reused.
+
+    ``unix://`` upstreams get a Unix-socket transport; upstreams listed in
+    ``http2_upstreams`` negotiate HTTP/2 so concurrent streams share a connection.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http2_upstreams: set[str] | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self._transport = transport
+        self._http2_upstreams = http2_upstreams or set()
+        self._logger = logger or logging.getLogger("ollama_swapper.proxy")
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _make_transport(self, upstream_base: str) -> httpx.AsyncBaseTransport:
+        if self._transport is not None:
+            return self._transport
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=32)
+        target = parse_upstream(upstream_base)
+        http2 = upstream_base in self._http2_upstreams
+        if http2 and not target.base_url.startswith("https://"):
+            # httpx only negotiates HTTP/2 through TLS ALPN; cleartext h2c is not attempted.
+            self._logger.warning(
+                "http2 requested for %s but HTTP/2 needs an https upstream; using HTTP/1.1",
+                upstream_base,
+            )
+            http2 = False
+        if http2:
+            try:
+                import h2  # type: ignore[import-not-found]  # noqa: F401
+            except ImportError:
+                self._logger.warning(
+                    "http2 requested for %s but the 'h2' package is missing; using HTTP/1.1",
+                    upstream_base,
+                )
+                http2 = False
+        return httpx.AsyncHTTPTransport(limits=limits, uds=target.uds, http2=http2)
+
+    def get(self, upstream_base: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream_base)
+        if client is None:
+            client = httpx.AsyncClient(timeout=None, transport=self._make_transport(upstream_base))
+            self._clients[upstream_base] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+@dataclass
+class _ProxyReply:
+    """Framework-neutral response: either a complete ``body`` or streamed ``chunks``."""
+
+    status_code: int
+    headers: dict[str, str]
+    body: bytes | None = None
+    chunks: AsyncIterator[bytes] | None = None
+    close: Callable[[], Awaitable[None]] | None = None
+
+
+@dataclass
+class _Admission:
+    """Deadline check outcome: a rejection, or an optional reroute and the service estimate."""
+
+    reply: _ProxyReply | None = None
+    route: tuple[str, bool] | None = None
+    service_s: float = 0.0
+
+
+def _keep_alive_seconds(payload: dict[str, Any]) -> float:
+    try:
+        return parse_keep_alive(payload.get("keep_alive"))
+    except ValueError:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+
+
+def _deadline_reply(message: str, estimate: Estimate | None = None) -> _ProxyReply:
+    headers = {"content-type": "application/json"}
+    if estimate is not None:
+        headers["x-swapper-estimate-ms"] = f"{estimate.total_s * 1000:.0f}"
+    return _ProxyReply(503, headers, body=_json_bytes({"error": message}))
+
+
+def _chain_close(
+    reply: _ProxyReply, after: Callable[[], Awaitable[None] | None]
+) -> _ProxyReply:
+    """Run ``after`` once the reply's upstream resources have been released."""
+    upstream_close = reply.close
+
+    async def close() -> None:
+        try:
+            if upstream_close is not None:
+                await upstream_close()
+        finally:
+            result = after()
+            if result is not None:
+                await result
+
+    reply.close = close
+    return reply
+
+
+class _Forwarder:
+    """Policy injection, upstream selection and response adaptation for one request."""
+
+    def __init__(
+        self,
+        config: AppConfig,
+        metrics: Metrics,
+        clients: _ClientPool,
+        logger: logging.Logger,
+        state: ProxyState,
+    ) -> None:
+        self.config = config
+        self.metrics = metrics
+        self.clients = clients
+        self.logger = logger
+        self.state = state
+        self.hedge_budget = _HedgeBudget()
+        self.cache = MetadataCache()
+        self.mirrors = MirrorController(metrics)
+        self.scheduler = Scheduler(config.scheduler, metrics) if config.scheduler else None
+        self.estimator = CompletionEstimator()
+        self.token_counter = TokenCounter()
+        self.activity = ActivityTracker()
+        self._ps_refreshed_at = -math.inf
+        self._shadow_tasks: set[asyncio.Task[None]] = set()
+
+    def _build(
+        self, method: str, prepared: _PreparedRequest, query: str
+    ) -> tuple[httpx.AsyncClient, httpx.Request]:
+        client = self.clients.get(prepared.upstream_base)
+        request = client.build_request(
+            method,
+            prepared.url,
+            content=prepared.body,
+            headers=prepared.headers,
+            params=query or None,
+        )
+        return client, request
+
+    async def _send_hedged(
+        self,
+        method: str,
+        query: str,
+        primary: _PreparedRequest,
+        secondary: Callable[[], _PreparedRequest],
+        hedge: HedgePolicy,
+        model: str,
+    ) -> tuple[httpx.Response, _PreparedRequest]:
+        """Race a secondary upstream once the primary misses the first-byte deadline."""
+        metrics = self.metrics
+        self.hedge_budget.record_eligible(model)
+        metrics.incr("hedge_eligible", model=model)
+        tasks: dict[asyncio.Task[httpx.Response], tuple[str, _PreparedRequest]] = {}
+        primary_task = asyncio.create_task(
+            _send_until_first_byte(*self._build(method, primary, query))
+        )
+        tasks[primary_task] = ("primary", primary)
+        done, _ = await asyncio.wait({primary_task}, timeout=hedge.after_ms / 1000)
+        if not done:
+            if self.hedge_budget.try_acquire(model, hedge.budget_percent):
+                metrics.incr("hedge_fired", model=model)
+                prepared = secondary()
+                self.logger.info(
+                    "hedging model=%s after_ms=%s secondary=%s", model, hedge.after_ms, prepared.url
+                )
+                secondary_task = asyncio.create_task(
+                    _send_until_first_byte(*self._build(method, prepared, query))
+                )
+                tasks[secondary_task] = ("secondary", prepared)
+            else:
+                metrics.incr("hedge_budget_exhausted", model=model)
+
+        pending = set(tasks)
+        fallback: asyncio.Task[httpx.Response] | None = None
+        winner: asyncio.Task[httpx.Response] | None = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    if task.result().status_code < 500 and winner is None:
+                        winner = task
+                    elif fallback is None:
+                        fallback = task
+            winner = winner or fallback
+            if winner is None:
+                # Every attempt raised; surface the primary's error.
+                primary_task.result()
+            assert winner is not None
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    await _close_task_response(task)
+
+        label, prepared = tasks[winner]
+        if len(tasks) > 1:
+            metrics.incr("hedge_won", model=model, winner=label)
+        return winner.result(), prepared
+
+    async def forward(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        body: bytes,
+        client: str | None = None,
+    ) -> _ProxyReply:
+        accept_encoding = headers.get("accept-encoding")
+        if accept_encoding is None or path in {"api/chat", "api/generate"}:
+            # Chat/generate responses are parsed for stats and filtered, so keep them
+            # identity-encoded upstream; the client's preference is applied to what the proxy
+            # sends back. Explicit, because httpx would otherwise add its own default.
+            headers["accept-encoding"] = "identity"
+        reply = await self._forward(method, path, query, headers, body, client)
+        return self._encode(reply, accept_encoding)
+
+    def _encode(self, reply: _ProxyReply, accept_encoding: str | None) -> _ProxyReply:
+        """Compress the reply with the client's preferred encoding when worthwhile."""
+        settings = self.config.server.compression
+        if not settings.enabled or reply.status_code in {204, 304} or reply.status_code < 200:
+            return reply
+        headers = {key.lower(): value for key, value in reply.headers.items()}
+        if "content-encoding" in headers:
+            return reply
+        if headers.get("content-type", "").startswith(_PRECOMPRESSED_TYPES):
+            return reply
+        if reply.chunks is None and len(reply.body or b"") < settings.min_size:
+            return reply
+        if reply.chunks is not None:
+            if not settings.streams:
+                return reply
+            # A passthrough reply whose upstream length is known small (version, embed,
+            # errors) isn't worth a sync-flushed stream; unknown lengths still stream.
+            length = headers.get("content-length", "")
+            if length.isdigit() and int(length) < settings.min_size:
+                return reply
+        encoding = negotiate(accept_encoding)
+        headers["vary"] = "accept-encoding"
+        if encoding is None:
+            reply.headers = headers
+            return reply
+        level = settings.zstd_level if encoding == "zstd" else settings.gzip_level
+        headers["content-encoding"] = encoding
+        headers.pop("content-length", None)
+        # Weak: the bytes differ from the identity response the ETag was computed for.
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            headers["etag"] = "W/" + headers["etag"]
+        reply.headers = headers
+        if reply.chunks is None:
+            body = reply.body or b""
+            reply.body = compress(body, encoding, level)
+            self._record_compression(encoding, len(body), len(reply.body))
+        else:
+            reply.chunks = compress_stream(
+                reply.chunks,
+                encoding,
+                level,
+                on_finish=lambda bytes_in, bytes_out: self._record_compression(
+                    encoding, bytes_in, bytes_out
+                ),
+            )
+        return reply
+
+    def _record_compression(self, encoding: str, bytes_in: int, bytes_out: int) -> None:
+        self.metrics.incr("compression_bytes_in", bytes_in, encoding=encoding)
+        self.metrics.incr("compression_bytes_out", bytes_out, encoding=encoding)
+
+    async def _forward(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        body: bytes,
+        client: str | None,
+    ) -> _ProxyReply:
+        config = self.config
+        logger = self.logger
         payload: dict[str, Any] | None = None
         model: str | None = None
         include_thinking: bool = False
+        deadline_raw: Any = None
+
+        if config.server.cache.enabled and (method, path) in CACHEABLE:
+            return await self._forward_cached(method, path, query, headers, body)
+        if path in INVALIDATING_PATHS:
+            self.cache.invalidate()
+            reply = await self._dispatch(method, path, query, headers, body, None, None, False)
+            return _chain_close(reply, self._invalidate_cache)
 
         if path in {"api/chat", "api/generate"} and body:
             try:
@@ -256,6 +769,7 @@ def build_proxy_app(config: AppConfig, verbose: bool = False) -> FastAPI:
                 payload = None
             if isinstance(payload, dict):
                 include_thinking = bool(payload.pop("include_thinking", False))
+                deadline_raw = payload.pop(DEADLINE_FIELD, None)
                 before_options = dict(payload.get("options") or {})
                 before_keep_alive = payload.get("keep_alive")
                 payload = apply_policy(payload, config.policy)
@@ -270,6 +784,8 @@ def build_proxy_app(config: AppConfig, verbose: bool = False) -> FastAPI:
                     after_keep_alive,
                 )
                 model = payload.get("model")
+                if path == "api/chat" and isinstance(model, str):
+                    self._compact(payload, model)
                 body = json.dumps(payload).encode("utf-8")
                 headers["content-length"] = str(len(body))
             elif payload is not None:
@@ -279,95 +795,726 @@ def build_proxy_app(config: AppConfig, verbose: bool = False) -> FastAPI:
                     path,
                 )
 
-        upstream_base = resolve_upstream(model, config)
-        use_openai = (
-            upstream_base != config.server.upstream
-            and path in {"api/chat", "api/generate"}
-            and isinstance(payload, dict)
-        )
-        if use_openai:
-            if path == "api/chat":
-                upstream_path = "v1/chat/completions"
-                openai_payload = _ollama_chat_to_openai(payload)
-                stream = bool(openai_payload.get("stream"))
-                stream_adapter = lambda r, m: _stream_openai_chat(r, m, include_thinking)
-                response_adapter = lambda p, m: _openai_chat_to_ollama(p, m, include_thinking)
+        if not model or not isinstance(payload, dict):
+            return await self._dispatch(
+                method, path, query, headers, body, payload, model, include_thinking
+            )
+
+        started = time.monotonic()
+        try:
+            deadline_ms = parse_deadline_ms(
+                deadline_raw if deadline_raw is not None else headers.get(DEADLINE_HEADER)
+            )
+        except ValueError as exc:
+            return _ProxyReply(
+                400, {"content-type": "application/json"}, body=_json_bytes({"error": str(exc)})
+            )
+        admission = _Admission()
+        if deadline_ms is not None:
+            admission = await self._admit_deadline(payload, model, deadline_ms)
+            if admission.reply is not None:
+                return admission.reply
+        route = admission.route
+        if self.scheduler is None:
+            return await self._forward_model(
+                method, path, query, headers, body, payload, model, include_thinking, route
+            )
+
+        scheduler = self.scheduler
+        priority, client_id = scheduler.classify(headers, client)
+        retry_after = scheduler.admit(priority, client_id, estimate_tokens(payload))
+        if retry_after > 0:
+            logger.info(
+                "rate limited priority=%s client=%s retry_after=%.1fs",
+                priority,
+                client,
+                retry_after,
+            )
+            return _ProxyReply(
+                429,
+                {"content-type": "application/json", "retry-after": str(math.ceil(retry_after))},
+                body=_json_bytes({"error": f"rate limit exceeded for priority class {priority}"}),
+            )
+        if route is not None:
+            # Rerouted away from the primary, so don't wait for one of its slots.
+            return await self._forward_model(
+                method, path, query, headers, body, payload, model, include_thinking, route
+            )
+        self.activity.enqueue(model)
+        try:
+            if deadline_ms is None:
+                await scheduler.acquire(priority, client_id)
             else:
-                upstream_path = "v1/completions"
-                openai_payload = _ollama_generate_to_openai(payload)
-                stream = bool(openai_payload.get("stream"))
-                stream_adapter = _stream_openai_generate
-                response_adapter = _openai_generate_to_ollama
-
-            upstream_url = urljoin(upstream_base.rstrip("/") + "/", upstream_path)
-            body = _json_bytes(openai_payload)
-            headers["content-type"] = "application/json"
-            headers["content-length"] = str(len(body))
+                budget = deadline_ms / 1000 - (time.monotonic() - started) - admission.service_s
+                await asyncio.wait_for(scheduler.acquire(priority, client_id), max(budget, 0.0))
+        except asyncio.TimeoutError:
+            self.metrics.incr("deadline_rejected", model=model, reason="queue")
+            logger.warning(
+                "deadline reject model=%s deadline_ms=%.0f reason=queue queued=%s",
+                model,
+                deadline_ms,
+                scheduler.queued(),
+            )
+            return _deadline_reply(f"deadline of {deadline_ms:.0f} ms expired while queued")
+        finally:
+            self.activity.dequeue(model)
+        try:
+            reply = await self._forward_model(
+                method, path, query, headers, body, payload, model, include_thinking
+            )
+        except BaseException:
+            scheduler.release()
+            raise
+        return _chain_close(reply, scheduler.release)
+
+    def _compact(self, payload: dict[str, Any], model: str) -> None:
+        """Trim old chat turns in place when the model opts in and the history exceeds num_ctx."""
+        model_policy = self.config.policy.models.get(model)
+        compaction = model_policy.compaction if model_policy else None
+        messages = payload.get("messages")
+        num_ctx = (payload.get("options") or {}).get("num_ctx")
+        if compaction is None or not isinstance(messages, list) or not isinstance(num_ctx, int):
+            return
+        if not all(isinstance(message, dict) for message in messages):
+            return
+        budget = int(num_ctx * compaction.target_fraction)
+        result = compact_messages(messages, budget, self.token_counter)
+        if not result.tokens_removed:
+            return
+        payload["messages"] = result.messages
+        rate = self.estimator.prompt_tokens_per_s(resolve_upstream(model, self.config), model)
+        saved_ms = result.tokens_removed / rate * 1000 if rate else None
+        self.metrics.incr("compaction_tokens_removed", result.tokens_removed, model=model)
+        self.metrics.incr("compaction_messages_dropped", result.dropped, model=model)
+        if saved_ms is not None:
+            self.metrics.incr("compaction_prompt_eval_saved_ms", round(saved_ms, 1), model=model)
+        self.logger.info(
+            "compacted model=%s num_ctx=%s budget=%s tokens_before=%s tokens_after=%s "
+            "dropped=%s trimmed=%s prompt_eval_saved_ms=%s",
+            model,
+            num_ctx,
+            budget,
+            result.tokens_before,
+            result.tokens_after,
+            result.dropped,
+            result.trimmed,
+            f"{saved_ms:.0f}" if saved_ms is not None else "unknown",
+        )
+
+    async def _admit_deadline(
+        self, payload: dict[str, Any], model: str, deadline_ms: float
+    ) -> _Admission:
+        """Admit, reroute to the hedge upstream or reject a request that would miss the deadline."""
+        config = self.config
+        upstream = resolve_upstream(model, config)
+        await self._refresh_loaded_if_stale()
+        entry = (await self.state.snapshot()).get(model, {})
+        if self.scheduler is not None:
+            ahead = self.scheduler.queued() + self.scheduler.active
+            slots = self.scheduler.config.max_concurrency
         else:
-            upstream_url = urljoin(upstream_base.rstrip("/") + "/", path)
+            ahead, slots = int(entry.get("in_flight") or 0), 1
+        tokens, predict = prompt_tokens(payload), num_predict(payload)
+        estimate = self.estimator.estimate(
+            upstream, model, tokens, predict, bool(entry.get("loaded")), ahead, slots
+        )
+        self.metrics.observe("deadline_estimate_ms", estimate.total_s * 1000, model=model)
+        if estimate.total_s * 1000 <= deadline_ms:
+            self.logger.info(
+                "deadline admit model=%s deadline_ms=%.0f %s",
+                model,
+                deadline_ms,
+                estimate.describe(),
+            )
+            return _Admission(service_s=estimate.total_s - estimate.queue_s)
 
-        client = httpx.AsyncClient(timeout=None)
-        upstream_request = client.build_request(
-            method,
-            upstream_url,
-            content=body,
-            headers=headers,
-            params=request.query_params,
+        model_policy = config.policy.models.get(model)
+        hedge = model_policy.hedge if model_policy else None
+        if hedge is not None:
+            hot = hedge.api == "openai" or self.estimator.served_within(
+                hedge.upstream, model, _keep_alive_seconds(payload)
+            )
+            alternate = self.estimator.estimate(hedge.upstream, model, tokens, predict, hot)
+            if hot and alternate.total_s * 1000 <= deadline_ms:
+                self.metrics.incr("deadline_rerouted", model=model)
+                self.logger.info(
+                    "deadline reroute model=%s deadline_ms=%.0f upstream=%s "
+                    "primary %s alternate %s",
+                    model,
+                    deadline_ms,
+                    hedge.upstream,
+                    estimate.describe(),
+                    alternate.describe(),
+                )
+                return _Admission(
+                    route=(hedge.upstream, hedge.api == "openai"), service_s=alternate.total_s
+                )
+
+        self.metrics.incr("deadline_rejected", model=model, reason="estimate")
+        self.logger.warning(
+            "deadline reject model=%s deadline_ms=%.0f %s", model, deadline_ms, estimate.describe()
+        )
+        return _Admission(
+            reply=_deadline_reply(
+                f"deadline of {deadline_ms:.0f} ms cannot be met for {model}: "
+                f"estimated {estimate.total_s * 1000:.0f} ms",
+                estimate,
+            )
+        )
+
+    async def _forward_model(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        body: bytes,
+        payload: dict[str, Any],
+        model: str,
+        include_thinking: bool,
+        route: tuple[str, bool] | None = None,
+    ) -> _ProxyReply:
+        """Dispatch a request for ``model`` while tracking its state and mirroring it."""
+        config = self.config
+        keep_alive = _keep_alive_seconds(payload)
+        model_policy = config.policy.models.get(model)
+        mirror = model_policy.mirror if model_policy else None
+        mirrored = mirror is not None and self.mirrors.try_acquire(model, mirror)
+        if mirrored:
+            assert mirror is not None
+            self._start_shadow(
+                method, path, query, headers, body, payload, model, mirror, include_thinking
+            )
+        timer = StreamTimer()
+        await self.state.begin(model)
+        try:
+            reply = await self._dispatch(
+                method, path, query, headers, body, payload, model, include_thinking, route
+            )
+        except BaseException:
+            await self.state.end(model, keep_alive)
+            raise
+        if mirrored and reply.status_code < 400:
+            self._time_primary(reply, model, timer)
+        return self._track_completion(reply, model, keep_alive)
+
+    def _start_shadow(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        body: bytes,
+        payload: dict[str, Any],
+        model: str,
+        mirror: MirrorPolicy,
+        include_thinking: bool,
+    ) -> None:
+        """Duplicate the request to the mirror upstream in the background and time it.
+
+        The shadow is timed on the same filtered/bridged chunks the primary's client gets,
+        so a reasoning or role-only chunk counts as a first token on neither side.
+        """
+        shadow_headers = {key: value for key, value in headers.items() if key.lower() != "host"}
+        model_policy = self.config.policy.models.get(model)
+        prepared = _prepare_request(
+            path,
+            payload,
+            body,
+            shadow_headers,
+            mirror.upstream,
+            mirror.api == "openai",
+            include_thinking,
+            bool(model_policy and model_policy.early_tool_calls),
+        )
+        if prepared.use_openai and prepared.stream:
+            # Ask for the usage event so the report can compare tokens/s on both sides.
+            openai_payload = json.loads(prepared.body)
+            openai_payload["stream_options"] = {"include_usage": True}
+            prepared.body = _json_bytes(openai_payload)
+            prepared.headers["content-length"] = str(len(prepared.body))
+
+        async def run() -> None:
+            timer = StreamTimer()
+            failed = True
+            try:
+                client, request = self._build(method, prepared, query)
+                response = await client.send(request, stream=True)
+                try:
+                    async for chunk in _relay_chunks(
+                        path, prepared, response, model, include_thinking
+                    ):
+                        timer.feed(chunk)
+                finally:
+                    await response.aclose()
+                failed = response.status_code >= 400
+            except httpx.HTTPError as exc:
+                self.logger.debug("mirror request failed model=%s error=%s", model, exc)
+            finally:
+                self.mirrors.release(model)
+            if failed:
+                self.mirrors.record_error(model)
+            else:
+                self.mirrors.record(model, "shadow", timer.finish())
+
+        task = asyncio.create_task(run())
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    def _time_primary(self, reply: _ProxyReply, model: str, timer: StreamTimer) -> None:
+        if reply.chunks is None:
+            timer.feed(reply.body or b"")
+            self.mirrors.record(model, "primary", timer.finish())
+            return
+        chunks = reply.chunks
+
+        async def timed() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                timer.feed(chunk)
+                yield chunk
+            self.mirrors.record(model, "primary", timer.finish())
+
+        reply.chunks = timed()
+
+    async def cancel_shadows(self) -> None:
+        tasks = list(self._shadow_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_metadata(
+        self, method: str, path: str, query: str, headers: dict[str, str], body: bytes
+    ) -> CachedResponse:
+        prepared = _prepare_request(
+            path, None, body, headers, self.config.server.upstream, False, False
         )
+        client, request = self._build(method, prepared, query)
+        response = await client.send(request)
+        entry = make_entry(response.status_code, dict(response.headers), response.content)
+        if path == "api/ps" and entry.status_code == 200:
+            await self._record_loaded(entry.body)
+        return entry
+
+    async def _record_loaded(self, body: bytes) -> None:
+        """Hand an /api/ps answer to the proxy state as the authoritative loaded set."""
         try:
-            upstream_response = await client.send(upstream_request, stream=True)
+            models = json.loads(body).get("models")
+        except (json.JSONDecodeError, AttributeError):
+            return
+        if not isinstance(models, list):
+            return
+        loaded: dict[str, dict[str, Any]] = {}
+        for entry in models:
+            if not isinstance(entry, dict):
+                continue
+            name = entry.get("name") or entry.get("model")
+            if isinstance(name, str):
+                loaded[name] = {
+                    "size_vram": entry.get("size_vram"),
+                    "expires_at": entry.get("expires_at"),
+                }
+        await self.state.set_loaded(loaded)
+
+    async def _forward_cached(
+        self, method: str, path: str, query: str, headers: dict[str, str], body: bytes
+    ) -> _ProxyReply:
+        cache_config = self.config.server.cache
+        if_none_match = headers.get("if-none-match")
+        upstream_headers = {
+            key: value for key, value in headers.items() if key.lower() not in _CONDITIONAL_HEADERS
+        }
+        ttl = cache_config.ps_ttl if path == "api/ps" else cache_config.ttl
+        try:
+            entry, outcome = await self.cache.get(
+                cache_key(method, path, query, body),
+                lambda: self._fetch_metadata(method, path, query, upstream_headers, body),
+                ttl,
+            )
+        except httpx.RequestError as exc:
+            self.logger.error(
+                "upstream request failed method=%s path=%s error=%s", method, path, exc
+            )
+            return _ProxyReply(502, {}, body=b"Upstream request failed")
+        self.metrics.incr("metadata_cache", path=path, result=outcome)
+        if entry.status_code != 200:
+            return _ProxyReply(entry.status_code, dict(entry.headers), body=entry.body)
+        cache_headers = {"etag": entry.etag, "x-swapper-cache": outcome}
+        if etag_matches(if_none_match, entry.etag):
+            return _ProxyReply(304, cache_headers, body=b"")
+        return _ProxyReply(200, {**entry.headers, **cache_headers}, body=entry.body)
+
+    async def _invalidate_cache(self) -> None:
+        """Drop cached metadata again once a pull/delete/create/copy has finished upstream."""
+        self.cache.invalidate()
+        self.metrics.incr("metadata_cache_invalidated")
+
+    async def refresh_loaded(self) -> None:
+        """Refresh the loaded-model set from /api/ps, reusing the cached answer when fresh."""
+        self._ps_refreshed_at = time.monotonic()
+        try:
+            if self.config.server.cache.enabled:
+                await self.cache.get(
+                    cache_key("GET", "api/ps", "", b""),
+                    lambda: self._fetch_metadata("GET", "api/ps", "", {}, b""),
+                    self.config.server.cache.ps_ttl,
+                )
+            else:
+                await self._fetch_metadata("GET", "api/ps", "", {}, b"")
+        except httpx.RequestError as exc:
+            self.logger.debug("could not refresh loaded models error=%s", exc)
+
+    async def _refresh_loaded_if_stale(self) -> None:
+        """Refresh from /api/ps at most every PS_REFRESH_SECONDS, cached or not."""
+        if time.monotonic() - self._ps_refreshed_at >= PS_REFRESH_SECONDS:
+            await self.refresh_loaded()
+
+    async def top_frame(self) -> dict[str, Any]:
+        """One sample of the `top` feed: shared model state plus this worker's activity."""
+        await self._refresh_loaded_if_stale()
+        return build_frame(
+            await self.state.snapshot(),
+            self.activity,
+            lambda model: self.estimator.eval_tokens_per_s(
+                resolve_upstream(model, self.config), model
+            ),
+            self.scheduler.snapshot() if self.scheduler is not None else None,
+            time.time(),
+        )
+
+    async def _observe_timings(
+        self, chunks: AsyncIterator[bytes], upstream_base: str, model: str
+    ) -> AsyncIterator[bytes]:
+        """Pass chunks through, feeding Ollama's final timing stats to the deadline estimator."""
+        # Pieces from the start of the last non-empty line onward; that line may span any
+        # number of chunks, and nothing older is kept.
+        tail: list[bytes] = []
+        line_closed = True
+        async for chunk in chunks:
+            yield chunk
+            content = chunk.rstrip()
+            if not content:
+                tail.append(chunk)
+                line_closed = line_closed or b"\n" in chunk
+                continue
+            start = content.rfind(b"\n") + 1
+            if start or line_closed:
+                tail = [chunk[start:]]
+            else:
+                tail.append(chunk)
+            line_closed = b"\n" in chunk[len(content) :]
+        stats = final_stats(b"".join(tail))
+        if stats is not None:
+            self.estimator.observe(upstream_base, model, stats)
+            self.activity.observe(model, stats)
+
+    def _track_completion(self, reply: _ProxyReply, model: str, keep_alive: float) -> _ProxyReply:
+        """Mark the model idle once the reply has been delivered and closed."""
+        if reply.status_code >= 400:
+            # A failed request says nothing about the model staying resident.
+            keep_alive = 0.0
+        return _chain_close(reply, lambda: self.state.end(model, keep_alive))
+
+    async def _dispatch(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        body: bytes,
+        payload: dict[str, Any] | None,
+        model: str | None,
+        include_thinking: bool,
+        route: tuple[str, bool] | None = None,
+    ) -> _ProxyReply:
+        config = self.config
+        logger = self.logger
+        if route is not None:
+            upstream_base, use_openai = route
+        else:
+            upstream_base = resolve_upstream(model, config)
+            use_openai = upstream_base != config.server.upstream
+        model_policy = config.policy.models.get(model) if model else None
+        early_tool_calls = bool(model_policy and model_policy.early_tool_calls)
+        prepared = _prepare_request(
+            path,
+            payload,
+            body,
+            headers,
+            upstream_base,
+            use_openai,
+            include_thinking,
+            early_tool_calls,
+        )
+        # A deadline reroute already picked the hedge upstream; don't race it against itself.
+        hedge = model_policy.hedge if model_policy and route is None else None
+        # Only streams are hedged: a non-stream reply arrives after the whole generation, so
+        # ``after_ms`` would fire on nearly every request and run it twice.
+        # An OpenAI-bridged primary has its own stream default, already resolved in prepared.
+        if prepared.use_openai:
+            hedgeable = prepared.stream
+        else:
+            hedgeable = isinstance(payload, dict) and bool(payload.get("stream", True))
+
+        try:
+            if hedge is not None and model and hedgeable:
+                upstream_response, prepared = await self._send_hedged(
+                    method,
+                    query,
+                    prepared,
+                    lambda: _prepare_request(
+                        path,
+                        payload,
+                        body,
+                        headers,
+                        hedge.upstream,
+                        hedge.api == "openai",
+                        include_thinking,
+                        early_tool_calls,
+                    ),
+                    hedge,
+                    model,
+                )
+            else:
+                client, upstream_request = self._build(method, prepared, query)
+                upstream_response = await client.send(upstream_request, stream=True)
         except httpx.RequestError as exc:
-            await client.aclose()
             logger.error(
                 "upstream request failed method=%s url=%s error=%s",
                 method,
-                upstream_url,
+                prepared.url,
                 exc,
             )
-            return Response("Upstream request failed", status_code=502)
-
-        async def _close_upstream() -> None:
-            await upstream_response.aclose()
-            await client.aclose()
+            return _ProxyReply(502, {}, body=b"Upstream request failed")
 
+        use_openai = prepared.use_openai
         if upstream_response.status_code >= 400 or not use_openai:
-            response_headers = dict(upstream_response.headers)
             use_thinking_filter = (
                 path == "api/chat"
                 and not use_openai
                 and upstream_response.status_code < 400
             )
-            stream_fn = (
-                _stream_filter_thinking(upstream_response, include_thinking)
-                if use_thinking_filter
-                else _stream_response(upstream_response)
-            )
-            return StreamingResponse(
-                stream_fn,
-                status_code=upstream_response.status_code,
-                headers=response_headers,
-                background=BackgroundTask(_close_upstream),
+            stream_fn = _relay_chunks(path, prepared, upstream_response, model, include_thinking)
+            generates = path in {"api/chat", "api/generate"}
+            if model and generates and upstream_response.status_code < 400:
+                stream_fn = self._observe_timings(stream_fn, prepared.upstream_base, model)
+            response_headers = dict(upstream_response.headers)
+            if use_thinking_filter:
+                # Lines are decoded and rewritten, so the upstream framing no longer applies.
+                for name in _WIRE_HEADERS:
+                    response_headers.pop(name, None)
+            return _ProxyReply(
+                upstream_response.status_code,
+                response_headers,
+                chunks=stream_fn,
+                close=upstream_response.aclose,
             )
 
-        if stream:
-            return StreamingResponse(
-                stream_adapter(upstream_response, model),
-                status_code=upstream_response.status_code,
-                headers={"content-type": "application/x-ndjson"},
-                background=BackgroundTask(_close_upstream),
+        assert prepared.stream_adapter is not None and prepared.response_adapter is not None
+        if prepared.stream:
+            return _ProxyReply(
+                upstream_response.status_code,
+                {"content-type": "application/x-ndjson"},
+                chunks=_relay_chunks(path, prepared, upstream_response, model, include_thinking),
+                close=upstream_response.aclose,
             )
 
-        raw = await upstream_response.aread()
-        await _close_upstream()
+        try:
+            raw = await upstream_response.aread()
+        finally:
+            await upstream_response.aclose()
         try:
             parsed = json.loads(raw)
         except json.JSONDecodeError:
-            return Response(raw, status_code=upstream_response.status_code)
-        converted = response_adapter(parsed, model)
+            return _ProxyReply(upstream_response.status_code, {}, body=raw)
+        converted = prepared.response_adapter(parsed, model)
+        return _ProxyReply(
+            upstream_response.status_code,
+            {"content-type": "application/json"},
+            body=_json_bytes(converted),
+        )
+
+
+def _to_starlette_response(reply: _ProxyReply) -> Response:
+    background = BackgroundTask(reply.close) if reply.close else None
+    if reply.chunks is None:
         return Response(
-            _json_bytes(converted),
-            status_code=upstream_response.status_code,
-            media_type="application/json",
+            reply.body or b"",
+            status_code=reply.status_code,
+            headers=reply.headers,
+            background=background,
         )
+    return StreamingResponse(
+        reply.chunks,
+        status_code=reply.status_code,
+        headers=reply.headers,
+        background=background,
+    )
+
+
+class _LeanProxyApp:
+    """Raw ASGI entry point that forwards proxied traffic without FastAPI routing.
+
+    Lifespan events and ``/_swapper/`` admin routes are delegated to the FastAPI app.
+    """
+
+    def __init__(self, forwarder: _Forwarder, admin_app: FastAPI) -> None:
+        self.forwarder = forwarder
+        self.admin_app = admin_app
+        self.state = admin_app.state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PREFIX):
+            await self.admin_app(scope, receive, send)
+            return
+
+        chunks: list[bytes] = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]
+        }
+        reply = await self.forwarder.forward(
+            scope["method"],
+            scope["path"].lstrip("/"),
+            scope["query_string"].decode("latin-1"),
+            headers,
+            b"".join(chunks),
+            client=scope["client"][0] if scope.get("client") else None,
+        )
+
+        body = reply.body or b""
+        response_headers = [
+            (key.encode("latin-1"), value.encode("latin-1"))
+            for key, value in reply.headers.items()
+            if reply.chunks is not None or key != "content-length"
+        ]
+        if reply.chunks is None:
+            response_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        try:
+            await send(
+                {"type": "http.response.start", "status": reply.status_code, "headers": response_headers}
+            )
+            if reply.chunks is None:
+                await send({"type": "http.response.body", "body": body})
+                return
+            await self._stream_until_disconnect(reply.chunks, receive, send)
+        finally:
+            if reply.close is not None:
+                await reply.close()
+
+    @staticmethod
+    async def _stream_until_disconnect(
+        chunks: AsyncIterator[bytes], receive: Receive, send: Send
+    ) -> None:
+        """Stream ``chunks``, stopping early (and freeing the upstream) if the client leaves."""
+
+        async def stream() -> None:
+            async for chunk in chunks:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def watch() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        streaming = asyncio.ensure_future(stream())
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await asyncio.wait({streaming, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (streaming, watcher):
+                task.cancel()
+        if streaming.done() and not streaming.cancelled():
+            streaming.result()
+
+
+def build_proxy_app(
+    config: AppConfig,
+    verbose: bool = False,
+    transport: httpx.AsyncBaseTransport | None = None,
+    lean: bool = False,
+    state: ProxyState | None = None,
+) -> ASGIApp:
+    """Build the proxy ASGI app.
+
+    With ``lean=True`` proxied traffic bypasses FastAPI routing and Request
+    construction; FastAPI then only serves lifespan and ``/_swapper/`` routes.
+    """
+    logger = logging.getLogger("ollama_swapper.proxy")
+    if not logger.handlers:
+        logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
+    metrics = Metrics()
+    http2_upstreams = {
+        model_policy.upstream
+        for model_policy in config.policy.models.values()
+        if model_policy.http2 and model_policy.upstream
+    }
+    clients = _ClientPool(transport, http2_upstreams, logger)
+    state = state or LocalState()
+    forwarder = _Forwarder(config, metrics, clients, logger, state)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        yield
+        await forwarder.cancel_shadows()
+        await clients.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.metrics = metrics
+    app.state.proxy_state = state
+
+    @app.get(ADMIN_PREFIX + "metrics")
+    async def metrics_snapshot() -> dict[str, Any]:
+        return metrics.snapshot()
+
+    @app.get(ADMIN_PREFIX + "mirror")
+    async def mirror_report() -> dict[str, Any]:
+        return forwarder.mirrors.report()
+
+    @app.get(ADMIN_PREFIX + "state")
+    async def state_snapshot() -> dict[str, Any]:
+        await forwarder.refresh_loaded()
+        snapshot: dict[str, Any] = {"models": await state.snapshot()}
+        if forwarder.scheduler is not None:
+            snapshot["scheduler"] = forwarder.scheduler.snapshot()
+        return snapshot
+
+    @app.get(ADMIN_PREFIX + "top")
+    async def top_feed(interval: float = DEFAULT_INTERVAL, count: int | None = None) -> Response:
+        return StreamingResponse(
+            top_events(forwarder.top_frame, max(interval, MIN_INTERVAL), count),
+            media_type="application/x-ndjson",
+        )
+
+    if lean:
+        return _LeanProxyApp(forwarder, app)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def proxy(path: str, request: Request) -> Response:
+        reply = await forwarder.forward(
+            request.method,
+            path,
+            request.url.query,
+            dict(request.headers),
+            await request.body(),
+            client=request.client.host if request.client else None,
+        )
+        return _to_starlette_response(reply)
 
     return app
+
+
+def create_app() -> ASGIApp:
+    """App factory for multi-worker uvicorn; settings come from the environment set by the CLI."""
+    config = load_config(os.environ[CONFIG_PATH_ENV])
+    return build_proxy_app(
+        config,
+        verbose=os.environ.get(VERBOSE_ENV) == "1",
+        lean=os.environ.get(LEAN_ENV) == "1",
+        state=state_from_env(),
+    )
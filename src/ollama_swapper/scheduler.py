@@ -0,0 +1,226 @@
+# Priority classes, weighted fair queuing and per-client token buckets in front of the upstream.
+# Usage: if not scheduler.admit(cls, client, tokens): await scheduler.acquire(cls, client)
+from __future__ import annotations
+
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping
+
+from .config import SchedulerConfig
+from .metrics import Metrics
+
+# Assumed output length when a request doesn't set options.num_predict.
+DEFAULT_PREDICT_TOKENS = 256
+# Rough bytes-per-token for prompt text; only used to charge token buckets.
+BYTES_PER_TOKEN = 4
+
+
+def prompt_tokens(payload: Mapping[str, Any]) -> int:
+    """Approximate prompt tokens from the size of ``messages`` or ``prompt``."""
+    prompt: Any = payload.get("messages") if "messages" in payload else payload.get("prompt", "")
+    if isinstance(prompt, str):
+        prompt_bytes = len(prompt.encode("utf-8"))
+    else:
+        prompt_bytes = len(json.dumps(prompt, ensure_ascii=False).encode("utf-8"))
+    return prompt_bytes // BYTES_PER_TOKEN
+
+
+def num_predict(payload: Mapping[str, Any]) -> int | None:
+    options = payload.get("options") or {}
+    value = options.get("num_predict") if isinstance(options, dict) else None
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return None
+    return value
+
+
+def estimate_tokens(payload: Mapping[str, Any]) -> int:
+    """Prompt size plus requested output, for rate limiting rather than exact accounting."""
+    return prompt_tokens(payload) + (num_predict(payload) or DEFAULT_PREDICT_TOKENS)
+
+
+class TokenBucket:
+    """Refills at ``rate_per_minute``; holds at most one minute of allowance."""
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float]) -> None:
+        self.capacity = rate_per_minute
+        self._rate = rate_per_minute / 60.0
+        self._clock = clock
+        self._tokens = rate_per_minute
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available; 0 when it can be taken now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self._rate
+
+    def take(self, amount: float) -> None:
+        self._tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    seq: int
+    start: float = field(compare=False)
+    priority: str = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class Scheduler:
+    """Start-time fair queuing over (priority class, client) flows.
+
+    Each request gets a virtual start tag ``max(V, flow's last finish)`` and a finish
+    tag ``start + 1/weight``; free dispatch slots go to the smallest finish tag. A
+    class with weight 4 thus gets four requests through for every one of a weight-1
+    class, and clients inside a class take turns instead of the busiest one winning.
+    """
+
+    def __init__(
+        self,
+        config: SchedulerConfig,
+        metrics: Metrics,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.config = config
+        self.metrics = metrics
+        self._clock = clock
+        self._networks = [
+            (ipaddress.ip_network(address, strict=False), name)
+            for address, name in config.clients.items()
+        ]
+        self._buckets: dict[tuple[str, str, str], TokenBucket] = {}
+        self._flow_finish: dict[tuple[str, str], float] = {}
+        self._virtual_time = 0.0
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._queued: dict[str, int] = {}
+
+    def classify(self, headers: Mapping[str, str], client: str | None) -> tuple[str, str]:
+        """Return ``(priority class, client id)`` from API key, client address or header.
+
+        Configured API-key and address mappings always win, so a mapped client cannot
+        move itself out of its class (and its rate limits) with the header.
+        """
+        config = self.config
+        api_key = None
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            api_key = authorization[7:].strip() or None
+        client_id = f"key:{api_key}" if api_key else f"addr:{client or 'unknown'}"
+
+        if api_key and api_key in config.api_keys:
+            return config.api_keys[api_key], client_id
+        if client:
+            try:
+                address = ipaddress.ip_address(client)
+            except ValueError:
+                address = None
+            for network, name in self._networks:
+                if address is not None and address in network:
+                    return name, client_id
+        requested = headers.get(config.header)
+        if requested in config.classes:
+            return requested, client_id
+        return config.default_class, client_id
+
+    def _bucket(self, kind: str, priority: str, client_id: str, rate: float) -> TokenBucket:
+        key = (kind, priority, client_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, self._clock)
+        return bucket
+
+    def admit(self, priority: str, client_id: str, tokens: int) -> float:
+        """Charge the client's buckets; returns 0, or seconds to wait when a bucket is empty."""
+        priority_class = self.config.classes[priority]
+        charges: list[tuple[TokenBucket, float]] = []
+        limits: tuple[tuple[str, float | None, float], ...] = (
+            ("requests", priority_class.requests_per_minute, 1.0),
+            ("tokens", priority_class.tokens_per_minute, tokens),
+        )
+        for kind, rate, amount in limits:
+            if rate is not None:
+                charges.append((self._bucket(kind, priority, client_id, rate), amount))
+        retry_after = max((bucket.wait_time(amount) for bucket, amount in charges), default=0.0)
+        if retry_after > 0:
+            self.metrics.incr("rate_limited", priority=priority)
+            return retry_after
+        for bucket, amount in charges:
+            bucket.take(amount)
+        return 0.0
+
+    def queued(self, priority: str | None = None) -> int:
+        if priority is None:
+            return sum(self._queued.values())
+        return self._queued.get(priority, 0)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "active": self._active,
+            "max_concurrency": self.config.max_concurrency,
+            "queued": {name: self._queued.get(name, 0) for name in self.config.classes},
+        }
+
+    async def acquire(self, priority: str, client_id: str) -> None:
+        """Wait for a dispatch slot; pair every successful call with ``release()``."""
+        flow = (priority, client_id)
+        start = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + 1.0 / self.config.classes[priority].weight
+        self._flow_finish[flow] = finish
+        enqueued_at = self._clock()
+
+        if self._active < self.config.max_concurrency and not self._heap:
+            self._active += 1
+            self._virtual_time = start
+            self.metrics.observe("queue_wait_ms", 0.0, priority=priority)
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, _Waiter(finish, next(self._seq), start, priority, future))
+        self._queued[priority] = self._queued.get(priority, 0) + 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot in the same tick the caller went away.
+                self.release()
+            else:
+                future.cancel()
+                self._queued[priority] -= 1
+            raise
+        self.metrics.observe(
+            "queue_wait_ms", (self._clock() - enqueued_at) * 1000, priority=priority
+        )
+
+    def release(self) -> None:
+        self._active = max(self._active - 1, 0)
+        while self._heap and self._active < self.config.max_concurrency:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            self._queued[waiter.priority] -= 1
+            self._virtual_time = waiter.start
+            self._active += 1
+            waiter.future.set_result(None)
+        if not self._heap and not self._active:
+            # Idle: every flow is caught up, so forget per-client tags.
+            self._flow_finish.clear()
+            self._virtual_time = 0.0
@@ -0,0 +1,348 @@
+# Discrete-event simulator for swap policies replayed against a request trace.
+# Usage: simulate(load_trace("trace.jsonl"), load_profiles("profiles.yaml"), config.policy, vram_bytes)
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from .config import PolicyConfig, _load_raw_config
+from .policy import apply_policy, parse_keep_alive
+
+SCHEDULING_MODES = ("fifo", "first-fit")
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    load_seconds: float
+    weight_bytes: int
+    tokens_per_second: float
+    prompt_tokens_per_second: float = 1000.0
+    kv_bytes_per_token: int = 0
+    max_parallel: int = 1
+
+
+@dataclass(frozen=True)
+class TraceRequest:
+    arrival: float
+    model: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    keep_alive: int | str | None = None
+    num_ctx: int | None = None
+
+
+@dataclass
+class SimulationResult:
+    requests: int = 0
+    completed: int = 0
+    rejected: int = 0
+    loads: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    duration: float = 0.0
+    peak_vram_bytes: int = 0
+    vram_utilisation: float = 0.0
+    queue_wait: list[float] = field(default_factory=list)
+    ttft: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "duration": round(self.duration, 3),
+            "peak_vram_bytes": self.peak_vram_bytes,
+            "vram_utilisation": round(self.vram_utilisation, 4),
+            "queue_wait": _distribution(self.queue_wait),
+            "ttft": _distribution(self.ttft),
+        }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+        "p50": round(percentile(ordered, 0.50), 4),
+        "p95": round(percentile(ordered, 0.95), 4),
+        "p99": round(percentile(ordered, 0.99), 4),
+        "max": round(ordered[-1], 4) if ordered else 0.0,
+    }
+
+
+@dataclass
+class _ModelState:
+    profile: ModelProfile
+    footprint: int = 0
+    loaded: bool = False
+    loading: bool = False
+    active: int = 0
+    last_used: float = 0.0
+    keep_alive: float = 0.0
+    expiry_token: int = 0
+
+
+# (arrival order, request, keep_alive seconds, num_ctx)
+_Pending = tuple[int, TraceRequest, float, int]
+
+# Event kinds, ordered so that completions free capacity before same-time arrivals.
+_LOAD_DONE = 0
+_REQUEST_DONE = 1
+_EXPIRE = 2
+_ARRIVAL = 3
+
+
+class _Simulator:
+    def __init__(
+        self,
+        profiles: Mapping[str, ModelProfile],
+        policy: PolicyConfig,
+        vram_bytes: int,
+        max_loaded: int | None,
+        scheduling: str,
+    ) -> None:
+        if scheduling not in SCHEDULING_MODES:
+            raise ValueError(f"scheduling must be one of {SCHEDULING_MODES}")
+        self.profiles = profiles
+        self.policy = policy
+        self.vram_bytes = vram_bytes
+        self.max_loaded = max_loaded
+        self.scheduling = scheduling
+        self.models: dict[str, _ModelState] = {}
+        # fifo: one queue in arrival order. first-fit: one queue per model, so a pass only
+        # tries each model's head instead of rescanning every queued request.
+        self.pending: deque[_Pending] = deque()
+        self.pending_by_model: dict[str, deque[_Pending]] = {}
+        self.arrivals = itertools.count()
+        self.events: list[tuple[float, int, int, Any]] = []
+        self.seq = 0
+        self.used = 0
+        self.now = 0.0
+        self.vram_seconds = 0.0
+        self.result = SimulationResult()
+
+    def push(self, at: float, kind: int, data: Any) -> None:
+        self.seq += 1
+        heapq.heappush(self.events, (at, kind, self.seq, data))
+
+    def advance(self, at: float) -> None:
+        self.vram_seconds += self.used * (at - self.now)
+        self.now = at
+
+    def run(self, trace: Iterable[TraceRequest]) -> SimulationResult:
+        start: float | None = None
+        for request in trace:
+            start = request.arrival if start is None else min(start, request.arrival)
+            self.push(request.arrival, _ARRIVAL, request)
+            self.result.requests += 1
+        self.now = start or 0.0
+        while self.events:
+            at, kind, _, data = heapq.heappop(self.events)
+            self.advance(at)
+            if kind == _ARRIVAL:
+                self.arrive(data)
+            elif kind == _LOAD_DONE:
+                state = self.models[data]
+                state.loading = False
+                state.loaded = True
+            elif kind == _REQUEST_DONE:
+                self.finish(data)
+            elif kind == _EXPIRE:
+                name, token = data
+                state = self.models[name]
+                if state.expiry_token != token or state.active or not state.loaded:
+                    continue
+                self.unload(name)
+                self.result.expirations += 1
+            self.schedule()
+
+        self.result.duration = self.now - (start or 0.0)
+        if self.result.duration > 0 and self.vram_bytes > 0:
+            self.result.vram_utilisation = self.vram_seconds / (
+                self.vram_bytes * self.result.duration
+            )
+        return self.result
+
+    def arrive(self, request: TraceRequest) -> None:
+        payload: dict[str, Any] = {"model": request.model}
+        if request.keep_alive is not None:
+            payload["keep_alive"] = request.keep_alive
+        if request.num_ctx is not None:
+            payload["options"] = {"num_ctx": request.num_ctx}
+        payload = apply_policy(payload, self.policy)
+        profile = self.profiles.get(request.model)
+        num_ctx = payload["options"].get("num_ctx") or 0
+        if profile is None or self.footprint(profile, num_ctx) > self.vram_bytes:
+            self.result.rejected += 1
+            return
+        keep_alive = parse_keep_alive(payload.get("keep_alive"))
+        entry = (next(self.arrivals), request, keep_alive, num_ctx)
+        if self.scheduling == "fifo":
+            self.pending.append(entry)
+        else:
+            self.pending_by_model.setdefault(request.model, deque()).append(entry)
+
+    def footprint(self, profile: ModelProfile, num_ctx: int) -> int:
+        kv = profile.kv_bytes_per_token * num_ctx * max(profile.max_parallel, 1)
+        return profile.weight_bytes + kv
+
+    def schedule(self) -> None:
+        if self.scheduling == "fifo":
+            # The head blocks everything behind it, so stop at the first request that waits.
+            while self.pending and self.try_start(*self.pending[0][1:]):
+                self.pending.popleft()
+            return
+        # first-fit: models take turns in the order their oldest request arrived; within a
+        # model requests keep their order.
+        heads = sorted(
+            (queue[0][0], model) for model, queue in self.pending_by_model.items()
+        )
+        for _, model in heads:
+            queue = self.pending_by_model[model]
+            while queue and self.try_start(*queue[0][1:]):
+                queue.popleft()
+            if not queue:
+                del self.pending_by_model[model]
+
+    def try_start(self, request: TraceRequest, keep_alive: float, num_ctx: int) -> bool:
+        state = self.models.get(request.model)
+        if state is None:
+            state = _ModelState(profile=self.profiles[request.model])
+            self.models[request.model] = state
+        profile = state.profile
+
+        if state.loading:
+            return False
+        if state.loaded and self.footprint(profile, num_ctx) > state.footprint:
+            # A larger context forces a reload, like Ollama does when num_ctx changes.
+            if state.active:
+                return False
+            self.unload(request.model)
+        if not state.loaded:
+            if not self.make_room(request.model, self.footprint(profile, num_ctx)):
+                return False
+            state.footprint = self.footprint(profile, num_ctx)
+            state.loading = True
+            self.used += state.footprint
+            self.result.peak_vram_bytes = max(self.result.peak_vram_bytes, self.used)
+            self.result.loads += 1
+            self.push(self.now + profile.load_seconds, _LOAD_DONE, request.model)
+            return False
+        if state.active >= max(profile.max_parallel, 1):
+            return False
+
+        state.active += 1
+        state.expiry_token += 1
+        state.keep_alive = keep_alive
+        prompt_seconds = request.prompt_tokens / profile.prompt_tokens_per_second
+        output_seconds = request.output_tokens / profile.tokens_per_second
+        self.result.queue_wait.append(self.now - request.arrival)
+        self.result.ttft.append(self.now + prompt_seconds - request.arrival)
+        self.push(self.now + prompt_seconds + output_seconds, _REQUEST_DONE, request.model)
+        return True
+
+    def make_room(self, model: str, needed: int) -> bool:
+        loaded = [
+            name
+            for name, state in self.models.items()
+            if (state.loaded or state.loading) and name != model
+        ]
+
+        def fits() -> bool:
+            within_count = self.max_loaded is None or len(loaded) < self.max_loaded
+            return within_count and self.used + needed <= self.vram_bytes
+
+        idle = sorted(
+            (name for name in loaded if self.models[name].loaded and not self.models[name].active),
+            key=lambda name: self.models[name].last_used,
+        )
+        while not fits() and idle:
+            victim = idle.pop(0)
+            self.unload(victim)
+            loaded.remove(victim)
+            self.result.evictions += 1
+        return fits()
+
+    def finish(self, model: str) -> None:
+        state = self.models[model]
+        state.active -= 1
+        state.last_used = self.now
+        self.result.completed += 1
+        if state.active:
+            return
+        if state.keep_alive <= 0:
+            self.unload(model)
+        elif math.isfinite(state.keep_alive):
+            state.expiry_token += 1
+            self.push(self.now + state.keep_alive, _EXPIRE, (model, state.expiry_token))
+
+    def unload(self, model: str) -> None:
+        state = self.models[model]
+        if state.loaded or state.loading:
+            self.used -= state.footprint
+        state.loaded = False
+        state.loading = False
+        state.footprint = 0
+        state.expiry_token += 1
+
+
+def simulate(
+    trace: Iterable[TraceRequest],
+    profiles: Mapping[str, ModelProfile],
+    policy: PolicyConfig,
+    vram_bytes: int,
+    max_loaded: int | None = None,
+    scheduling: str = "fifo",
+) -> SimulationResult:
+    """Replay ``trace`` against a single GPU governed by ``policy``.
+
+    ``fifo`` mirrors Ollama's scheduler: a request that cannot start (model
+    loading, no VRAM, parallel slots full) blocks everything queued behind it.
+    ``first-fit`` lets later requests for other, hot models overtake it; requests for
+    the same model still start in arrival order.
+    """
+    simulator = _Simulator(profiles, policy, vram_bytes, max_loaded, scheduling)
+    return simulator.run(trace)
+
+
+def load_trace(path: str | Path) -> list[TraceRequest]:
+    """Load a JSONL trace of ``{"arrival", "model", "prompt_tokens", "output_tokens"}`` rows."""
+    requests: list[TraceRequest] = []
+    with Path(path).open("r", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            requests.append(
+                TraceRequest(
+                    arrival=float(raw["arrival"]),
+                    model=raw["model"],
+                    prompt_tokens=int(raw.get("prompt_tokens", 0)),
+                    output_tokens=int(raw.get("output_tokens", 0)),
+                    keep_alive=raw.get("keep_alive"),
+                    num_ctx=raw.get("num_ctx"),
+                )
+            )
+    return requests
+
+
+def load_profiles(path: str | Path) -> dict[str, ModelProfile]:
+    """Load per-model profiles (YAML or JSON) keyed by model name."""
+    raw = _load_raw_config(Path(path))
+    return {name: ModelProfile(**values) for name, values in raw.items()}
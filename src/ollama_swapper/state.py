@@ -0,0 +1,289 @@
+# Per-model proxy state (in-flight counts, idle timestamps, loaded models) shared across workers.
+# Usage: state = state_from_env(); await state.begin(model); await state.end(model, keep_alive_seconds)
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+STATE_ADDRESS_ENV = "OLLAMA_SWAPPER_STATE"
+
+logger = logging.getLogger("ollama_swapper.state")
+
+
+@dataclass
+class _ModelEntry:
+    in_flight: int = 0
+    last_used: float | None = None
+    loaded_until: float = 0.0
+
+
+class StateStore:
+    """Thread-safe per-model state; the single source of truth inside one process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: dict[str, _ModelEntry] = {}
+        # Last /api/ps answer: model -> {"size_vram": ...}, and when it was taken.
+        self._ps: dict[str, dict[str, Any]] = {}
+        self._ps_at: float | None = None
+
+    def begin(self, model: str, now: float) -> None:
+        with self._lock:
+            entry = self._models.setdefault(model, _ModelEntry())
+            entry.in_flight += 1
+            entry.last_used = now
+
+    def end(self, model: str, now: float, keep_alive: float) -> None:
+        with self._lock:
+            entry = self._models.setdefault(model, _ModelEntry())
+            entry.in_flight = max(entry.in_flight - 1, 0)
+            entry.last_used = now
+            entry.loaded_until = now + keep_alive
+
+    def set_loaded(self, models: dict[str, dict[str, Any]], now: float) -> None:
+        """Record what Ollama's /api/ps reported; it overrides the keep_alive estimate."""
+        with self._lock:
+            self._ps = dict(models)
+            self._ps_at = now
+
+    def _loaded(self, model: str, entry: _ModelEntry, now: float) -> bool:
+        if entry.in_flight:
+            return True
+        if self._ps_at is None:
+            return now < entry.loaded_until
+        if model in self._ps:
+            return True
+        # Served after the last /api/ps, so Ollama loaded it since.
+        used_since = entry.last_used is not None and entry.last_used > self._ps_at
+        return used_since and now < entry.loaded_until
+
+    def snapshot(self, now: float) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            result: dict[str, dict[str, Any]] = {}
+            ps_only = [name for name in self._ps if name not in self._models]
+            for model in [*self._models, *ps_only]:
+                entry = self._models.get(model) or _ModelEntry()
+                result[model] = {
+                    "in_flight": entry.in_flight,
+                    "last_used": entry.last_used,
+                    "idle_seconds": (
+                        round(now - entry.last_used, 3)
+                        if entry.last_used is not None and not entry.in_flight
+                        else 0.0
+                    ),
+                    "loaded": self._loaded(model, entry, now),
+                    "size_vram": self._ps.get(model, {}).get("size_vram"),
+                }
+            return result
+
+    def apply(self, message: dict[str, Any]) -> dict[str, Any] | None:
+        """Apply one wire-protocol message; only ``snapshot`` produces a reply."""
+        op = message.get("op")
+        now = float(message.get("now", time.time()))
+        if op == "begin":
+            self.begin(message["model"], now)
+        elif op == "end":
+            keep_alive = message.get("keep_alive")
+            self.end(message["model"], now, math.inf if keep_alive is None else keep_alive)
+        elif op == "loaded":
+            self.set_loaded(message["models"], now)
+        elif op == "snapshot":
+            return {"models": self.snapshot(now)}
+        else:
+            raise ValueError(f"unknown state op: {op!r}")
+        return None
+
+
+class LocalState:
+    """In-process state for a single worker."""
+
+    def __init__(self, store: StateStore | None = None) -> None:
+        self.store = store or StateStore()
+
+    async def begin(self, model: str) -> None:
+        self.store.begin(model, time.time())
+
+    async def end(self, model: str, keep_alive: float) -> None:
+        self.store.end(model, time.time(), keep_alive)
+
+    async def set_loaded(self, models: dict[str, dict[str, Any]]) -> None:
+        self.store.set_loaded(models, time.time())
+
+    async def snapshot(self) -> dict[str, dict[str, Any]]:
+        return self.store.snapshot(time.time())
+
+
+def _encode(message: dict[str, Any]) -> bytes:
+    # JSON has no infinity; None stands for "keep loaded indefinitely".
+    if message.get("keep_alive") == math.inf:
+        message["keep_alive"] = None
+    return json.dumps(message).encode("utf-8") + b"\n"
+
+
+class SharedStateClient:
+    """Worker-side client for a StateServer.
+
+    Updates are fire-and-forget writes on one persistent connection, so they add
+    no round trip to the request path; only ``snapshot`` waits for a reply.
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+        # One connection per worker: the server applies each connection's messages in
+        # order, but separate connections are handled by separate threads.
+        self._connect_lock = asyncio.Lock()
+
+    def _connected(self) -> bool:
+        writer = self._writer
+        return self._reader is not None and writer is not None and not writer.is_closing()
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if not self._connected():
+            async with self._connect_lock:
+                if not self._connected():
+                    kind, _, target = self.address.partition(":")
+                    if kind == "unix":
+                        self._reader, self._writer = await asyncio.open_unix_connection(target)
+                    else:
+                        host, _, port = target.rpartition(":")
+                        self._reader, self._writer = await asyncio.open_connection(
+                            host, int(port)
+                        )
+        assert self._reader is not None and self._writer is not None
+        return self._reader, self._writer
+
+    def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _send(self, message: dict[str, Any]) -> None:
+        try:
+            _, writer = await self._connect()
+            writer.write(_encode(message))
+        except OSError as exc:
+            logger.warning("state server unavailable address=%s error=%s", self.address, exc)
+            self._reset()
+
+    async def begin(self, model: str) -> None:
+        await self._send({"op": "begin", "model": model, "now": time.time()})
+
+    async def end(self, model: str, keep_alive: float) -> None:
+        await self._send({"op": "end", "model": model, "now": time.time(), "keep_alive": keep_alive})
+
+    async def set_loaded(self, models: dict[str, dict[str, Any]]) -> None:
+        await self._send({"op": "loaded", "models": models, "now": time.time()})
+
+    async def snapshot(self) -> dict[str, dict[str, Any]]:
+        async with self._lock:
+            try:
+                reader, writer = await self._connect()
+                writer.write(_encode({"op": "snapshot", "now": time.time()}))
+                await writer.drain()
+                line = await reader.readline()
+            except OSError as exc:
+                logger.warning("state server unavailable address=%s error=%s", self.address, exc)
+                self._reset()
+                return {}
+        if not line:
+            self._reset()
+            return {}
+        return json.loads(line)["models"]
+
+
+ProxyState = LocalState | SharedStateClient
+
+
+class _StateRequestHandler(socketserver.StreamRequestHandler):
+    server: _UnixStateServer | _TCPStateServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                reply = self.server.store.apply(json.loads(line))
+            except (ValueError, KeyError) as exc:
+                logger.warning("bad state message error=%s", exc)
+                continue
+            if reply is not None:
+                self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+
+    class _UnixStateServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        store: StateStore
+
+else:  # pragma: no cover - Windows has no AF_UNIX socketserver
+    _UnixStateServer = None  # type: ignore[assignment,misc]
+
+
+class _TCPStateServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    store: StateStore
+
+
+class StateServer:
+    """Owns the shared StateStore in the supervisor process and serves it to workers.
+
+    Listens on a private Unix socket, or loopback TCP where AF_UNIX is unavailable.
+    """
+
+    def __init__(self, store: StateStore | None = None) -> None:
+        self.store = store or StateStore()
+        self._path: str | None = None
+        if _UnixStateServer is not None and sys.platform != "win32":
+            self._path = os.path.join(
+                tempfile.mkdtemp(prefix="ollama-swapper-"), "state.sock"
+            )
+            self._server: socketserver.BaseServer = _UnixStateServer(
+                self._path, _StateRequestHandler
+            )
+            self.address = f"unix:{self._path}"
+        else:
+            host = "127.0.0.1"
+            self._server = _TCPStateServer((host, 0), _StateRequestHandler)
+            port = self._server.server_address[1]
+            self.address = f"tcp:{host}:{port}"
+        self._server.store = self.store  # type: ignore[attr-defined]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="ollama-swapper-state", daemon=True
+        )
+
+    def start(self) -> StateServer:
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._path:
+            try:
+                os.unlink(self._path)
+                os.rmdir(os.path.dirname(self._path))
+            except OSError:
+                pass
+
+
+def state_from_env() -> ProxyState:
+    """Connect to the supervisor's StateServer when running under multiple workers."""
+    address = os.environ.get(STATE_ADDRESS_ENV)
+    if address:
+        return SharedStateClient(address)
+    return LocalState()
+
@@ -1,7 +1,8 @@
 # Helpers for listing and stopping loaded Ollama models via the CLI.
-# Usage: run_ps() -> parse_ps_output() -> stop_models(models)
+# Usage: run_ps() -> parse_ps_output() / parse_ps_rows() -> stop_models(models)
 from __future__ import annotations
 
+import re
 import subprocess
 from dataclasses import dataclass
 from typing import Iterable
@@ -26,6 +27,25 @@ def parse_ps_output(output: str) -> list[str]:
     return models
 
 
+def parse_ps_rows(output: str) -> list[dict[str, str]]:
+    """Parse the aligned `ollama ps` table into one dict per model keyed by lowercase header."""
+    lines = [line.rstrip() for line in output.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    header = lines[0]
+    starts = [match.start() for match in re.finditer(r"\S+", header)]
+    names = [header[start:].split()[0].lower() for start in starts]
+    rows: list[dict[str, str]] = []
+    for line in lines[1:]:
+        row: dict[str, str] = {}
+        for index, (name, start) in enumerate(zip(names, starts)):
+            end = starts[index + 1] if index + 1 < len(starts) else None
+            row[name] = line[start:end].strip()
+        rows.append(row)
+    return rows
+
+
 def run_ps() -> str:
     completed = subprocess.run(
         ["ollama", "ps"],
@@ -0,0 +1,122 @@
+# Linear-time assembly of streamed OpenAI tool-call fragments, with JSON completion detection.
+# Usage: assembler = ToolCallAssembler(emit_early=True); ready = assembler.feed(delta["tool_calls"])
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+# One match consumes a whole run of string content (escapes included) or of non-structural
+# characters outside strings, so the Python-level loop runs per token, not per character.
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_OUTSIDE = re.compile(r'[^"{}\[\]]*')
+
+
+class JsonScanner:
+    """Notices when a JSON object or array fed in fragments has closed.
+
+    Only string/escape state and nesting depth are tracked, so each fragment is
+    scanned once; the document is parsed once, after it is complete.
+    """
+
+    __slots__ = ("depth", "complete", "_in_string", "_escaped", "_started")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+
+    def feed(self, fragment: str) -> bool:
+        if self.complete or not fragment:
+            return self.complete
+        position, end = 0, len(fragment)
+        if self._escaped:
+            # The previous fragment ended in a backslash; this character is its escapee.
+            position, self._escaped = 1, False
+        while position < end:
+            if self._in_string:
+                position = _STRING_BODY.match(fragment, position).end()  # type: ignore[union-attr]
+                if position == end:
+                    break
+                if fragment[position] == "\\":
+                    self._escaped = True
+                    break
+                self._in_string = False
+                position += 1
+                continue
+            position = _OUTSIDE.match(fragment, position).end()  # type: ignore[union-attr]
+            if position == end:
+                break
+            char = fragment[position]
+            position += 1
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self._started = True
+            else:
+                self.depth -= 1
+                if self.depth == 0 and self._started:
+                    self.complete = True
+                    return True
+        return False
+
+
+@dataclass
+class _PendingCall:
+    id: str = ""
+    name: str = ""
+    fragments: list[str] = field(default_factory=list)
+    scanner: JsonScanner = field(default_factory=JsonScanner)
+    emitted: bool = False
+
+    def to_openai(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": "function",
+            "function": {"name": self.name, "arguments": "".join(self.fragments)},
+        }
+
+
+class ToolCallAssembler:
+    """Accumulates ``delta.tool_calls`` fragments by index.
+
+    With ``emit_early`` a call is handed back from ``feed()`` as soon as its arguments
+    close; otherwise (and for calls whose arguments never form an object) ``finish()``
+    returns them in index order once the stream ends.
+    """
+
+    def __init__(self, emit_early: bool = False) -> None:
+        self.emit_early = emit_early
+        self._calls: dict[int, _PendingCall] = {}
+
+    def feed(self, deltas: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        ready: list[dict[str, Any]] = []
+        for delta in deltas:
+            call = self._calls.setdefault(delta.get("index", 0), _PendingCall())
+            if call.emitted:
+                continue
+            if delta.get("id"):
+                call.id = delta["id"]
+            function = delta.get("function") or {}
+            if function.get("name"):
+                call.name = function["name"]
+            arguments = function.get("arguments")
+            if not arguments:
+                continue
+            call.fragments.append(arguments)
+            if not self.emit_early:
+                continue
+            if call.scanner.feed(arguments) and call.name:
+                call.emitted = True
+                ready.append(call.to_openai())
+        return ready
+
+    def finish(self) -> list[dict[str, Any]]:
+        return [
+            self._calls[index].to_openai()
+            for index in sorted(self._calls)
+            if not self._calls[index].emitted
+        ]
@@ -0,0 +1,237 @@
+# Live proxy activity feed (snapshot + NDJSON deltas) and the `ollama-swapper top` renderer.
+# Usage: async for line in top_events(forwarder.top_frame, interval=0.5): ...; render(frame)
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+from .admission import COLD_LOAD_SECONDS
+
+DEFAULT_INTERVAL = 0.5
+MIN_INTERVAL = 0.1
+# An unchanged feed still sends an empty delta this often so idle times keep ticking.
+HEARTBEAT_SECONDS = 1.0
+# /api/ps is re-read at most this often for the feed and deadline admission, however
+# many viewers or deadline requests there are.
+PS_REFRESH_SECONDS = 2.0
+_MAX_SWAPS = 20
+
+Frame = dict[str, Any]
+
+
+class ActivityTracker:
+    """Per-worker counters the shared model state doesn't hold: queued requests and swaps."""
+
+    def __init__(
+        self, clock: Callable[[], float] = time.time, max_swaps: int = _MAX_SWAPS
+    ) -> None:
+        self._clock = clock
+        self._queued: dict[str, int] = {}
+        self._swaps: deque[dict[str, Any]] = deque(maxlen=max_swaps)
+        self._swap_seq = 0
+
+    def enqueue(self, model: str) -> None:
+        self._queued[model] = self._queued.get(model, 0) + 1
+
+    def dequeue(self, model: str) -> None:
+        remaining = self._queued.get(model, 0) - 1
+        if remaining > 0:
+            self._queued[model] = remaining
+        else:
+            self._queued.pop(model, None)
+
+    def queued(self) -> dict[str, int]:
+        return dict(self._queued)
+
+    def observe(self, model: str, stats: dict[str, Any]) -> None:
+        """Record a swap when Ollama's final stats show the model had to be loaded."""
+        load_s = (stats.get("load_duration") or 0) / 1e9
+        if load_s < COLD_LOAD_SECONDS:
+            return
+        self._swap_seq += 1
+        self._swaps.append(
+            {"seq": self._swap_seq, "at": self._clock(), "model": model, "load_ms": load_s * 1000}
+        )
+
+    def swaps(self) -> list[dict[str, Any]]:
+        return list(self._swaps)
+
+
+def build_frame(
+    models: dict[str, dict[str, Any]],
+    activity: ActivityTracker,
+    tokens_per_s: Callable[[str], float | None],
+    scheduler: dict[str, Any] | None,
+    now: float,
+) -> Frame:
+    queued = activity.queued()
+    rows: dict[str, dict[str, Any]] = {}
+    for model in [*models, *(name for name in queued if name not in models)]:
+        entry = models.get(model, {})
+        rate = tokens_per_s(model)
+        rows[model] = {
+            "loaded": bool(entry.get("loaded")),
+            "size_vram": entry.get("size_vram"),
+            "in_flight": entry.get("in_flight", 0),
+            "queued": queued.get(model, 0),
+            "tokens_per_s": round(rate, 1) if rate is not None else None,
+            # A timestamp rather than idle seconds, so an idle model produces no deltas.
+            "last_used": entry.get("last_used"),
+        }
+    return {"now": now, "models": rows, "scheduler": scheduler, "swaps": activity.swaps()}
+
+
+def diff_frames(previous: Frame, current: Frame) -> Frame | None:
+    """What changed between two frames, ignoring ``now``; None when nothing did."""
+    delta: Frame = {}
+    old_models, new_models = previous["models"], current["models"]
+    changed: dict[str, dict[str, Any]] = {}
+    for model, row in new_models.items():
+        old = old_models.get(model)
+        if old is None:
+            changed[model] = row
+            continue
+        fields = {key: value for key, value in row.items() if old.get(key) != value}
+        if fields:
+            changed[model] = fields
+    if changed:
+        delta["models"] = changed
+    removed = [model for model in old_models if model not in new_models]
+    if removed:
+        delta["removed"] = removed
+    if current["scheduler"] != previous["scheduler"]:
+        delta["scheduler"] = current["scheduler"]
+    last_seq = previous["swaps"][-1]["seq"] if previous["swaps"] else 0
+    swaps = [swap for swap in current["swaps"] if swap["seq"] > last_seq]
+    if swaps:
+        delta["swaps"] = swaps
+    return delta or None
+
+
+def apply_delta(frame: Frame, delta: Frame) -> Frame:
+    """Fold one delta message into a frame (client side)."""
+    models = {model: dict(row) for model, row in frame["models"].items()}
+    for model, fields in delta.get("models", {}).items():
+        models.setdefault(model, {}).update(fields)
+    for model in delta.get("removed", []):
+        models.pop(model, None)
+    return {
+        "now": delta.get("now", frame["now"]),
+        "models": models,
+        "scheduler": delta.get("scheduler", frame["scheduler"]),
+        "swaps": (frame["swaps"] + delta.get("swaps", []))[-_MAX_SWAPS:],
+    }
+
+
+def _encode(message: Frame) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def top_events(
+    collect: Callable[[], Awaitable[Frame]],
+    interval: float = DEFAULT_INTERVAL,
+    count: int | None = None,
+    heartbeat: float = HEARTBEAT_SECONDS,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> AsyncIterator[bytes]:
+    """Yield a ``snapshot`` line, then a ``delta`` line whenever a sampled frame changes.
+
+    Frames are sampled every ``interval`` seconds but only serialized when they differ,
+    so an idle proxy costs one in-memory snapshot per tick and a heartbeat per second.
+    ``count`` stops after that many lines.
+    """
+    frame = await collect()
+    yield _encode({"type": "snapshot", **frame})
+    sent, last_sent = 1, clock()
+    while count is None or sent < count:
+        await sleep(interval)
+        current = await collect()
+        delta = diff_frames(frame, current)
+        if delta is None and clock() - last_sent < heartbeat:
+            continue
+        frame = current
+        yield _encode({"type": "delta", "now": current["now"], **(delta or {})})
+        sent, last_sent = sent + 1, clock()
+
+
+def iter_messages(base_url: str, interval: float, count: int | None = None) -> Iterator[Frame]:
+    """Read the proxy's top feed; yields parsed snapshot/delta messages."""
+    import httpx
+
+    params: dict[str, Any] = {"interval": interval}
+    if count is not None:
+        params["count"] = count
+    url = base_url.rstrip("/") + "/_swapper/top"
+    timeout = httpx.Timeout(10.0, read=None)
+    with httpx.stream("GET", url, params=params, timeout=timeout) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def proxy_url(listen: str) -> str:
+    """Base URL for a ``server.listen`` address, reaching wildcard binds via loopback."""
+    host, _, port = listen.rpartition(":")
+    if host in {"", "0.0.0.0", "::", "[::]"}:
+        host = "127.0.0.1"
+    return f"http://{host}:{port}"
+
+
+def _format_bytes(value: int | None) -> str:
+    if not value:
+        return "-"
+    size = float(value)
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _format_idle(row: dict[str, Any], now: float) -> str:
+    if row.get("in_flight") or row.get("last_used") is None:
+        return "-"
+    seconds = max(int(now - row["last_used"]), 0)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds // 60 % 60:02d}m"
+
+
+def render(frame: Frame, source: str = "", swaps: int = 5) -> str:
+    """Format a frame as the text table shown by ``ollama-swapper top``."""
+    now = frame["now"]
+    header = f"ollama-swapper top  {source}  {time.strftime('%H:%M:%S', time.localtime(now))}"
+    scheduler = frame.get("scheduler")
+    if scheduler:
+        queues = " ".join(f"{name}={depth}" for name, depth in scheduler["queued"].items())
+        header += f"  slots {scheduler['active']}/{scheduler['max_concurrency']}  queued {queues}"
+    lines = [
+        header,
+        "",
+        f"{'MODEL':32} {'LOADED':6} {'VRAM':>10} {'RUN':>4} {'QUEUE':>5} {'TOK/S':>7} {'IDLE':>7}",
+    ]
+    rows = sorted(frame["models"].items(), key=lambda item: (not item[1].get("loaded"), item[0]))
+    for model, row in rows:
+        rate = row.get("tokens_per_s")
+        lines.append(
+            f"{model[:32]:32} {'yes' if row.get('loaded') else 'no':6} "
+            f"{_format_bytes(row.get('size_vram')):>10} {row.get('in_flight', 0):>4} "
+            f"{row.get('queued', 0):>5} {f'{rate:.1f}' if rate is not None else '-':>7} "
+            f"{_format_idle(row, now):>7}"
+        )
+    if not rows:
+        lines.append("(no models seen yet)")
+    recent = frame.get("swaps", [])[-swaps:]
+    if recent:
+        lines += ["", "recent swaps"]
+        for swap in reversed(recent):
+            at = time.strftime("%H:%M:%S", time.localtime(swap["at"]))
+            lines.append(f"  {at}  {swap['model']}  load {swap['load_ms'] / 1000:.1f}s")
+    return "\n".join(lines)
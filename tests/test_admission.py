@@ -0,0 +1,82 @@
+# Tests for deadline parsing and completion-time estimates.
+# Usage: pytest tests/test_admission.py
+import json
+
+import pytest
+
+from ollama_swapper.admission import CompletionEstimator, final_stats, parse_deadline_ms
+
+_STATS = {
+    "done": True,
+    "total_duration": 8_000_000_000,
+    "load_duration": 5_000_000_000,
+    "prompt_eval_count": 200,
+    "prompt_eval_duration": 500_000_000,
+    "eval_count": 100,
+    "eval_duration": 2_000_000_000,
+}
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_parse_deadline_ms() -> None:
+    assert parse_deadline_ms(None) is None
+    assert parse_deadline_ms("1500") == 1500.0
+    assert parse_deadline_ms(250) == 250.0
+    for bad in ("soon", 0, -5, True):
+        with pytest.raises(ValueError):
+            parse_deadline_ms(bad)
+
+
+def test_final_stats_reads_closing_chunk() -> None:
+    tail = b'{"message":{"content":"a"},"done":false}\n' + json.dumps(_STATS).encode() + b"\n"
+    assert final_stats(tail) == _STATS
+    assert final_stats(b'{"message":{"content":"a"},"done":false}\n') is None
+    assert final_stats(b"partial") is None
+
+
+def test_estimate_uses_observed_rates() -> None:
+    estimator = CompletionEstimator()
+    estimator.observe("http://u", "m", _STATS)
+
+    cold = estimator.estimate("http://u", "m", prompt_tokens=400, num_predict=None, loaded=False)
+    assert cold.load_s == 5.0
+    assert cold.prompt_s == 1.0  # 400 tokens at 400 tokens/s
+    assert cold.eval_s == 2.0  # observed eval_count at 50 tokens/s
+    assert cold.total_s == 8.0
+
+    warm = estimator.estimate(
+        "http://u", "m", prompt_tokens=0, num_predict=25, loaded=True, ahead=3, slots=2
+    )
+    assert warm.load_s == 0.0
+    assert warm.eval_s == 0.5
+    assert warm.queue_s == 12.0  # 3 ahead * 8 s service / 2 slots
+
+
+def test_estimate_without_observations_is_optimistic() -> None:
+    estimate = CompletionEstimator().estimate("http://u", "m", 10_000, 500, loaded=False)
+    assert estimate.total_s == 0.0
+    assert estimate.observed is False
+
+
+def test_warm_loads_do_not_count_as_load_time() -> None:
+    estimator = CompletionEstimator()
+    estimator.observe("http://u", "m", {**_STATS, "load_duration": 20_000_000})
+    assert estimator.estimate("http://u", "m", 0, None, loaded=False).load_s == 0.0
+
+
+def test_served_within_uses_clock() -> None:
+    clock = _Clock()
+    estimator = CompletionEstimator(clock=clock)
+    assert not estimator.served_within("http://u", "m", 300)
+    estimator.observe("http://u", "m", _STATS)
+    clock.now = 299.0
+    assert estimator.served_within("http://u", "m", 300)
+    clock.now = 301.0
+    assert not estimator.served_within("http://u", "m", 300)
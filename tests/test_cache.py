@@ -0,0 +1,113 @@
+# Tests for the metadata cache (TTL, coalescing, invalidation, ETags).
+# Usage: pytest tests/test_cache.py
+import asyncio
+
+from ollama_swapper.cache import MetadataCache, cache_key, etag_matches, make_entry
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_serves_hits_until_ttl_expires() -> None:
+    clock = _Clock()
+    cache = MetadataCache(clock=clock)
+    calls: list[int] = []
+
+    async def fetch():
+        calls.append(1)
+        return make_entry(200, {"content-type": "application/json"}, b'{"models":[]}')
+
+    async def run() -> list[str]:
+        key = cache_key("GET", "api/tags", "", b"")
+        outcomes = [(await cache.get(key, fetch, ttl=5.0))[1]]
+        clock.now = 4.9
+        outcomes.append((await cache.get(key, fetch, ttl=5.0))[1])
+        clock.now = 5.1
+        outcomes.append((await cache.get(key, fetch, ttl=5.0))[1])
+        return outcomes
+
+    assert asyncio.run(run()) == ["miss", "hit", "miss"]
+    assert len(calls) == 2
+
+
+def test_cache_coalesces_concurrent_misses() -> None:
+    cache = MetadataCache()
+    calls: list[int] = []
+    release = asyncio.Event()
+
+    async def fetch():
+        calls.append(1)
+        await release.wait()
+        return make_entry(200, {}, b"{}")
+
+    async def run() -> list[str]:
+        key = cache_key("POST", "api/show", "", b'{"model": "m"}')
+        waiters = [asyncio.create_task(cache.get(key, fetch, ttl=5.0)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return sorted(outcome for _, outcome in await asyncio.gather(*waiters))
+
+    assert asyncio.run(run()) == ["coalesced"] * 4 + ["miss"]
+    assert len(calls) == 1
+
+
+def test_cache_invalidate_drops_entries_and_racing_fetches() -> None:
+    cache = MetadataCache()
+    release = asyncio.Event()
+
+    async def slow_fetch():
+        await release.wait()
+        return make_entry(200, {}, b"old")
+
+    async def fresh_fetch():
+        return make_entry(200, {}, b"new")
+
+    async def run() -> bytes:
+        key = cache_key("GET", "api/tags", "", b"")
+        pending = asyncio.create_task(cache.get(key, slow_fetch, ttl=5.0))
+        await asyncio.sleep(0)
+        cache.invalidate()
+        release.set()
+        await pending
+        entry, _ = await cache.get(key, fresh_fetch, ttl=5.0)
+        return entry.body
+
+    assert asyncio.run(run()) == b"new"
+
+
+def test_cache_does_not_store_errors() -> None:
+    cache = MetadataCache()
+    statuses = iter([500, 200])
+
+    async def fetch():
+        return make_entry(next(statuses), {}, b"")
+
+    async def run() -> list[int]:
+        key = cache_key("GET", "api/version", "", b"")
+        first, _ = await cache.get(key, fetch, ttl=5.0)
+        second, outcome = await cache.get(key, fetch, ttl=5.0)
+        assert outcome == "miss"
+        return [first.status_code, second.status_code]
+
+    assert asyncio.run(run()) == [500, 200]
+
+
+def test_cache_key_normalises_json_bodies() -> None:
+    assert cache_key("POST", "api/show", "", b'{"model":"m","verbose":true}') == cache_key(
+        "POST", "api/show", "", b'{"verbose": true, "model": "m"}'
+    )
+
+
+def test_etag_matches_lists_and_weak_tags() -> None:
+    entry = make_entry(200, {"Content-Length": "2", "Content-Type": "application/json"}, b"{}")
+    assert "Content-Length" not in entry.headers
+    assert etag_matches(entry.etag, entry.etag)
+    assert etag_matches(f'"other", W/{entry.etag}', entry.etag)
+    assert etag_matches("*", entry.etag)
+    assert not etag_matches('"other"', entry.etag)
+    assert not etag_matches(None, entry.etag)
@@ -0,0 +1,109 @@
+# Tests for num_ctx calibration from recorded /api/show metadata.
+# Usage: pytest tests/test_calibrate.py
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+
+from ollama_swapper.calibrate import (
+    GiB,
+    calibrate_models,
+    fetch_shows,
+    kv_bytes_per_token,
+    load_fixtures,
+    parse_architecture,
+    parse_size,
+    write_policy,
+)
+from ollama_swapper.config import load_config
+
+FIXTURES = Path(__file__).parent / "fixtures" / "api_show.json"
+
+
+def test_parse_size_units() -> None:
+    assert parse_size("24GiB") == 24 * GiB
+    assert parse_size("24G") == 24 * GiB
+    assert parse_size("512MiB") == 512 * 1024 * 1024
+    assert parse_size(1000) == 1000
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_parse_architecture_derives_head_dim() -> None:
+    arch = parse_architecture(load_fixtures(FIXTURES)["llama3.1:8b"])
+
+    assert arch.block_count == 32
+    assert arch.key_length == 128
+    assert arch.context_length == 131072
+    # 32 layers * 8 kv heads * (128 + 128) * 2 bytes
+    assert kv_bytes_per_token(arch) == 131072
+    assert kv_bytes_per_token(arch, "q8_0") < kv_bytes_per_token(arch)
+
+
+def test_calibrate_models_fits_budget_and_caps_context() -> None:
+    calibrated = calibrate_models(load_fixtures(FIXTURES), vram_bytes=12 * GiB, tiers=[0.5, 0.25])
+    results = {result.model: result for result in calibrated}
+
+    llama = results["llama3.1:8b"]
+    assert llama.num_ctx == 54272
+    assert llama.num_ctx % 1024 == 0
+    assert llama.tiers[0.5] == 5120
+    assert llama.tiers[0.25] is None  # weights alone exceed 3GiB
+
+    # qwen3 weights are estimated from parameter_count and capped at its context_length
+    assert results["qwen3:8b"].num_ctx == 40960
+    assert results["broken:latest"].num_ctx is None
+    assert results["broken:latest"].error
+
+
+def test_fetch_shows_reports_failing_model_instead_of_aborting() -> None:
+    shows = load_fixtures(FIXTURES)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "llama3.1:8b"}]})
+        name = json.loads(request.content)["model"]
+        if name not in shows:
+            return httpx.Response(404, json={"error": f"model '{name}' not found"})
+        return httpx.Response(200, json=shows[name])
+
+    fetched = asyncio.run(
+        fetch_shows(
+            "http://ollama",
+            ["llama3.1:8b", "nemotron-jp"],
+            transport=httpx.MockTransport(handler),
+        )
+    )
+    results = {result.model: result for result in calibrate_models(fetched, 12 * GiB)}
+
+    assert results["llama3.1:8b"].num_ctx == 54272
+    assert results["nemotron-jp"].num_ctx is None
+    assert results["nemotron-jp"].error == "/api/show returned 404"
+
+
+def test_write_policy_merges_into_config(tmp_path: Path) -> None:
+    base = tmp_path / "config.yaml"
+    base.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11436"
+policy:
+  models:
+    "llama3.1:8b":
+      num_ctx: 1
+      keep_alive: "60s"
+""".strip()
+    )
+    output = tmp_path / "calibrated.yaml"
+
+    results = calibrate_models(load_fixtures(FIXTURES), vram_bytes=12 * GiB)
+    write_policy(results, output, base_config=base)
+    config = load_config(output)
+
+    assert config.policy.models["llama3.1:8b"].num_ctx == 54272
+    assert config.policy.models["llama3.1:8b"].keep_alive == "60s"
+    assert config.policy.models["qwen3:8b"].num_ctx == 40960
+    assert "broken:latest" not in config.policy.models
@@ -0,0 +1,136 @@
+# Tests for CLI startup cost and machine-readable output.
+# Usage: pytest tests/test_cli.py
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from ollama_swapper import cli, sweep
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Modules that `ps`/`sweep`/`stop` never use; importing any of them at CLI load
+# time costs hundreds of milliseconds per invocation.
+HEAVY_MODULES = {"fastapi", "starlette", "uvicorn", "httpx", "yaml", "pydantic"}
+# Cumulative import time allowed for the CLI plus the modules `ps` loads (typer itself is ~30ms).
+IMPORT_BUDGET_US = 250_000
+FAKE_OLLAMA = """#!/bin/sh
+printf 'NAME        ID      SIZE      PROCESSOR    UNTIL\\n'
+"""
+
+
+def _ps_import_times(tmp_path: Path) -> dict[str, int]:
+    """Run `ollama-swapper ps` against a stub `ollama` and return per-module import times."""
+    fake_ollama = tmp_path / "ollama"
+    fake_ollama.write_text(FAKE_OLLAMA)
+    fake_ollama.chmod(0o755)
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from ollama_swapper.cli import app; app(['ps'])",
+        ],
+        capture_output=True,
+        text=True,
+        env={
+            **os.environ,
+            "PYTHONPATH": str(SRC),
+            "PATH": f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}",
+        },
+        check=True,
+    )
+    assert completed.stdout.startswith("NAME")
+    times: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="stub ollama is a shell script")
+def test_ps_path_skips_heavy_modules(tmp_path: Path) -> None:
+    times = _ps_import_times(tmp_path)
+
+    assert HEAVY_MODULES.isdisjoint(times)
+    # sweep is imported lazily by `ps`, so it is not part of the cli module's own time
+    assert times["ollama_swapper.cli"] + times["ollama_swapper.sweep"] < IMPORT_BUDGET_US
+
+
+def test_ps_json_output(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        sweep,
+        "run_ps",
+        lambda: "NAME        ID      SIZE      PROCESSOR    UNTIL\n"
+        "qwen3:8b    abc     6.5 GB    100% GPU     Forever\n",
+    )
+
+    result = CliRunner().invoke(cli.app, ["ps", "--json"])
+
+    assert result.exit_code == 0
+    assert json.loads(result.stdout) == [
+        {"name": "qwen3:8b", "id": "abc", "size": "6.5 GB", "processor": "100% GPU", "until": "Forever"}
+    ]
+
+
+def test_proxy_rejects_scheduler_with_multiple_workers(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11435"
+policy: {}
+scheduler:
+  max_concurrency: 2
+"""
+    )
+
+    result = CliRunner().invoke(cli.app, ["proxy", "--config", str(config_path), "--workers", "2"])
+
+    assert result.exit_code == 1
+    assert "--workers 1" in result.output
+
+
+def test_top_once_renders_snapshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    from ollama_swapper import top
+
+    requested: list[tuple[str, float, int | None]] = []
+    snapshot = {
+        "type": "snapshot",
+        "now": 100.0,
+        "models": {
+            "qwen3:8b": {
+                "loaded": True,
+                "size_vram": 6 << 30,
+                "in_flight": 1,
+                "queued": 2,
+                "tokens_per_s": 42.5,
+                "last_used": 99.0,
+            }
+        },
+        "scheduler": None,
+        "swaps": [],
+    }
+
+    def fake_messages(base_url: str, interval: float, count: int | None = None):
+        requested.append((base_url, interval, count))
+        yield snapshot
+
+    monkeypatch.setattr(top, "iter_messages", fake_messages)
+
+    result = CliRunner().invoke(cli.app, ["top", "--once", "--url", "http://proxy:1"])
+
+    assert result.exit_code == 0
+    assert requested == [("http://proxy:1", 0.5, 1)]
+    assert "\x1b[" not in result.stdout
+    row = next(line for line in result.stdout.splitlines() if line.startswith("qwen3:8b"))
+    assert row.split()[1:] == ["yes", "6.0", "GiB", "1", "2", "42.5", "-"]
@@ -0,0 +1,101 @@
+# Tests for approximate token counting and chat history compaction.
+# Usage: pytest tests/test_compaction.py
+import json
+
+import pytest
+
+from ollama_swapper import compaction
+from ollama_swapper.compaction import TokenCounter, approx_tokens, compact_messages
+
+
+def _msg(role: str, words: int, **extra: object) -> dict:
+    return {"role": role, "content": " ".join(["word"] * words), **extra}
+
+
+def test_approx_tokens_handles_english_and_cjk() -> None:
+    assert approx_tokens("") == 0
+    assert approx_tokens("hello, world") == 5  # hello(2) , world(2)
+    assert approx_tokens("今日は良い天気") == 7
+    assert approx_tokens("x = 12345") == 4
+
+
+def test_token_counter_caches_per_message(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+    original = compaction.approx_tokens
+
+    def counting(text: str) -> int:
+        calls.append(text)
+        return original(text)
+
+    monkeypatch.setattr(compaction, "approx_tokens", counting)
+    counter = TokenCounter()
+    history = [_msg("user", 10), _msg("assistant", 10)]
+
+    first = counter.count(history)
+    calls.clear()
+    second = counter.count(history + [_msg("user", 3)])
+
+    assert second == first + 3 + compaction.MESSAGE_OVERHEAD_TOKENS
+    assert calls == ["word word word", ""]  # only the new message was counted
+
+
+def test_token_counter_accepts_lone_surrogates() -> None:
+    # json.loads turns a \ud800 escape into a lone surrogate, which strict UTF-8 rejects.
+    message = json.loads('{"role": "user", "content": "bad \\ud800 text"}')
+    counter = TokenCounter()
+
+    assert counter.count_message(message) == counter.count_message(message) > 0
+
+
+def test_compact_keeps_system_and_final_turn() -> None:
+    messages = [_msg("system", 20)] + [_msg("user", 50), _msg("assistant", 50)] * 4
+    messages.append(_msg("user", 10))
+    counter = TokenCounter()
+
+    result = compact_messages(messages, budget=150, counter=counter)
+
+    assert result.messages[0] == messages[0]
+    assert result.messages[-1] == messages[-1]
+    assert result.tokens_after <= 150
+    assert result.tokens_before == counter.count(messages)
+    assert result.dropped >= 1
+
+
+def test_compact_drops_tool_calls_with_their_results() -> None:
+    call = _msg("assistant", 1, tool_calls=[{"function": {"name": "f", "arguments": {}}}])
+    messages = [
+        _msg("system", 5),
+        _msg("user", 5),
+        call,
+        _msg("tool", 200),
+        _msg("tool", 200),
+        _msg("assistant", 5),
+        _msg("user", 5),
+    ]
+
+    result = compact_messages(messages, budget=60, counter=TokenCounter())
+
+    roles = [message["role"] for message in result.messages]
+    assert "tool" not in roles
+    assert call not in result.messages
+    assert roles[0] == "system"
+
+
+def test_compact_trims_instead_of_dropping_when_enough() -> None:
+    messages = [_msg("user", 400), _msg("assistant", 5), _msg("user", 5)]
+    counter = TokenCounter()
+    total = counter.count(messages)
+
+    result = compact_messages(messages, budget=total - 100, counter=counter)
+
+    assert result.dropped == 0
+    assert result.trimmed == 1
+    assert result.messages[0]["content"].startswith("…")
+    assert result.tokens_after <= total - 100
+
+
+def test_compact_is_noop_under_budget() -> None:
+    messages = [_msg("user", 5)]
+    result = compact_messages(messages, budget=1000, counter=TokenCounter())
+    assert result.messages is messages
+    assert result.tokens_removed == 0
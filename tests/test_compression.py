@@ -0,0 +1,59 @@
+# Tests for Accept-Encoding negotiation and gzip/zstd encoders.
+# Usage: pytest tests/test_compression.py
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from ollama_swapper.compression import compress, compress_stream, negotiate
+
+
+def test_negotiate_respects_quality_and_support() -> None:
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip, deflate, br", supported=("zstd", "gzip")) == "gzip"
+    assert negotiate("gzip;q=0.5, zstd", supported=("zstd", "gzip")) == "zstd"
+    assert negotiate("zstd;q=0.2, gzip;q=0.8", supported=("zstd", "gzip")) == "gzip"
+    assert negotiate("zstd", supported=("gzip",)) is None
+    assert negotiate("*", supported=("zstd", "gzip")) == "zstd"
+    assert negotiate("*, gzip;q=0", supported=("gzip",)) is None
+
+
+def test_compress_gzip_round_trip() -> None:
+    body = b'{"models":[' + b'{"name":"m"},' * 500 + b"{}]}"
+    encoded = compress(body, "gzip")
+    assert gzip.decompress(encoded) == body
+    assert len(encoded) < len(body) / 10
+
+
+def test_compress_stream_flushes_every_chunk() -> None:
+    lines = [b'{"message":{"content":"token %d"},"done":false}\n' % i for i in range(50)]
+    finished: list[tuple[int, int]] = []
+
+    async def source():
+        for line in lines:
+            yield line
+
+    async def run() -> list[bytes]:
+        return [
+            chunk
+            async for chunk in compress_stream(
+                source(), "gzip", on_finish=lambda i, o: finished.append((i, o))
+            )
+        ]
+
+    chunks = asyncio.run(run())
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each compressed chunk decodes to exactly its line without waiting for later ones.
+    for line, chunk in zip(lines, chunks):
+        assert decoder.decompress(chunk) == line
+    decoder.decompress(chunks[-1])
+    assert decoder.eof
+    assert finished == [(sum(map(len, lines)), sum(map(len, chunks)))]
+
+
+def test_compress_zstd_round_trip() -> None:
+    zstandard = pytest.importorskip("zstandard")
+    body = b"embedding " * 1000
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compress(body, "zstd")) == body
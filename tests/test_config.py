@@ -2,7 +2,9 @@
 # Usage: pytest tests/test_config.py
 from pathlib import Path
 
-from ollama_swapper.config import load_config
+import pytest
+
+from ollama_swapper.config import load_config, parse_upstream
 
 
 def test_load_config_yaml(tmp_path: Path) -> None:
@@ -33,3 +35,149 @@ policy:
         config.policy.models["llama3.1:8b-instruct-q4_K_M"].upstream
         == "http://127.0.0.1:18765"
     )
+
+
+def test_load_config_parses_hedge_policy(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        """
+{
+  "server": {"listen": "127.0.0.1:11434", "upstream": "http://127.0.0.1:11436"},
+  "policy": {
+    "models": {
+      "qwen3:8b": {"hedge": {"upstream": "http://10.0.0.2:11434", "after_ms": 1500}},
+      "gemma3:12b": {"hedge": {"upstream": "http://10.0.0.3:8000", "api": "openai"}}
+    }
+  }
+}
+""".strip()
+    )
+
+    config = load_config(config_path)
+
+    hedge = config.policy.models["qwen3:8b"].hedge
+    assert hedge is not None
+    assert hedge.after_ms == 1500
+    assert hedge.api == "ollama"
+    assert hedge.budget_percent == 10.0
+    assert config.policy.models["gemma3:12b"].hedge.api == "openai"
+
+
+def test_load_config_parses_mirror_policy(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11436"
+policy:
+  models:
+    "nemotron-jp":
+      mirror:
+        upstream: "http://127.0.0.1:18765"
+        api: openai
+        sample_rate: 0.25
+""".strip()
+    )
+
+    mirror = load_config(config_path).policy.models["nemotron-jp"].mirror
+
+    assert mirror is not None
+    assert mirror.api == "openai"
+    assert mirror.sample_rate == 0.25
+    assert mirror.max_concurrency == 2
+
+
+def test_load_config_parses_compaction(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11436"
+policy:
+  models:
+    "a": {compaction: true}
+    "b": {compaction: {target_fraction: 0.5}}
+    "c": {num_ctx: 4096, early_tool_calls: true}
+""".strip()
+    )
+
+    models = load_config(config_path).policy.models
+
+    assert models["a"].compaction.target_fraction == 0.75
+    assert models["b"].compaction.target_fraction == 0.5
+    assert models["c"].compaction is None
+    assert models["c"].early_tool_calls
+    assert not models["a"].early_tool_calls
+
+
+def test_load_config_parses_compression(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11436"
+  compression: {min_size: 4096, streams: false, gzip_level: 1}
+policy: {}
+""".strip()
+    )
+
+    compression = load_config(config_path).server.compression
+
+    assert compression.enabled
+    assert compression.min_size == 4096
+    assert not compression.streams
+    assert compression.gzip_level == 1
+    assert compression.zstd_level == 3
+
+
+def test_load_config_rejects_bad_mirror_sample_rate(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        '{"server": {"listen": "127.0.0.1:11434", "upstream": "http://u"},'
+        ' "policy": {"models": {"m": {"mirror": {"upstream": "http://s", "sample_rate": 2}}}}}'
+    )
+
+    with pytest.raises(ValueError, match="sample_rate"):
+        load_config(config_path)
+
+
+def test_load_config_parses_scheduler(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        """
+server:
+  listen: "127.0.0.1:11434"
+  upstream: "http://127.0.0.1:11436"
+policy: {}
+scheduler:
+  max_concurrency: 2
+  default_class: interactive
+  api_keys:
+    "sk-batch": batch
+  classes:
+    batch:
+      weight: 1
+      tokens_per_minute: 200000
+""".strip()
+    )
+
+    scheduler = load_config(config_path).scheduler
+
+    assert scheduler is not None
+    assert scheduler.max_concurrency == 2
+    assert set(scheduler.classes) == {"batch", "interactive"}
+    assert scheduler.classes["batch"].tokens_per_minute == 200000.0
+    assert scheduler.classes["batch"].requests_per_minute is None
+
+
+def test_parse_upstream_unix_socket() -> None:
+    target = parse_upstream("unix:///run/ollama/ollama.sock")
+    assert target.uds == "/run/ollama/ollama.sock"
+    assert target.base_url == "http://localhost"
+
+    tcp = parse_upstream("http://127.0.0.1:11436")
+    assert tcp.uds is None
+    assert tcp.base_url == "http://127.0.0.1:11436"
@@ -0,0 +1,58 @@
+# Tests for shadow-traffic sampling, timing and the comparison report.
+# Usage: pytest tests/test_mirror.py
+import json
+
+from ollama_swapper.config import MirrorPolicy
+from ollama_swapper.metrics import Metrics
+from ollama_swapper.mirror import MirrorController, StreamTimer, Timing, completion_tokens
+
+
+def test_completion_tokens_reads_ollama_and_openai_tails() -> None:
+    ollama = b'{"response":"a","done":false}\n{"done":true,"eval_count":42}\n'
+    openai = b'data: {"choices":[],"usage":{"completion_tokens":7}}\n\ndata: [DONE]\n\n'
+    assert completion_tokens(ollama) == 42
+    assert completion_tokens(openai) == 7
+    assert completion_tokens(b'{"done":true}\n') is None
+    assert completion_tokens(b"") is None
+
+
+def test_stream_timer_measures_first_chunk_and_total() -> None:
+    ticks = iter([0.0, 0.5, 2.5])
+    timer = StreamTimer(clock=lambda: next(ticks))
+    timer.feed(b'{"done":false}\n')
+    timer.feed(json.dumps({"done": True, "eval_count": 40}).encode() + b"\n")
+
+    timing = timer.finish()
+
+    assert timing == Timing(ttft_ms=500.0, total_ms=2500.0, tokens=40)
+    assert timing.tokens_per_s == 20.0
+
+
+def test_mirror_controller_samples_and_caps_concurrency() -> None:
+    draws = iter([0.05, 0.05, 0.05, 0.9])
+    controller = MirrorController(Metrics(), rng=lambda: next(draws))
+    policy = MirrorPolicy(upstream="http://shadow", sample_rate=0.1, max_concurrency=2)
+
+    assert controller.try_acquire("m", policy)
+    assert controller.try_acquire("m", policy)
+    assert not controller.try_acquire("m", policy)  # cap reached: skipped, not queued
+    controller.release("m")
+    assert not controller.try_acquire("m", policy)  # lost the sample draw
+
+    report = controller.report()["m"]
+    assert report["started"] == 2
+    assert report["skipped"] == 1
+    assert report["running"] == 1
+
+
+def test_mirror_report_compares_sides() -> None:
+    controller = MirrorController(Metrics(), rng=lambda: 0.0)
+    controller.try_acquire("m", MirrorPolicy(upstream="http://shadow"))
+    controller.record("m", "primary", Timing(ttft_ms=100.0, total_ms=1000.0, tokens=90))
+    controller.record("m", "shadow", Timing(ttft_ms=50.0, total_ms=500.0, tokens=90))
+
+    report = controller.report()["m"]
+
+    assert report["primary"]["total_ms"]["p50"] == 1000.0
+    assert report["shadow_over_primary_p50"]["total_ms"] == 0.5
+    assert report["shadow_over_primary_p50"]["tokens_per_s"] == 2.0
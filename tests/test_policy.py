@@ -1,7 +1,16 @@
 # Tests for policy resolution and payload mutation.
 # Usage: pytest tests/test_policy.py
+import math
+
+import pytest
+
 from ollama_swapper.config import AppConfig, PolicyConfig, PolicyDefaults, ModelPolicy, ServerConfig
-from ollama_swapper.policy import apply_policy, resolve_upstream
+from ollama_swapper.policy import (
+    DEFAULT_KEEP_ALIVE_SECONDS,
+    apply_policy,
+    parse_keep_alive,
+    resolve_upstream,
+)
 
 
 def test_apply_policy_injects_defaults() -> None:
@@ -50,3 +59,16 @@ def test_resolve_upstream_uses_model_override() -> None:
 
     assert resolve_upstream("nemotron-jp", config) == "http://127.0.0.1:18765"
     assert resolve_upstream("other", config) == "http://127.0.0.1:11436"
+
+
+def test_parse_keep_alive_durations() -> None:
+    assert parse_keep_alive(None) == DEFAULT_KEEP_ALIVE_SECONDS
+    assert parse_keep_alive(0) == 0
+    assert parse_keep_alive("60s") == 60
+    assert parse_keep_alive("1h30m") == 5400
+    assert parse_keep_alive("500ms") == 0.5
+    assert parse_keep_alive("300") == 300
+    assert parse_keep_alive(-1) == math.inf
+    assert parse_keep_alive("-1m") == math.inf
+    with pytest.raises(ValueError):
+        parse_keep_alive("soon")
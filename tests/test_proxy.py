@@ -1,16 +1,35 @@
 # Tests for proxy helpers.
 # Usage: pytest tests/test_proxy.py
 import asyncio
+import gzip
 import json
+from pathlib import Path
+from typing import Any, AsyncIterator
 
+import httpx
 import pytest
 
+from ollama_swapper.config import (
+    AppConfig,
+    CacheConfig,
+    CompactionPolicy,
+    HedgePolicy,
+    MirrorPolicy,
+    ModelPolicy,
+    PolicyConfig,
+    PolicyDefaults,
+    PriorityClass,
+    SchedulerConfig,
+    ServerConfig,
+)
 from ollama_swapper.proxy import (
+    _ClientPool,
     _ollama_chat_to_openai,
     _openai_chat_to_ollama,
     _stream_filter_thinking,
     _stream_openai_chat,
     _stream_openai_generate,
+    build_proxy_app,
     parse_listen,
 )
 
@@ -198,6 +217,33 @@ def test_stream_openai_chat_tool_calls_accumulated() -> None:
     assert tc[0]["function"]["arguments"] == {"k": "v"}
 
 
+def test_stream_openai_chat_emits_tool_calls_early_when_enabled() -> None:
+    def tool_delta(index: int, arguments: str, name: str | None = None) -> str:
+        function = {"arguments": arguments, **({"name": name} if name else {})}
+        delta = {"tool_calls": [{"index": index, "id": f"c{index}", "function": function}]}
+        return f"data: {json.dumps({'choices': [{'delta': delta}]})}"
+
+    lines = [
+        tool_delta(0, '{"path": ', name="read"),
+        tool_delta(0, '"a.py"}'),
+        tool_delta(1, '{"cmd": "ls"', name="run"),
+        tool_delta(1, "}"),
+        "data: [DONE]",
+    ]
+    response = _FakeOpenAIResponse(lines)
+    chunks = asyncio.run(
+        _collect_async(_stream_openai_chat(response, "m", early_tool_calls=True))
+    )
+    decoded = [json.loads(c) for c in chunks]
+
+    assert [chunk["done"] for chunk in decoded] == [False, False, True]
+    assert decoded[0]["message"]["tool_calls"] == [
+        {"function": {"name": "read", "arguments": {"path": "a.py"}}}
+    ]
+    assert decoded[1]["message"]["tool_calls"][0]["function"]["name"] == "run"
+    assert "tool_calls" not in decoded[2]["message"]
+
+
 # --- _stream_filter_thinking (native Ollama) ---
 
 class _FakeOllamaResponse:
@@ -251,3 +297,762 @@ def test_stream_filter_thinking_passes_non_thinking_chunks_unchanged() -> None:
 
     assert len(decoded) == 2
     assert decoded[0]["message"]["content"] == "hello"
+
+
+# --- hedged requests ---
+
+def _hedge_config(budget_percent: float = 100.0) -> AppConfig:
+    return AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://primary"),
+        policy=PolicyConfig(
+            models={
+                "m": ModelPolicy(
+                    hedge=HedgePolicy(
+                        upstream="http://secondary", after_ms=50, budget_percent=budget_percent
+                    )
+                )
+            }
+        ),
+    )
+
+
+def _hedge_transport(primary_delay: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "primary":
+            await asyncio.sleep(primary_delay)
+        return httpx.Response(200, json={"host": request.url.host, "done": True})
+
+    return httpx.MockTransport(handler)
+
+
+async def _post_chat(app: object, count: int = 1, stream: bool = True) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+        return [
+            await client.post("/api/chat", json={"model": "m", "messages": [], "stream": stream})
+            for _ in range(count)
+        ]
+
+
+def test_hedge_secondary_wins_when_primary_is_slow() -> None:
+    app = build_proxy_app(_hedge_config(), transport=_hedge_transport(primary_delay=1.0))
+
+    (response,) = asyncio.run(_post_chat(app))
+
+    assert response.json()["host"] == "secondary"
+    metrics = app.state.metrics
+    assert metrics.counter("hedge_fired", model="m") == 1
+    assert metrics.counter("hedge_won", model="m", winner="secondary") == 1
+
+
+def test_hedge_not_fired_when_primary_answers_in_time() -> None:
+    app = build_proxy_app(_hedge_config(), transport=_hedge_transport(primary_delay=0.0))
+
+    (response,) = asyncio.run(_post_chat(app))
+
+    assert response.json()["host"] == "primary"
+    assert app.state.metrics.counter("hedge_fired", model="m") == 0
+
+
+def test_hedge_respects_budget() -> None:
+    app = build_proxy_app(
+        _hedge_config(budget_percent=50.0), transport=_hedge_transport(primary_delay=0.2)
+    )
+
+    responses = asyncio.run(_post_chat(app, count=4))
+
+    assert [r.json()["host"] for r in responses] == ["primary", "secondary", "primary", "secondary"]
+    metrics = app.state.metrics
+    assert metrics.counter("hedge_fired", model="m") == 2
+    assert metrics.counter("hedge_budget_exhausted", model="m") == 2
+
+
+def test_hedge_skips_non_stream_requests() -> None:
+    app = build_proxy_app(_hedge_config(), transport=_hedge_transport(primary_delay=0.2))
+
+    (response,) = asyncio.run(_post_chat(app, stream=False))
+
+    assert response.json()["host"] == "primary"
+    metrics = app.state.metrics
+    assert metrics.counter("hedge_eligible", model="m") == 0
+    assert metrics.counter("hedge_fired", model="m") == 0
+
+
+def test_hedge_skips_openai_primary_without_stream() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "primary":
+            await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"choices": [{"message": {"content": request.url.host}}]})
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://ollama"),
+        policy=PolicyConfig(
+            models={
+                "m": ModelPolicy(
+                    upstream="http://primary",
+                    hedge=HedgePolicy(upstream="http://secondary", api="openai", after_ms=50),
+                )
+            }
+        ),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            # No "stream": the OpenAI bridge sends a non-stream request.
+            return await client.post("/api/chat", json={"model": "m", "messages": []})
+
+    response = asyncio.run(run())
+
+    assert response.json()["message"]["content"] == "primary"
+    assert app.state.metrics.counter("hedge_eligible", model="m") == 0
+
+
+# --- lean ASGI mode ---
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_proxy_forwards_and_injects_policy(lean: bool) -> None:
+    seen: list[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": []})
+        return httpx.Response(200, content=b'{"message":{"content":"hi"},"done":true}\n')
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(
+            defaults=PolicyDefaults(num_ctx=8192, keep_alive=0),
+            models={"m": ModelPolicy(num_ctx=4096)},
+        ),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=lean)
+
+    async def run() -> tuple[httpx.Response, ...]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            tags = await client.get("/api/tags", params={"verbose": "1"})
+            chat = await client.post("/api/chat", json={"model": "m", "messages": []})
+            admin = await client.get("/_swapper/metrics")
+            state = await client.get("/_swapper/state")
+            return tags, chat, admin, state
+
+    tags, chat, admin, state = asyncio.run(run())
+
+    assert tags.json() == {"models": []}
+    assert seen[0].url.query == b"verbose=1"
+    sent = json.loads(seen[1].content)
+    assert sent["options"]["num_ctx"] == 4096
+    assert sent["keep_alive"] == 0
+    assert chat.json()["message"]["content"] == "hi"
+    assert "counters" in admin.json()
+    assert state.json()["models"]["m"]["in_flight"] == 0
+
+
+def test_lean_proxy_returns_502_when_upstream_unreachable() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=True)
+
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            return await client.get("/api/version")
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 502
+
+
+# --- unix domain socket upstreams ---
+
+@pytest.mark.skipif(not hasattr(asyncio, "start_unix_server"), reason="requires AF_UNIX")
+def test_proxy_forwards_over_unix_socket(tmp_path: Path) -> None:
+    socket_path = tmp_path / "ollama.sock"
+    seen_paths: list[str] = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = await reader.readuntil(b"\r\n\r\n")
+        seen_paths.append(head.split(b" ")[1].decode())
+        body = b'{"version":"0.9.0"}'
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+            + f"content-length: {len(body)}\r\nconnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream=f"unix://{socket_path}"),
+        policy=PolicyConfig(),
+    )
+
+    async def run() -> httpx.Response:
+        server = await asyncio.start_unix_server(handle, path=str(socket_path))
+        app = build_proxy_app(config, lean=True)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+                return await client.get("/api/version")
+        finally:
+            server.close()
+
+    response = asyncio.run(run())
+
+    assert response.json() == {"version": "0.9.0"}
+    assert seen_paths == ["/api/version"]
+
+
+def test_http2_on_cleartext_upstream_warns_and_uses_http1(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    pool = _ClientPool(http2_upstreams={"http://10.0.0.3:8000"})
+
+    with caplog.at_level("WARNING", logger="ollama_swapper.proxy"):
+        pool._make_transport("http://10.0.0.3:8000")
+
+    assert "needs an https upstream" in caplog.text
+
+
+# --- metadata cache ---
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_proxy_caches_metadata_with_etags(lean: bool) -> None:
+    seen: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "m"}]})
+        return httpx.Response(200, json={"status": "success"})
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=lean)
+
+    async def run() -> tuple[httpx.Response, ...]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            first = await client.get("/api/tags")
+            second = await client.get("/api/tags")
+            not_modified = await client.get(
+                "/api/tags", headers={"if-none-match": first.headers["etag"]}
+            )
+            await client.post("/api/pull", json={"model": "m"})
+            after_pull = await client.get("/api/tags")
+            return first, second, not_modified, after_pull
+
+    first, second, not_modified, after_pull = asyncio.run(run())
+
+    assert first.json() == {"models": [{"name": "m"}]}
+    assert first.headers["x-swapper-cache"] == "miss"
+    assert second.headers["x-swapper-cache"] == "hit"
+    assert second.headers["etag"] == first.headers["etag"]
+    assert not_modified.status_code == 304
+    assert after_pull.headers["x-swapper-cache"] == "miss"
+    assert seen == ["/api/tags", "/api/pull", "/api/tags"]
+    assert app.state.metrics.counter("metadata_cache", path="api/tags", result="hit") == 2
+
+
+def test_proxy_state_uses_api_ps() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/api/ps"
+        return httpx.Response(
+            200, json={"models": [{"name": "qwen3:8b", "model": "qwen3:8b", "size_vram": 6}]}
+        )
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            return await client.get("/_swapper/state")
+
+    models = asyncio.run(run()).json()["models"]
+
+    assert models["qwen3:8b"]["loaded"] is True
+    assert models["qwen3:8b"]["size_vram"] == 6
+
+
+# --- shadow mirroring ---
+
+def test_proxy_mirrors_sampled_requests_to_shadow() -> None:
+    seen: list[tuple[str, dict]] = []
+    shadow_release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.url.host, json.loads(request.content)))
+        if request.url.host == "shadow":
+            await shadow_release.wait()
+            return httpx.Response(
+                200,
+                content=b'data: {"choices":[{"delta":{"content":"hi"}}]}\n\n'
+                b'data: {"choices":[],"usage":{"completion_tokens":1}}\n\ndata: [DONE]\n\n',
+            )
+        return httpx.Response(
+            200, content=b'{"message":{"content":"hi"},"done":true,"eval_count":1}\n'
+        )
+
+    mirror = MirrorPolicy(upstream="http://shadow", api="openai", sample_rate=1.0)
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(models={"m": ModelPolicy(mirror=mirror)}),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> tuple[httpx.Response, dict]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            # The primary answers while the shadow is still blocked.
+            chat = await client.post(
+                "/api/chat", json={"model": "m", "stream": True, "messages": []}
+            )
+            shadow_release.set()
+            while app.state.metrics.summary("mirror_total_ms", model="m", side="shadow") is None:
+                await asyncio.sleep(0.01)
+            report = await client.get("/_swapper/mirror")
+            return chat, report.json()
+
+    chat, report = asyncio.run(run())
+
+    assert chat.json()["message"]["content"] == "hi"
+    shadow_body = next(body for host, body in seen if host == "shadow")
+    assert shadow_body["stream_options"] == {"include_usage": True}
+    assert report["m"]["started"] == 1
+    assert report["m"]["primary"]["total_ms"]["count"] == 1
+    assert report["m"]["shadow"]["total_ms"]["count"] == 1
+    assert report["m"]["running"] == 0
+
+
+def test_shadow_ttft_skips_reasoning_chunks_like_primary() -> None:
+    async def shadow_body() -> AsyncIterator[bytes]:
+        yield b'data: {"choices":[{"delta":{"role":"assistant","content":""}}]}\n\n'
+        yield b'data: {"choices":[{"delta":{"reasoning_content":"hmm"}}]}\n\n'
+        await asyncio.sleep(0.2)
+        yield b'data: {"choices":[{"delta":{"content":"hi"}}]}\n\n'
+        yield b'data: {"choices":[],"usage":{"completion_tokens":3}}\n\ndata: [DONE]\n\n'
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "shadow":
+            return httpx.Response(200, content=shadow_body())
+        return httpx.Response(
+            200, content=b'{"message":{"content":"hi"},"done":true,"eval_count":1}\n'
+        )
+
+    mirror = MirrorPolicy(upstream="http://shadow", api="openai", sample_rate=1.0)
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(models={"m": ModelPolicy(mirror=mirror)}),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            await client.post(
+                "/api/chat", json={"model": "m", "stream": True, "think": True, "messages": []}
+            )
+            while app.state.metrics.summary("mirror_total_ms", model="m", side="shadow") is None:
+                await asyncio.sleep(0.01)
+            return (await client.get("/_swapper/mirror")).json()
+
+    report = asyncio.run(run())
+
+    # Thinking is not relayed to this client, so the shadow's first token is "hi".
+    assert report["m"]["shadow"]["ttft_ms"]["p50"] >= 150
+    assert report["m"]["shadow"]["tokens_per_s"]["count"] == 1
+
+
+# --- priority scheduling ---
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_proxy_rate_limits_per_client(lean: bool) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b'{"message":{"content":"hi"},"done":true}\n')
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+        scheduler=SchedulerConfig(
+            max_concurrency=1,
+            classes={"default": PriorityClass(requests_per_minute=1)},
+        ),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=lean)
+
+    async def run() -> tuple[httpx.Response, ...]:
+        transport = httpx.ASGITransport(app=app, client=("10.0.0.5", 5000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            body = {"model": "m", "messages": []}
+            first = await client.post("/api/chat", json=body)
+            second = await client.post("/api/chat", json=body)
+            other = await client.post(
+                "/api/chat", json=body, headers={"authorization": "Bearer other"}
+            )
+            state = await client.get("/_swapper/state")
+            return first, second, other, state
+
+    first, second, other, state = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "60"
+    assert "rate limit" in second.json()["error"]
+    assert other.status_code == 200
+    assert state.json()["scheduler"] == {
+        "active": 0,
+        "max_concurrency": 1,
+        "queued": {"default": 0},
+    }
+    assert app.state.metrics.summary("queue_wait_ms", priority="default")["count"] == 2
+
+
+# --- deadline admission ---
+
+_FINAL_CHUNK = {
+    "message": {"role": "assistant", "content": ""},
+    "done": True,
+    "total_duration": 8_000_000_000,
+    "load_duration": 5_000_000_000,
+    "prompt_eval_count": 10,
+    "prompt_eval_duration": 100_000_000,
+    "eval_count": 100,
+    "eval_duration": 2_000_000_000,
+}
+
+
+def _deadline_app(
+    hedge: HedgePolicy | None, seen: list[httpx.Request], cache: bool = True
+) -> object:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": []})  # nothing resident: a cold load
+        if request.url.host == "secondary":
+            return httpx.Response(200, json={"choices": [{"message": {"content": "fast"}}]})
+        lines = [{"message": {"role": "assistant", "content": "hi"}, "done": False}, _FINAL_CHUNK]
+        body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+        return httpx.Response(200, content=body)
+
+    config = AppConfig(
+        server=ServerConfig(
+            listen="127.0.0.1:11434",
+            upstream="http://upstream",
+            cache=CacheConfig(enabled=cache),
+        ),
+        policy=PolicyConfig(models={"m": ModelPolicy(hedge=hedge)}),
+    )
+    return build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+
+async def _chat_with_deadline(app: object, **deadline: object) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+        warmup = await client.post("/api/chat", json={"model": "m", "messages": []})
+        await warmup.aread()
+        headers = {k: str(v) for k, v in deadline.items() if k.startswith("x-")}
+        body = {"model": "m", "messages": [], "stream": False}
+        body.update({k: v for k, v in deadline.items() if not k.startswith("x-")})
+        return [warmup, await client.post("/api/chat", json=body, headers=headers)]
+
+
+def test_deadline_rejects_request_that_cannot_finish_in_time() -> None:
+    seen: list[httpx.Request] = []
+    app = _deadline_app(None, seen)
+
+    _, rejected = asyncio.run(_chat_with_deadline(app, deadline_ms=2000))
+
+    assert rejected.status_code == 503
+    assert "cannot be met" in rejected.json()["error"]
+    assert int(rejected.headers["x-swapper-estimate-ms"]) > 2000
+    assert [request.url.path for request in seen] == ["/api/chat", "/api/ps"]
+    assert app.state.metrics.counter("deadline_rejected", model="m", reason="estimate") == 1
+
+
+def test_deadline_reroutes_to_hot_hedge_upstream() -> None:
+    seen: list[httpx.Request] = []
+    hedge = HedgePolicy(upstream="http://secondary", api="openai", after_ms=60_000)
+    app = _deadline_app(hedge, seen)
+
+    _, rerouted = asyncio.run(_chat_with_deadline(app, **{"x-swapper-deadline-ms": 2000}))
+
+    assert rerouted.status_code == 200
+    assert rerouted.json()["message"]["content"] == "fast"
+    assert seen[-1].url.host == "secondary"
+    assert app.state.metrics.counter("deadline_rerouted", model="m") == 1
+
+
+def test_deadline_refreshes_loaded_models_at_most_every_interval() -> None:
+    seen: list[httpx.Request] = []
+    app = _deadline_app(None, seen, cache=False)
+
+    async def run() -> list[int]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            body = {"model": "m", "messages": [], "stream": False, "deadline_ms": 60_000}
+            return [(await client.post("/api/chat", json=body)).status_code for _ in range(3)]
+
+    statuses = asyncio.run(run())
+
+    assert statuses == [200, 200, 200]
+    assert [request.url.path for request in seen].count("/api/ps") == 1
+
+
+def test_deadline_admits_and_strips_field() -> None:
+    seen: list[httpx.Request] = []
+    app = _deadline_app(None, seen)
+
+    _, admitted = asyncio.run(_chat_with_deadline(app, deadline_ms=60_000))
+
+    assert admitted.status_code == 200
+    assert "deadline_ms" not in json.loads(seen[-1].content)
+
+
+def test_final_stats_split_across_many_chunks_reach_estimator() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": []})
+        first = json.dumps({"response": "hi", "done": False}).encode() + b"\n"
+        final = json.dumps(_FINAL_CHUNK).encode() + b"\n"
+
+        async def body() -> AsyncIterator[bytes]:
+            yield first
+            for start in range(0, len(final), 7):
+                yield final[start : start + 7]
+
+        return httpx.Response(200, content=body())
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> dict[str, Any]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            # /api/generate is relayed as raw upstream chunks (chat is re-framed per line).
+            await client.post("/api/generate", json={"model": "m", "prompt": "hi"})
+            feed = await client.get("/_swapper/top", params={"count": 1})
+            return json.loads(feed.text)
+
+    snapshot = asyncio.run(run())
+
+    assert snapshot["models"]["m"]["tokens_per_s"] == 50.0
+
+
+def test_invalid_deadline_is_rejected() -> None:
+    app = _deadline_app(None, [])
+
+    _, invalid = asyncio.run(_chat_with_deadline(app, deadline_ms="soon"))
+
+    assert invalid.status_code == 400
+    assert "invalid deadline" in invalid.json()["error"]
+
+
+# --- context compaction ---
+
+def test_proxy_compacts_history_to_num_ctx() -> None:
+    seen: list[dict] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, content=b'{"message":{"content":"ok"},"done":true}\n')
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(
+            models={
+                "m": ModelPolicy(num_ctx=256, compaction=CompactionPolicy(target_fraction=0.5)),
+                "plain": ModelPolicy(num_ctx=256),
+            }
+        ),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+    history = [{"role": "system", "content": "be brief"}]
+    for turn in range(10):
+        history.append({"role": "user", "content": f"question {turn} " + "lorem " * 40})
+        history.append({"role": "assistant", "content": "answer " * 40})
+    history.append({"role": "user", "content": "last question"})
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            for model in ("m", "plain"):
+                await client.post("/api/chat", json={"model": model, "messages": history})
+
+    asyncio.run(run())
+
+    compacted, untouched = seen
+    assert compacted["messages"][0] == history[0]
+    assert compacted["messages"][-1] == history[-1]
+    assert len(compacted["messages"]) < len(history)
+    assert untouched["messages"] == history
+    assert app.state.metrics.counter("compaction_tokens_removed", model="m") > 0
+    assert app.state.metrics.counter("compaction_tokens_removed", model="plain") == 0
+
+
+# --- response compression ---
+
+class _RawStream(httpx.AsyncByteStream):
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+
+    async def __aiter__(self):
+        yield self._data
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_proxy_compresses_and_passes_through_encoded_bodies(lean: bool) -> None:
+    tags = {"models": [{"name": f"model-{i}:latest", "size": 1 << 32} for i in range(50)]}
+    embedding = json.dumps({"embeddings": [[0.125] * 512]}).encode()
+    encoded_embedding = gzip.compress(embedding)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json=tags)
+        if request.url.path == "/api/embed":
+            assert request.headers["accept-encoding"] == "gzip"
+            return httpx.Response(
+                200,
+                headers={
+                    "content-encoding": "gzip",
+                    "content-length": str(len(encoded_embedding)),
+                },
+                stream=_RawStream(encoded_embedding),
+            )
+        assert request.headers["accept-encoding"] == "identity"
+        lines = [
+            {"message": {"content": "a", "thinking": "hmm"}, "done": False},
+            {"message": {"content": "b"}, "done": True},
+        ]
+        body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+        return httpx.Response(200, content=body)
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=lean)
+
+    async def run() -> tuple[httpx.Response, ...]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            gzip_headers = {"accept-encoding": "gzip"}
+            plain_tags = await client.get("/api/tags", headers={"accept-encoding": "identity"})
+            gzip_tags = await client.get("/api/tags", headers=gzip_headers)
+            embed = await client.post("/api/embed", json={"model": "e"}, headers=gzip_headers)
+            chat = await client.post(
+                "/api/chat", json={"model": "m", "messages": []}, headers=gzip_headers
+            )
+            plain_chat = await client.post(
+                "/api/chat",
+                json={"model": "m", "messages": []},
+                headers={"accept-encoding": "identity"},
+            )
+            return plain_tags, gzip_tags, embed, chat, plain_chat
+
+    plain_tags, gzip_tags, embed, chat, plain_chat = asyncio.run(run())
+
+    assert "content-encoding" not in plain_tags.headers
+    assert gzip_tags.headers["content-encoding"] == "gzip"
+    assert gzip_tags.headers["etag"].startswith("W/")
+    assert gzip_tags.json() == tags
+    assert int(gzip_tags.headers["content-length"]) < len(plain_tags.content)
+    # Upstream gzip is relayed byte for byte rather than decoded and re-encoded.
+    assert embed.headers["content-encoding"] == "gzip"
+    assert embed.json() == json.loads(embedding)
+    assert chat.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["message"]["content"] for line in chat.text.splitlines()] == ["a", "b"]
+    # The thinking filter rewrites lines, so the upstream content-length must not be relayed.
+    assert "content-length" not in plain_chat.headers or int(
+        plain_chat.headers["content-length"]
+    ) == len(plain_chat.content)
+    assert app.state.metrics.counter("compression_bytes_in", encoding="gzip") > 0
+
+
+def test_proxy_leaves_small_streamed_passthrough_uncompressed() -> None:
+    version = b'{"version":"0.9.0"}'
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "application/json", "content-length": str(len(version))},
+            stream=_RawStream(version),
+        )
+
+    config = AppConfig(
+        server=ServerConfig(
+            listen="127.0.0.1:11434",
+            upstream="http://upstream",
+            cache=CacheConfig(enabled=False),
+        ),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler))
+
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            return await client.get("/api/version", headers={"accept-encoding": "gzip"})
+
+    response = asyncio.run(run())
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(version))
+    assert response.content == version
+
+
+# --- top feed ---
+
+def test_proxy_top_feed_reports_models_and_swaps() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": [{"name": "m", "size_vram": 6 << 30}]})
+        final = {
+            "message": {"content": "hi"},
+            "done": True,
+            "total_duration": 3_000_000_000,
+            "load_duration": 2_000_000_000,
+            "eval_count": 50,
+            "eval_duration": 1_000_000_000,
+        }
+        return httpx.Response(200, content=json.dumps(final).encode() + b"\n")
+
+    config = AppConfig(
+        server=ServerConfig(listen="127.0.0.1:11434", upstream="http://upstream"),
+        policy=PolicyConfig(),
+    )
+    app = build_proxy_app(config, transport=httpx.MockTransport(handler), lean=True)
+
+    async def run() -> list[dict[str, Any]]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+            await client.post("/api/chat", json={"model": "m", "messages": []})
+            feed = await client.get("/_swapper/top", params={"count": 1})
+            assert feed.headers["content-type"] == "application/x-ndjson"
+            return [json.loads(line) for line in feed.text.splitlines()]
+
+    [snapshot] = asyncio.run(run())
+
+    assert snapshot["type"] == "snapshot"
+    row = snapshot["models"]["m"]
+    assert row["loaded"] is True
+    assert row["size_vram"] == 6 << 30
+    assert row["in_flight"] == 0
+    assert row["tokens_per_s"] == 50.0
+    assert [(swap["model"], swap["load_ms"]) for swap in snapshot["swaps"]] == [("m", 2000.0)]
@@ -0,0 +1,157 @@
+# Tests for priority classification, fair queuing and token buckets.
+# Usage: pytest tests/test_scheduler.py
+import asyncio
+
+from ollama_swapper.config import PriorityClass, SchedulerConfig
+from ollama_swapper.metrics import Metrics
+from ollama_swapper.scheduler import Scheduler, TokenBucket, estimate_tokens
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _config(**overrides: object) -> SchedulerConfig:
+    config = SchedulerConfig(
+        max_concurrency=1,
+        default_class="batch",
+        api_keys={"sk-chat": "interactive"},
+        clients={"10.0.1.0/24": "interactive"},
+        classes={
+            "interactive": PriorityClass(weight=4),
+            "batch": PriorityClass(weight=1, requests_per_minute=2, tokens_per_minute=600),
+        },
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def test_classify_by_header_api_key_and_address() -> None:
+    scheduler = Scheduler(_config(), Metrics())
+
+    assert scheduler.classify({"x-swapper-priority": "interactive"}, "10.0.9.9") == (
+        "interactive",
+        "addr:10.0.9.9",
+    )
+    assert scheduler.classify({"authorization": "Bearer sk-chat"}, "10.0.9.9") == (
+        "interactive",
+        "key:sk-chat",
+    )
+    assert scheduler.classify({}, "10.0.1.7")[0] == "interactive"
+    assert scheduler.classify({"x-swapper-priority": "bogus"}, None) == ("batch", "addr:unknown")
+
+
+def test_classify_mappings_win_over_header() -> None:
+    scheduler = Scheduler(_config(clients={"10.0.2.0/24": "batch"}), Metrics())
+    promote = {"x-swapper-priority": "interactive"}
+
+    assert scheduler.classify(promote, "10.0.2.5")[0] == "batch"
+    assert scheduler.classify({"authorization": "Bearer sk-chat"}, "10.0.2.5")[0] == "interactive"
+    assert scheduler.classify(
+        {"x-swapper-priority": "batch", "authorization": "Bearer sk-chat"}, "10.0.9.9"
+    )[0] == "interactive"
+
+
+def test_estimate_tokens_uses_prompt_size_and_num_predict() -> None:
+    assert estimate_tokens({"prompt": "x" * 400, "options": {"num_predict": 50}}) == 150
+    assert estimate_tokens({"prompt": ""}) == 256
+
+
+def test_token_bucket_refills_with_fake_clock() -> None:
+    clock = _Clock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+
+    assert bucket.wait_time(1) == 1.0
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 1.0
+    assert bucket.wait_time(1) == 0.0
+    # Requests larger than the bucket are charged a full bucket instead of never fitting.
+    clock.now = 100.0
+    assert bucket.wait_time(1000) == 0.0
+
+
+def test_admit_limits_requests_and_tokens_per_client() -> None:
+    clock = _Clock()
+    metrics = Metrics()
+    scheduler = Scheduler(_config(), metrics, clock=clock)
+
+    assert scheduler.admit("batch", "addr:a", 100) == 0.0
+    assert scheduler.admit("batch", "addr:a", 100) == 0.0
+    assert scheduler.admit("batch", "addr:a", 100) == 30.0  # 2 requests/minute
+    assert scheduler.admit("batch", "addr:b", 100) == 0.0  # buckets are per client
+    assert scheduler.admit("interactive", "addr:a", 10_000) == 0.0  # unlimited class
+    clock.now = 30.0
+    assert scheduler.admit("batch", "addr:a", 100) == 0.0
+    assert metrics.counter("rate_limited", priority="batch") == 1
+
+
+def _dispatch_order(scheduler: Scheduler, arrivals: list[tuple[str, str]]) -> list[str]:
+    async def run() -> list[str]:
+        order: list[str] = []
+        await scheduler.acquire("batch", "addr:holder")
+
+        async def request(index: int, priority: str, client: str) -> None:
+            await scheduler.acquire(priority, client)
+            order.append(f"{priority}:{client}:{index}")
+
+        tasks = []
+        for index, (priority, client) in enumerate(arrivals):
+            tasks.append(asyncio.create_task(request(index, priority, client)))
+            await asyncio.sleep(0)
+        for _ in arrivals:
+            scheduler.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(run())
+
+
+def test_weighted_fair_queuing_prefers_heavier_class() -> None:
+    scheduler = Scheduler(_config(), Metrics())
+    arrivals = [("batch", "b")] * 4 + [("interactive", "i")] * 2
+
+    order = _dispatch_order(scheduler, arrivals)
+
+    assert [entry.split(":")[0] for entry in order] == ["interactive"] * 2 + ["batch"] * 4
+
+
+def test_fair_queuing_interleaves_clients_within_a_class() -> None:
+    scheduler = Scheduler(_config(), Metrics())
+    arrivals = [("batch", "a")] * 3 + [("batch", "b")]
+
+    order = _dispatch_order(scheduler, arrivals)
+
+    assert order == ["batch:a:0", "batch:b:3", "batch:a:1", "batch:a:2"]
+
+
+def test_queue_wait_metric_and_cancelled_waiters() -> None:
+    clock = _Clock()
+    metrics = Metrics()
+    scheduler = Scheduler(_config(), metrics, clock=clock)
+
+    async def run() -> None:
+        await scheduler.acquire("batch", "addr:a")
+        gone = asyncio.create_task(scheduler.acquire("batch", "addr:gone"))
+        waiting = asyncio.create_task(scheduler.acquire("interactive", "addr:b"))
+        await asyncio.sleep(0)
+        assert scheduler.queued() == 2
+        gone.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queued() == 1
+        clock.now = 2.5
+        scheduler.release()
+        await waiting
+        assert scheduler.active == 1
+
+    asyncio.run(run())
+
+    assert metrics.summary("queue_wait_ms", priority="interactive")["max"] == 2500.0
+    assert metrics.summary("queue_wait_ms", priority="batch")["count"] == 1
@@ -0,0 +1,116 @@
+# Tests for per-model proxy state and its cross-worker server.
+# Usage: pytest tests/test_state.py
+import asyncio
+import math
+
+import pytest
+
+from ollama_swapper.state import LocalState, SharedStateClient, StateServer, StateStore
+
+
+def test_state_store_tracks_in_flight_and_keep_alive() -> None:
+    store = StateStore()
+    store.begin("m", now=100.0)
+    store.begin("m", now=101.0)
+
+    busy = store.snapshot(now=102.0)["m"]
+    assert busy["in_flight"] == 2
+    assert busy["loaded"] is True
+    assert busy["idle_seconds"] == 0.0
+
+    store.end("m", now=110.0, keep_alive=60.0)
+    store.end("m", now=120.0, keep_alive=60.0)
+
+    idle = store.snapshot(now=150.0)["m"]
+    assert idle["in_flight"] == 0
+    assert idle["idle_seconds"] == 30.0
+    assert idle["loaded"] is True
+    assert store.snapshot(now=181.0)["m"]["loaded"] is False
+
+
+def test_local_state_keep_alive_forever() -> None:
+    state = LocalState()
+
+    async def run() -> dict:
+        await state.begin("m")
+        await state.end("m", math.inf)
+        return await state.snapshot()
+
+    assert asyncio.run(run())["m"]["loaded"] is True
+
+
+def test_shared_state_client_round_trip() -> None:
+    server = StateServer().start()
+    try:
+
+        async def run() -> tuple[dict, dict]:
+            worker_a = SharedStateClient(server.address)
+            worker_b = SharedStateClient(server.address)
+            await worker_a.begin("m")
+            # a snapshot on the same connection guarantees earlier writes were applied
+            await worker_a.snapshot()
+            await worker_b.begin("m")
+            seen_by_b = await worker_b.snapshot()
+            await worker_a.end("m", math.inf)
+            seen_by_a = await worker_a.snapshot()
+            return seen_by_a, seen_by_b
+
+        seen_by_a, seen_by_b = asyncio.run(run())
+    finally:
+        server.close()
+
+    assert seen_by_b["m"]["in_flight"] == 2
+    assert seen_by_a["m"]["in_flight"] == 1
+    assert seen_by_a["m"]["loaded"] is True
+
+
+def test_shared_state_client_shares_one_connection(monkeypatch: pytest.MonkeyPatch) -> None:
+    opened: list[str] = []
+    open_unix_connection = asyncio.open_unix_connection
+
+    async def counting(path: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        opened.append(path)
+        return await open_unix_connection(path)
+
+    monkeypatch.setattr(asyncio, "open_unix_connection", counting)
+    server = StateServer().start()
+    try:
+
+        async def run() -> dict:
+            client = SharedStateClient(server.address)
+            await asyncio.gather(*(client.begin("m") for _ in range(5)))
+            return await client.snapshot()
+
+        snapshot = asyncio.run(run())
+    finally:
+        server.close()
+
+    assert len(opened) == 1
+    assert snapshot["m"]["in_flight"] == 5
+
+
+def test_shared_state_client_degrades_when_server_missing() -> None:
+    client = SharedStateClient("unix:/nonexistent/state.sock")
+
+    async def run() -> dict:
+        await client.begin("m")
+        return await client.snapshot()
+
+    assert asyncio.run(run()) == {}
+
+
+def test_state_store_prefers_api_ps_for_loaded() -> None:
+    store = StateStore()
+    store.begin("m", now=100.0)
+    store.end("m", now=101.0, keep_alive=math.inf)
+    # Ollama evicted "m" and loaded "other" behind the proxy's back.
+    store.set_loaded({"other": {"size_vram": 1024}}, now=110.0)
+
+    snapshot = store.snapshot(now=111.0)
+    assert snapshot["m"]["loaded"] is False
+    assert snapshot["other"]["loaded"] is True
+    assert snapshot["other"]["size_vram"] == 1024
+
+    store.begin("m", now=112.0)
+    store.end("m", now=113.0, keep_alive=60.0)
+    assert store.snapshot(now=114.0)["m"]["loaded"] is True
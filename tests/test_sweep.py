@@ -1,6 +1,6 @@
 # Tests for parsing `ollama ps` output into model names.
 # Usage: pytest tests/test_sweep.py
-from ollama_swapper.sweep import parse_ps_output
+from ollama_swapper.sweep import parse_ps_output, parse_ps_rows
 
 
 def test_parse_ps_output() -> None:
@@ -13,3 +13,25 @@ qwen2:latest    def456          7.4GB  GPU         1 minute from now
     models = parse_ps_output(sample)
 
     assert models == ["llama3:latest", "qwen2:latest"]
+
+
+def test_parse_ps_rows_keeps_multi_word_columns() -> None:
+    sample = """
+NAME          ID              SIZE      PROCESSOR          CONTEXT    UNTIL
+qwen3:8b      500a1f067a9f    6.5 GB    100% GPU           4096       4 minutes from now
+gemma3:12b    f4031aab637d    11 GB     48%/52% CPU/GPU    8192       Forever
+""".strip()
+
+    rows = parse_ps_rows(sample)
+
+    assert rows[0] == {
+        "name": "qwen3:8b",
+        "id": "500a1f067a9f",
+        "size": "6.5 GB",
+        "processor": "100% GPU",
+        "context": "4096",
+        "until": "4 minutes from now",
+    }
+    assert rows[1]["processor"] == "48%/52% CPU/GPU"
+    assert rows[1]["until"] == "Forever"
+    assert parse_ps_rows("") == []
@@ -0,0 +1,60 @@
+# Tests for incremental tool-call argument assembly and JSON completion detection.
+# Usage: pytest tests/test_toolcalls.py
+import json
+
+from ollama_swapper.toolcalls import JsonScanner, ToolCallAssembler
+
+
+def _feed_all(scanner: JsonScanner, fragments: list[str]) -> list[bool]:
+    return [scanner.feed(fragment) for fragment in fragments]
+
+
+def test_json_scanner_ignores_structure_inside_strings() -> None:
+    document = json.dumps({"code": 'if (a) { b["}"]; }', "path": "C:\\\\dir\\\\", "q": '"{'})
+    # Split into 1- and 3-character fragments, including between a backslash and its escapee.
+    for size in (1, 3):
+        scanner = JsonScanner()
+        fragments = [document[i : i + size] for i in range(0, len(document), size)]
+        results = _feed_all(scanner, fragments)
+        assert results[-1] is True
+        assert results[:-1] == [False] * (len(fragments) - 1)
+
+
+def test_json_scanner_handles_arrays_and_scalars() -> None:
+    assert _feed_all(JsonScanner(), ['[{"a": [1, ', "2]}", "]"]) == [False, False, True]
+    # Bare scalars have no closing bracket, so they are only known complete at stream end.
+    assert _feed_all(JsonScanner(), ['"text"', "null"]) == [False, False]
+
+
+def _delta(index: int, arguments: str, name: str | None = None) -> dict:
+    function = {"arguments": arguments}
+    if name:
+        function["name"] = name
+    return {"index": index, "id": f"call-{index}" if name else None, "function": function}
+
+
+def test_assembler_emits_calls_as_their_arguments_close() -> None:
+    assembler = ToolCallAssembler(emit_early=True)
+
+    assert assembler.feed([_delta(0, '{"path": "a', name="read")]) == []
+    ready = assembler.feed([_delta(0, '.py"}'), _delta(1, "{", name="list")])
+    assert ready == [
+        {
+            "id": "call-0",
+            "type": "function",
+            "function": {"name": "read", "arguments": '{"path": "a.py"}'},
+        }
+    ]
+    assert assembler.feed([_delta(1, "}")])[0]["function"]["name"] == "list"
+    assert assembler.finish() == []
+
+
+def test_assembler_defers_to_finish_without_early_emission() -> None:
+    assembler = ToolCallAssembler()
+    assert assembler.feed([_delta(1, "{}", name="b"), _delta(0, '{"x": 1}', name="a")]) == []
+    assert [call["function"]["name"] for call in assembler.finish()] == ["a", "b"]
+
+    early = ToolCallAssembler(emit_early=True)
+    # Unparseable or scalar arguments never close, so they still arrive at the end.
+    assert early.feed([_delta(0, "not json", name="raw")]) == []
+    assert early.finish()[0]["function"]["arguments"] == "not json"
@@ -0,0 +1,99 @@
+# Tests for the top feed's frames, deltas and text rendering.
+# Usage: pytest tests/test_top.py
+import asyncio
+import json
+from typing import Any
+
+from ollama_swapper.top import (
+    ActivityTracker,
+    apply_delta,
+    build_frame,
+    diff_frames,
+    proxy_url,
+    render,
+    top_events,
+)
+
+
+def _frame(models: dict[str, dict[str, Any]], activity: ActivityTracker, now: float = 100.0):
+    return build_frame(models, activity, lambda model: 40.0 if model == "a" else None, None, now)
+
+
+def test_activity_tracker_counts_queue_and_cold_loads() -> None:
+    activity = ActivityTracker(clock=lambda: 50.0)
+    activity.enqueue("a")
+    activity.enqueue("a")
+    activity.dequeue("a")
+    activity.observe("a", {"load_duration": 3_000_000})  # resident: a few ms
+    activity.observe("b", {"load_duration": 2_500_000_000})
+
+    assert activity.queued() == {"a": 1}
+    assert activity.swaps() == [{"seq": 1, "at": 50.0, "model": "b", "load_ms": 2500.0}]
+
+
+def test_diff_and_apply_delta_round_trip() -> None:
+    activity = ActivityTracker(clock=lambda: 60.0)
+    before = _frame({"a": {"loaded": True, "in_flight": 1, "size_vram": 6}}, activity)
+    same = _frame({"a": {"loaded": True, "in_flight": 1, "size_vram": 6}}, activity, now=101.0)
+    assert diff_frames(before, same) is None
+
+    activity.enqueue("b")
+    activity.observe("b", {"load_duration": 1_000_000_000})
+    after = _frame({"b": {"loaded": True, "in_flight": 0, "last_used": 90.0}}, activity, 102.0)
+    delta = diff_frames(before, after)
+
+    assert delta is not None
+    assert delta["removed"] == ["a"]
+    assert delta["models"]["b"]["queued"] == 1
+    assert [swap["model"] for swap in delta["swaps"]] == ["b"]
+    assert apply_delta(before, {"now": 102.0, **delta}) == after
+
+
+def test_top_events_sends_deltas_only_on_change_or_heartbeat() -> None:
+    states = iter([{"a": {"in_flight": 0}}] * 3 + [{"a": {"in_flight": 1}}] * 20)
+    activity = ActivityTracker()
+    ticks = iter(float(tick) for tick in range(100))
+
+    async def collect() -> dict[str, Any]:
+        return _frame(next(states), activity)
+
+    async def sleep(_: float) -> None:
+        pass
+
+    async def run() -> list[dict[str, Any]]:
+        clock = lambda: next(ticks)  # noqa: E731
+        events = top_events(collect, count=3, heartbeat=5.0, sleep=sleep, clock=clock)
+        return [json.loads(line) async for line in events]
+
+    snapshot, change, heartbeat = asyncio.run(run())
+
+    assert snapshot["type"] == "snapshot"
+    assert change == {"type": "delta", "now": 100.0, "models": {"a": {"in_flight": 1}}}
+    # After the change nothing differs, so the next line is the empty heartbeat.
+    assert heartbeat == {"type": "delta", "now": 100.0}
+
+
+def test_render_lists_models_and_swaps() -> None:
+    activity = ActivityTracker(clock=lambda: 95.0)
+    activity.observe("qwen3:8b", {"load_duration": 2_000_000_000})
+    frame = _frame(
+        {
+            "qwen3:8b": {"loaded": True, "in_flight": 0, "size_vram": 6 << 30, "last_used": 25.0},
+            "a": {"loaded": False, "in_flight": 2},
+        },
+        activity,
+    )
+
+    lines = render(frame, "http://127.0.0.1:11434").splitlines()
+
+    qwen = next(line for line in lines if line.startswith("qwen3:8b"))
+    assert qwen.split()[1:] == ["yes", "6.0", "GiB", "0", "0", "-", "1m15s"]
+    assert next(line for line in lines if line.startswith("a ")).split()[1:] == [
+        "no", "-", "2", "0", "40.0", "-"
+    ]
+    assert "qwen3:8b  load 2.0s" in lines[-1]
+
+
+def test_proxy_url_uses_loopback_for_wildcard_bind() -> None:
+    assert proxy_url("0.0.0.0:11434") == "http://127.0.0.1:11434"
+    assert proxy_url("10.0.0.5:8080") == "http://10.0.0.5:8080"